@@ -25,6 +25,7 @@ from gear import (
     Database,
     maybe_parse_bearer_header,
     monitor_endpoints_middleware,
+    invalidate_userdata,
 )
 from web_common import setup_aiohttp_jinja2, setup_common_static_routes, set_message, render_template
 
@@ -324,6 +325,7 @@ async def logout(request, userdata):
     db = request.app['db']
     session_id = userdata['session_id']
     await db.just_execute('DELETE FROM sessions WHERE session_id = %s;', session_id)
+    invalidate_userdata(session_id)
 
     session = await aiohttp_session.get_session(request)
     cleanup_session(session)
@@ -506,6 +508,7 @@ async def rest_logout(request, userdata):
     session_id = userdata['session_id']
     db = request.app['db']
     await db.just_execute('DELETE FROM sessions WHERE session_id = %s;', session_id)
+    invalidate_userdata(session_id)
 
     return web.Response(status=200)
 
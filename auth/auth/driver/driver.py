@@ -11,7 +11,7 @@ from hailtop.utils import time_msecs, secret_alnum_string
 from hailtop.auth.sql_config import create_secret_data_from_config, SQLConfig
 from hailtop import aiogoogle, aiotools
 from hailtop import batch_client as bc
-from gear import create_session, Database
+from gear import create_session, Database, invalidate_userdata
 
 log = logging.getLogger('auth.driver')
 
@@ -490,6 +490,11 @@ async def delete_user(app, user):
         bp = BillingProjectResource(batch_client, user['username'], trial_bp_name)
         await bp.delete()
 
+    session_ids = [
+        record['session_id']
+        async for record in db.execute_and_fetchall('SELECT session_id FROM sessions WHERE user_id = %s;', user['id'])
+    ]
+
     await db.just_execute(
         '''
 DELETE FROM sessions WHERE user_id = %s;
@@ -498,6 +503,9 @@ UPDATE users SET state = 'deleted' WHERE id = %s;
         (user['id'], user['id']),
     )
 
+    for session_id in session_ids:
+        invalidate_userdata(session_id)
+
 
 async def update_users(app):
     log.info('in update_users')
@@ -10,6 +10,9 @@ class BatchFormatVersion:
     def has_full_spec_in_gcs(self):
         return self.format_version > 1
 
+    def has_compressed_specs(self):
+        return self.format_version > 6
+
     def has_full_status_in_gcs(self):
         return self.format_version > 1
 
@@ -92,7 +92,7 @@ HAVING n_cancelled_ready_jobs > 0;
                 '''
 SELECT id, cancelled
 FROM batches
-WHERE user = %s AND `state` = 'running';
+WHERE user = %s AND `state` IN ('open', 'running');
 ''',
                 (user,),
                 timer_description=f'in cancel_cancelled_ready_jobs: get {user} running batches',
@@ -183,7 +183,7 @@ HAVING n_cancelled_creating_jobs > 0;
                 '''
 SELECT id
 FROM batches
-WHERE user = %s AND `state` = 'running' AND cancelled = 1;
+WHERE user = %s AND `state` IN ('open', 'running') AND cancelled = 1;
 ''',
                 (user,),
                 timer_description=f'in cancel_cancelled_creating_jobs: get {user} cancelled batches',
@@ -282,7 +282,7 @@ HAVING n_cancelled_running_jobs > 0;
                 '''
 SELECT id
 FROM batches
-WHERE user = %s AND `state` = 'running' AND cancelled = 1;
+WHERE user = %s AND `state` IN ('open', 'running') AND cancelled = 1;
 ''',
                 (user,),
                 timer_description=f'in cancel_cancelled_running_jobs: get {user} cancelled batches',
@@ -62,13 +62,15 @@ GROUP BY batches.id;
         log.exception(f'callback for batch {batch_id} failed, will not retry.')
 
 
-async def add_attempt_resources(db, batch_id, job_id, attempt_id, resources):
-    if attempt_id:
-        try:
-            resource_args = [
-                (batch_id, job_id, attempt_id, resource['name'], resource['quantity']) for resource in resources
-            ]
+def attempt_resource_args(batch_id, job_id, attempt_id, resources):
+    if not attempt_id:
+        return []
+    return [(batch_id, job_id, attempt_id, resource['name'], resource['quantity']) for resource in resources]
+
 
+async def add_attempt_resources(db, resource_args):
+    if resource_args:
+        try:
             await db.execute_many(
                 '''
 INSERT INTO `attempt_resources` (batch_id, job_id, attempt_id, resource, quantity)
@@ -78,77 +80,114 @@ ON DUPLICATE KEY UPDATE quantity = quantity;
                 resource_args,
             )
         except Exception:
-            log.exception(f'error while inserting resources for job {id}, attempt {attempt_id}')
+            attempts = sorted({(batch_id, job_id, attempt_id) for batch_id, job_id, attempt_id, _, _ in resource_args})
+            log.exception(f'error while inserting resources for attempts {attempts}')
             raise
 
 
 async def mark_job_complete(
     app, batch_id, job_id, attempt_id, instance_name, new_state, status, start_time, end_time, reason, resources
 ):
+    await mark_jobs_complete(
+        app, instance_name, [(batch_id, job_id, attempt_id, new_state, status, start_time, end_time, resources)], reason
+    )
+
+
+async def mark_jobs_complete(app, instance_name, completions, reason):
+    """Mark the jobs in `completions` complete on `instance_name`.
+
+    `completions` is a list of `(batch_id, job_id, attempt_id, new_state,
+    status, start_time, end_time, resources)` tuples.  All the jobs are
+    marked complete in one transaction by the mark_jobs_complete
+    procedure, the attempt resources of all the jobs are inserted in one
+    statement and batch callbacks are checked once per batch.
+    """
     scheduler_state_changed: Notice = app['scheduler_state_changed']
     cancel_ready_state_changed: asyncio.Event = app['cancel_ready_state_changed']
     db: Database = app['db']
     inst_coll_manager: 'InstanceCollectionManager' = app['inst_coll_manager']
     task_manager: BackgroundTaskManager = app['task_manager']
 
-    id = (batch_id, job_id)
+    instance = None
+    if instance_name:
+        instance = inst_coll_manager.get_instance(instance_name)
 
-    log.info(f'marking job {id} complete new_state {new_state}')
+    # lock jobs in a consistent order so concurrent calls don't deadlock
+    completions = sorted(completions, key=lambda completion: (completion[0], completion[1]))
+
+    jobs = []
+    for batch_id, job_id, attempt_id, new_state, status, start_time, end_time, _ in completions:
+        log.info(f'marking job {(batch_id, job_id)} complete new_state {new_state}')
+        job = {
+            'batch_id': batch_id,
+            'job_id': job_id,
+            'attempt_id': attempt_id,
+            'state': new_state,
+            'status': json.dumps(status) if status is not None else None,
+            'start_time': start_time,
+            'end_time': end_time,
+        }
+        # the procedure reads missing keys as NULL
+        jobs.append({k: v for k, v in job.items() if v is not None})
 
     now = time_msecs()
 
+    resource_args = []
+    completed_batch_ids = set()
     try:
-        rv = await db.execute_and_fetchone(
-            'CALL mark_job_complete(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s);',
-            (
-                batch_id,
-                job_id,
-                attempt_id,
-                instance_name,
-                new_state,
-                json.dumps(status) if status is not None else None,
-                start_time,
-                end_time,
-                reason,
-                now,
-            ),
-        )
-    except Exception:
-        log.exception(f'error while marking job {id} complete on instance {instance_name}')
-        raise
+        try:
+            rv = await db.execute_and_fetchone(
+                'CALL mark_jobs_complete(%s, %s, %s, %s);', (instance_name, json.dumps(jobs), reason, now)
+            )
+        except Exception:
+            ids = [(batch_id, job_id) for batch_id, job_id, *_ in completions]
+            log.exception(f'error while marking jobs {ids} complete on instance {instance_name}')
+            raise
 
-    scheduler_state_changed.notify()
-    cancel_ready_state_changed.set()
+        scheduler_state_changed.notify()
+        cancel_ready_state_changed.set()
 
-    instance = None
+        results = json.loads(rv['results'])
+        assert len(results) == len(completions), (results, completions)
 
-    if instance_name:
-        instance = inst_coll_manager.get_instance(instance_name)
-        if instance:
-            if rv['delta_cores_mcpu'] != 0 and instance.state == 'active':
-                # may also create scheduling opportunities, set above
-                instance.adjust_free_cores_in_memory(rv['delta_cores_mcpu'])
-        else:
-            log.warning(f'mark_complete for job {id} from unknown {instance}')
+        for (batch_id, job_id, attempt_id, new_state, _, _, _, resources), result in zip(completions, results):
+            id = (batch_id, job_id)
 
-    await add_attempt_resources(db, batch_id, job_id, attempt_id, resources)
+            if instance_name:
+                if instance:
+                    if result['delta_cores_mcpu'] != 0 and instance.state == 'active':
+                        # may also create scheduling opportunities, set above
+                        instance.adjust_free_cores_in_memory(result['delta_cores_mcpu'])
+                else:
+                    log.warning(f'mark_complete for job {id} from unknown {instance}')
 
-    if rv['rc'] != 0:
-        log.info(f'mark_job_complete returned {rv} for job {id}')
-        return
+            resource_args.extend(attempt_resource_args(batch_id, job_id, attempt_id, resources))
 
-    old_state = rv['old_state']
-    if old_state in complete_states:
-        log.info(f'old_state {old_state} complete for job {id}, doing nothing')
-        # already complete, do nothing
-        return
+            if result['rc'] != 0:
+                log.info(f'mark_jobs_complete returned {result} for job {id}')
+                continue
+
+            old_state = result['old_state']
+            if old_state in complete_states:
+                log.info(f'old_state {old_state} complete for job {id}, doing nothing')
+                # already complete, do nothing
+                continue
 
-    log.info(f'job {id} changed state: {rv["old_state"]} => {new_state}')
+            log.info(f'job {id} changed state: {old_state} => {new_state}')
 
-    await notify_batch_job_complete(db, batch_id)
+            completed_batch_ids.add(batch_id)
+    finally:
+        try:
+            await add_attempt_resources(db, resource_args)
+        finally:
+            for batch_id in completed_batch_ids:
+                try:
+                    await notify_batch_job_complete(db, batch_id)
+                except Exception:
+                    log.exception(f'error while notifying batch {batch_id} of job completion')
 
-    if instance and not instance.inst_coll.is_pool and instance.state == 'active':
-        task_manager.ensure_future(instance.kill())
+            if completed_batch_ids and instance and not instance.inst_coll.is_pool and instance.state == 'active':
+                task_manager.ensure_future(instance.kill())
 
 
 async def mark_job_started(app, batch_id, job_id, attempt_id, instance, start_time, resources):
@@ -172,7 +211,7 @@ CALL mark_job_started(%s, %s, %s, %s, %s);
     if rv['delta_cores_mcpu'] != 0 and instance.state == 'active':
         instance.adjust_free_cores_in_memory(rv['delta_cores_mcpu'])
 
-    await add_attempt_resources(db, batch_id, job_id, attempt_id, resources)
+    await add_attempt_resources(db, attempt_resource_args(batch_id, job_id, attempt_id, resources))
 
 
 async def mark_job_creating(app, batch_id, job_id, attempt_id, instance, start_time, resources):
@@ -197,7 +236,7 @@ CALL mark_job_creating(%s, %s, %s, %s, %s);
     if rv['delta_cores_mcpu'] != 0 and instance.state == 'pending':
         instance.adjust_free_cores_in_memory(rv['delta_cores_mcpu'])
 
-    await add_attempt_resources(db, batch_id, job_id, attempt_id, resources)
+    await add_attempt_resources(db, attempt_resource_args(batch_id, job_id, attempt_id, resources))
 
 
 async def unschedule_job(app, record):
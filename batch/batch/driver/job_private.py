@@ -115,7 +115,7 @@ FROM batches
 INNER JOIN jobs ON batches.id = jobs.batch_id
 LEFT JOIN attempts ON jobs.batch_id = attempts.batch_id AND jobs.job_id = attempts.job_id
 LEFT JOIN instances ON attempts.instance_name = instances.name
-WHERE batches.state = 'running'
+WHERE batches.state IN ('open', 'running')
   AND jobs.state = 'Creating'
   AND (jobs.always_run OR NOT jobs.cancelled)
   AND jobs.inst_coll = %s
@@ -314,7 +314,7 @@ HAVING n_ready_jobs + n_creating_jobs + n_running_jobs > 0;
                 '''
 SELECT id, cancelled, userdata, user, format_version
 FROM batches
-WHERE user = %s AND `state` = 'running';
+WHERE user = %s AND `state` IN ('open', 'running');
 ''',
                 (user,),
                 timer_description=f'in create_instances {self}: get {user} running batches',
@@ -57,7 +57,7 @@ from .zone_monitor import ZoneMonitor
 from .gce import GCEEventMonitor
 from .canceller import Canceller
 from .instance_collection_manager import InstanceCollectionManager
-from .job import mark_job_complete, mark_job_started
+from .job import mark_jobs_complete, mark_job_started, notify_batch_job_complete
 from .k8s_cache import K8sCache
 from .pool import Pool
 from ..utils import query_billing_projects, unreserved_worker_data_disk_size_gib, batch_only, authorization_token
@@ -196,11 +196,22 @@ SELECT state FROM batches WHERE user = %s AND id = %s;
     if not record:
         raise web.HTTPNotFound()
 
+    invalidate_user_resources(request.app)
     request.app['scheduler_state_changed'].notify()
 
+    # all the jobs may have completed before the batch was closed
+    if record['state'] == 'complete':
+        await notify_batch_job_complete(db, batch_id)
+
     return web.Response()
 
 
+def invalidate_user_resources(app):
+    inst_coll_manager: InstanceCollectionManager = app['inst_coll_manager']
+    for pool in inst_coll_manager.pools.values():
+        pool.scheduler.invalidate_user_resources()
+
+
 def set_cancel_state_changed(app):
     app['cancel_running_state_changed'].set()
     app['cancel_creating_state_changed'].set()
@@ -210,10 +221,19 @@ def set_cancel_state_changed(app):
 @routes.post('/api/v1alpha/batches/cancel')
 @batch_only
 async def cancel_batch(request):
+    invalidate_user_resources(request.app)
     set_cancel_state_changed(request.app)
     return web.Response()
 
 
+@routes.post('/api/v1alpha/batches/jobs_ready')
+@batch_only
+async def jobs_ready(request):
+    invalidate_user_resources(request.app)
+    request.app['scheduler_state_changed'].notify()
+    return web.Response()
+
+
 @routes.post('/api/v1alpha/batches/delete')
 @batch_only
 async def delete_batch(request):
@@ -265,14 +285,7 @@ async def deactivate_instance(request, instance):  # pylint: disable=unused-argu
     return await asyncio.shield(deactivate_instance_1(instance))
 
 
-async def job_complete_1(request, instance):
-    body = await request.json()
-    job_status = body['status']
-
-    batch_id = job_status['batch_id']
-    job_id = job_status['job_id']
-    attempt_id = job_status['attempt_id']
-
+def job_status_to_completion(job_status):
     state = job_status['state']
     if state == 'succeeded':
         new_state = 'Success'
@@ -282,25 +295,24 @@ async def job_complete_1(request, instance):
         assert state == 'failed', state
         new_state = 'Failed'
 
-    start_time = job_status['start_time']
-    end_time = job_status['end_time']
-    status = job_status['status']
-    resources = job_status.get('resources')
-
-    await mark_job_complete(
-        request.app,
-        batch_id,
-        job_id,
-        attempt_id,
-        instance.name,
+    return (
+        job_status['batch_id'],
+        job_status['job_id'],
+        job_status['attempt_id'],
         new_state,
-        status,
-        start_time,
-        end_time,
-        'completed',
-        resources,
+        job_status['status'],
+        job_status['start_time'],
+        job_status['end_time'],
+        job_status.get('resources'),
     )
 
+
+async def job_complete_1(request, instance):
+    body = await request.json()
+    job_status = body['status']
+
+    await mark_jobs_complete(request.app, instance.name, [job_status_to_completion(job_status)], 'completed')
+
     await instance.mark_healthy()
 
     return web.Response()
@@ -312,17 +324,37 @@ async def job_complete(request, instance):
     return await asyncio.shield(job_complete_1(request, instance))
 
 
-async def job_started_1(request, instance):
+async def jobs_complete_1(request, instance):
     body = await request.json()
-    job_status = body['status']
+    completions = [job_status_to_completion(job_status) for job_status in body['statuses']]
+
+    await mark_jobs_complete(request.app, instance.name, completions, 'completed')
+
+    await instance.mark_healthy()
+
+    return web.Response()
+
 
+@routes.post('/api/v1alpha/instances/jobs_complete')
+@active_instances_only
+async def jobs_complete(request, instance):
+    return await asyncio.shield(jobs_complete_1(request, instance))
+
+
+async def mark_job_started_from_status(app, instance, job_status):
     batch_id = job_status['batch_id']
     job_id = job_status['job_id']
     attempt_id = job_status['attempt_id']
     start_time = job_status['start_time']
     resources = job_status.get('resources')
 
-    await mark_job_started(request.app, batch_id, job_id, attempt_id, instance, start_time, resources)
+    await mark_job_started(app, batch_id, job_id, attempt_id, instance, start_time, resources)
+
+
+async def job_started_1(request, instance):
+    body = await request.json()
+
+    await mark_job_started_from_status(request.app, instance, body['status'])
 
     await instance.mark_healthy()
 
@@ -335,6 +367,23 @@ async def job_started(request, instance):
     return await asyncio.shield(job_started_1(request, instance))
 
 
+async def jobs_started_1(request, instance):
+    body = await request.json()
+
+    for job_status in body['statuses']:
+        await mark_job_started_from_status(request.app, instance, job_status)
+
+    await instance.mark_healthy()
+
+    return web.Response()
+
+
+@routes.post('/api/v1alpha/instances/jobs_started')
+@active_instances_only
+async def jobs_started(request, instance):
+    return await asyncio.shield(jobs_started_1(request, instance))
+
+
 @routes.get('/')
 @routes.get('')
 @web_authenticated_developers_only()
@@ -693,7 +742,7 @@ FROM
       (NOT jobs.always_run AND (jobs.cancelled OR batches.cancelled)) AS cancelled
     FROM batches
     INNER JOIN jobs ON batches.id = jobs.batch_id
-    WHERE batches.`state` = 'running'
+    WHERE batches.`state` IN ('open', 'running')
   ) as v
   GROUP BY user, inst_coll
 ) as t
@@ -1,3 +1,4 @@
+from typing import Any, Deque, Dict, Optional
 import sortedcontainers
 import logging
 import asyncio
@@ -21,7 +22,6 @@ from hailtop.utils import (
 from ..batch_configuration import STANDING_WORKER_MAX_IDLE_TIME_MSECS, WORKER_MAX_IDLE_TIME_MSECS, GCP_ZONE
 from ..inst_coll_config import PoolConfig
 from ..utils import (
-    Box,
     ExceededSharesCounter,
     adjust_cores_for_memory_request,
     adjust_cores_for_packability,
@@ -299,6 +299,13 @@ GROUP BY user;
 
 
 class PoolScheduler:
+    # the per-user resource aggregate is recomputed from the database at
+    # most this often; in between, it is kept up to date with the jobs this
+    # scheduler schedules
+    USER_RESOURCES_REFRESH_INTERVAL_MSECS = 5 * 1000
+    # number of Ready jobs fetched at a time for a user
+    READY_JOBS_BATCH_SIZE = 300
+
     def __init__(self, app, pool):
         self.app = app
         self.scheduler_state_changed = pool.scheduler_state_changed
@@ -308,6 +315,10 @@ class PoolScheduler:
         self.exceeded_shares_counter = ExceededSharesCounter()
         self.task_manager = aiotools.BackgroundTaskManager()
 
+        self.user_resources: Dict[str, Dict[str, int]] = {}
+        self.user_resources_refresh_time: Optional[int] = None
+        self.user_ready_jobs: Dict[str, Deque[Dict[str, Any]]] = {}
+
     async def async_init(self):
         self.task_manager.ensure_future(
             retry_long_running('schedule_loop', run_if_changed, self.scheduler_state_changed, self.schedule_loop_body)
@@ -319,16 +330,13 @@ class PoolScheduler:
         finally:
             self.async_worker_pool.shutdown()
 
-    async def compute_fair_share(self):
-        free_cores_mcpu = sum([worker.free_cores_mcpu for worker in self.pool.healthy_instances_by_free_cores])
-
-        user_running_cores_mcpu = {}
-        user_total_cores_mcpu = {}
-        result = {}
-
-        pending_users_by_running_cores = sortedcontainers.SortedSet(key=lambda user: user_running_cores_mcpu[user])
-        allocating_users_by_total_cores = sortedcontainers.SortedSet(key=lambda user: user_total_cores_mcpu[user])
+    def invalidate_user_resources(self):
+        '''Recompute the user resources and runnable jobs in the next
+        iteration of the schedule loop, for example because a batch was
+        closed or cancelled.'''
+        self.user_resources_refresh_time = None
 
+    async def refresh_user_resources(self):
         records = self.db.execute_and_fetchall(
             '''
 SELECT user,
@@ -345,13 +353,91 @@ HAVING n_ready_jobs + n_running_jobs > 0;
             timer_description=f'in compute_fair_share for {self.pool.name}: aggregate user_inst_coll_resources',
         )
 
+        user_resources = {}
         async for record in records:
-            user = record['user']
-            user_running_cores_mcpu[user] = record['running_cores_mcpu']
-            user_total_cores_mcpu[user] = record['running_cores_mcpu'] + record['ready_cores_mcpu']
+            user_resources[record['user']] = record
+
+        self.user_resources = user_resources
+        self.user_ready_jobs = {}
+        self.user_resources_refresh_time = time_msecs()
+
+    def record_job_scheduled(self, user, cores_mcpu):
+        resources = self.user_resources.get(user)
+        if resources:
+            resources['n_ready_jobs'] = max(resources['n_ready_jobs'] - 1, 0)
+            resources['ready_cores_mcpu'] = max(resources['ready_cores_mcpu'] - cores_mcpu, 0)
+            resources['n_running_jobs'] += 1
+            resources['running_cores_mcpu'] += cores_mcpu
+
+    async def user_ready_jobs_queue(self, user) -> Deque[Dict[str, Any]]:
+        ready_jobs = self.user_ready_jobs.get(user)
+        if ready_jobs:
+            return ready_jobs
+
+        records = self.db.select_and_fetchall(
+            '''
+(SELECT jobs.batch_id, jobs.job_id, jobs.spec, jobs.cores_mcpu, batches.userdata, batches.user, batches.format_version
+ FROM batches
+ INNER JOIN jobs FORCE INDEX(jobs_batch_id_state_always_run_inst_coll_cancelled)
+   ON batches.id = jobs.batch_id
+ WHERE batches.user = %s AND batches.`state` IN ('open', 'running') AND
+   jobs.state = 'Ready' AND jobs.always_run = 1 AND jobs.inst_coll = %s
+ LIMIT %s)
+UNION ALL
+(SELECT jobs.batch_id, jobs.job_id, jobs.spec, jobs.cores_mcpu, batches.userdata, batches.user, batches.format_version
+ FROM batches
+ INNER JOIN jobs FORCE INDEX(jobs_batch_id_state_always_run_cancelled)
+   ON batches.id = jobs.batch_id
+ WHERE batches.user = %s AND batches.`state` IN ('open', 'running') AND NOT batches.cancelled AND
+   jobs.state = 'Ready' AND jobs.always_run = 0 AND jobs.inst_coll = %s AND jobs.cancelled = 0
+ LIMIT %s);
+''',
+            (
+                user,
+                self.pool.name,
+                PoolScheduler.READY_JOBS_BATCH_SIZE,
+                user,
+                self.pool.name,
+                PoolScheduler.READY_JOBS_BATCH_SIZE,
+            ),
+            timer_description=f'in schedule {self.pool}: get {user} runnable jobs',
+        )
+        ready_jobs = collections.deque([record async for record in records])
+        self.user_ready_jobs[user] = ready_jobs
+
+        if not ready_jobs:
+            # the aggregate is out of date, don't allocate this user cores
+            # until it is refreshed
+            resources = self.user_resources.get(user)
+            if resources:
+                resources['n_ready_jobs'] = 0
+                resources['ready_cores_mcpu'] = 0
+
+        return ready_jobs
+
+    async def compute_fair_share(self):
+        if (
+            self.user_resources_refresh_time is None
+            or time_msecs() - self.user_resources_refresh_time > PoolScheduler.USER_RESOURCES_REFRESH_INTERVAL_MSECS
+        ):
+            await self.refresh_user_resources()
+
+        free_cores_mcpu = sum([worker.free_cores_mcpu for worker in self.pool.healthy_instances_by_free_cores])
+
+        user_running_cores_mcpu = {}
+        user_total_cores_mcpu = {}
+        result = {}
+
+        pending_users_by_running_cores = sortedcontainers.SortedSet(key=lambda user: user_running_cores_mcpu[user])
+        allocating_users_by_total_cores = sortedcontainers.SortedSet(key=lambda user: user_total_cores_mcpu[user])
+
+        for user, resources in self.user_resources.items():
+            if resources['n_ready_jobs'] + resources['n_running_jobs'] <= 0:
+                continue
+            user_running_cores_mcpu[user] = resources['running_cores_mcpu']
+            user_total_cores_mcpu[user] = resources['running_cores_mcpu'] + resources['ready_cores_mcpu']
             pending_users_by_running_cores.add(user)
-            record['allocated_cores_mcpu'] = 0
-            result[user] = record
+            result[user] = {'allocated_cores_mcpu': 0}
 
         def allocate_cores(user, mark):
             result[user]['allocated_cores_mcpu'] = int(mark - user_running_cores_mcpu[user] + 0.5)
@@ -416,48 +502,6 @@ HAVING n_ready_jobs + n_running_jobs > 0;
             for user, resources in user_resources.items()
         }
 
-        async def user_runnable_jobs(user, remaining):
-            async for batch in self.db.select_and_fetchall(
-                '''
-SELECT id, cancelled, userdata, user, format_version
-FROM batches
-WHERE user = %s AND `state` = 'running';
-''',
-                (user,),
-                timer_description=f'in schedule {self.pool}: get {user} running batches',
-            ):
-                async for record in self.db.select_and_fetchall(
-                    '''
-SELECT job_id, spec, cores_mcpu
-FROM jobs FORCE INDEX(jobs_batch_id_state_always_run_inst_coll_cancelled)
-WHERE batch_id = %s AND state = 'Ready' AND always_run = 1 AND inst_coll = %s
-LIMIT %s;
-''',
-                    (batch['id'], self.pool.name, remaining.value),
-                    timer_description=f'in schedule {self.pool}: get {user} batch {batch["id"]} runnable jobs (1)',
-                ):
-                    record['batch_id'] = batch['id']
-                    record['userdata'] = batch['userdata']
-                    record['user'] = batch['user']
-                    record['format_version'] = batch['format_version']
-                    yield record
-                if not batch['cancelled']:
-                    async for record in self.db.select_and_fetchall(
-                        '''
-SELECT job_id, spec, cores_mcpu
-FROM jobs FORCE INDEX(jobs_batch_id_state_always_run_cancelled)
-WHERE batch_id = %s AND state = 'Ready' AND always_run = 0 AND inst_coll = %s AND cancelled = 0
-LIMIT %s;
-''',
-                        (batch['id'], self.pool.name, remaining.value),
-                        timer_description=f'in schedule {self.pool}: get {user} batch {batch["id"]} runnable jobs (2)',
-                    ):
-                        record['batch_id'] = batch['id']
-                        record['userdata'] = batch['userdata']
-                        record['user'] = batch['user']
-                        record['format_version'] = batch['format_version']
-                        yield record
-
         waitable_pool = WaitableSharedPool(self.async_worker_pool)
 
         def get_instance(user, cores_mcpu):
@@ -486,8 +530,11 @@ LIMIT %s;
 
             log.info(f'schedule {self.pool}: user-share: {user}: {allocated_cores_mcpu} {share}')
 
-            remaining = Box(share)
-            async for record in user_runnable_jobs(user, remaining):
+            ready_jobs = await self.user_ready_jobs_queue(user)
+            unscheduled = []
+            remaining = share
+            while ready_jobs and remaining > 0:
+                record = ready_jobs.popleft()
                 batch_id = record['batch_id']
                 job_id = record['job_id']
                 id = (batch_id, job_id)
@@ -498,12 +545,14 @@ LIMIT %s;
                     if random.random() > self.exceeded_shares_counter.rate():
                         self.exceeded_shares_counter.push(True)
                         self.scheduler_state_changed.set()
+                        unscheduled.append(record)
                         break
                     self.exceeded_shares_counter.push(False)
 
                 instance = get_instance(user, record['cores_mcpu'])
                 if instance:
                     instance.adjust_free_cores_in_memory(-record['cores_mcpu'])
+                    self.record_job_scheduled(user, record['cores_mcpu'])
                     scheduled_cores_mcpu += record['cores_mcpu']
                     n_scheduled += 1
                     should_wait = False
@@ -515,10 +564,13 @@ LIMIT %s;
                             log.info(f'scheduling job {id} on {instance} for {self.pool}', exc_info=True)
 
                     await waitable_pool.call(schedule_with_error_handling, self.app, record, id, instance)
+                else:
+                    unscheduled.append(record)
+
+                remaining -= 1
 
-                remaining.value -= 1
-                if remaining.value <= 0:
-                    break
+            # jobs that were not scheduled stay at the front of the queue
+            ready_jobs.extendleft(reversed(unscheduled))
 
         await waitable_pool.wait()
 
@@ -68,14 +68,16 @@ class FileStore:
     def specs_index_path(self, batch_id, token):
         return f'{self.specs_dir(batch_id, token)}/specs.idx'
 
-    async def read_spec_file(self, batch_id, token, start_job_id, job_id):
+    async def read_spec_file(self, batch_id, token, start_job_id, job_id, compressed=False):
         idx_url = self.specs_index_path(batch_id, token)
-        idx_start, idx_end = SpecWriter.get_index_file_offsets(job_id, start_job_id)
+        idx_start, idx_end = SpecWriter.get_index_file_offsets(job_id, start_job_id, compressed)
         offsets = await self.fs.read_range(idx_url, idx_start, idx_end)
 
         spec_url = self.specs_path(batch_id, token)
         spec_start, spec_end = SpecWriter.get_spec_file_offsets(offsets)
         data = await self.fs.read_range(spec_url, spec_start, spec_end)
+        if compressed:
+            return SpecWriter.get_spec_from_block(data, job_id, start_job_id)
         return data.decode('utf-8')
 
     async def write_spec_file(self, batch_id, token, data_bytes, offsets_bytes):
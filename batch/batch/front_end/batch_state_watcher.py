@@ -0,0 +1,80 @@
+import asyncio
+import collections
+import logging
+from typing import Any, DefaultDict, Dict, List, Optional, Tuple
+
+from gear import Database
+
+log = logging.getLogger('batch_state_watcher')
+
+
+def batch_state_signature(record: Dict[str, Any]) -> Tuple[str, bool, int]:
+    return (record['state'], bool(record['cancelled']), record['n_completed'])
+
+
+class BatchStateWatcher:
+    '''Wakes front end requests waiting on batches whose state changed.
+
+    The driver records job completions in the batches table. Instead of
+    every waiting client polling the front end, one loop reads the
+    state of all batches that have waiters with a single query and
+    wakes the waiters whose batch no longer matches the state they
+    saw.
+    '''
+
+    def __init__(self, db: Database, interval: float = 1.0):
+        self.db = db
+        self.interval = interval
+        self._waiters: DefaultDict[int, List[Tuple[Tuple[str, bool, int], asyncio.Future]]] = collections.defaultdict(
+            list
+        )
+        self._has_waiters = asyncio.Event()
+
+    async def wait(self, batch_id: int, signature: Tuple[str, bool, int], timeout: float) -> bool:
+        '''Wait until the state of `batch_id` differs from `signature`
+        or the batch is deleted. Returns False on timeout.'''
+        fut = asyncio.get_event_loop().create_future()
+        entry = (signature, fut)
+        self._waiters[batch_id].append(entry)
+        self._has_waiters.set()
+        try:
+            await asyncio.wait_for(fut, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            waiters = self._waiters[batch_id]
+            waiters.remove(entry)
+            if not waiters:
+                del self._waiters[batch_id]
+
+    async def _check(self) -> None:
+        batch_ids = list(self._waiters)
+        if not batch_ids:
+            return
+
+        records = self.db.select_and_fetchall(
+            f'''
+SELECT id, `state`, cancelled, n_completed FROM batches
+WHERE id IN ({",".join(["%s"] * len(batch_ids))}) AND NOT deleted;
+''',
+            batch_ids,
+            timer_description='watch_batch_states',
+        )
+        signatures: Dict[int, Optional[Tuple[str, bool, int]]] = {
+            record['id']: batch_state_signature(record) async for record in records
+        }
+
+        for batch_id in batch_ids:
+            current = signatures.get(batch_id)
+            for signature, fut in self._waiters.get(batch_id, []):
+                if current != signature and not fut.done():
+                    fut.set_result(None)
+
+    async def run(self) -> None:
+        while True:
+            if not self._waiters:
+                self._has_waiters.clear()
+                await self._has_waiters.wait()
+            await self._check()
+            await asyncio.sleep(self.interval)
@@ -72,11 +72,12 @@ from ..inst_coll_config import InstanceCollectionConfigs
 from ..file_store import FileStore
 from ..database import CallError, check_call_procedure
 from ..batch_configuration import BATCH_BUCKET_NAME, DEFAULT_NAMESPACE, SCOPE
-from ..globals import HTTP_CLIENT_MAX_SIZE, BATCH_FORMAT_VERSION, memory_to_worker_type
+from ..globals import HTTP_CLIENT_MAX_SIZE, BATCH_FORMAT_VERSION, memory_to_worker_type, complete_states
 from ..spec_writer import SpecWriter
 from ..batch_format_version import BatchFormatVersion
 
 from .validate import ValidationError, validate_batch, validate_and_clean_jobs
+from .batch_state_watcher import BatchStateWatcher, batch_state_signature
 
 # uvloop.install()
 
@@ -91,6 +92,9 @@ BATCH_JOB_DEFAULT_MEMORY = os.environ.get('HAIL_BATCH_JOB_DEFAULT_MEMORY', 'stan
 BATCH_JOB_DEFAULT_STORAGE = os.environ.get('HAIL_BATCH_JOB_DEFAULT_STORAGE', '0Gi')
 BATCH_JOB_DEFAULT_PREEMPTIBLE = True
 
+DEFAULT_WAIT_TIMEOUT_SECS = 30
+MAX_WAIT_TIMEOUT_SECS = 60
+
 
 def rest_authenticated_developers_or_auth_only(fun):
     @rest_authenticated_users_only
@@ -423,7 +427,9 @@ async def _get_full_job_spec(app, record):
     token, start_job_id = await SpecWriter.get_token_start_id(db, batch_id, job_id)
 
     try:
-        spec = await file_store.read_spec_file(batch_id, token, start_job_id, job_id)
+        spec = await file_store.read_spec_file(
+            batch_id, token, start_job_id, job_id, compressed=format_version.has_compressed_specs()
+        )
         return json.loads(spec)
     except google.api_core.exceptions.NotFound:
         id = (batch_id, job_id)
@@ -660,22 +666,12 @@ WHERE user = %s AND id = %s AND NOT deleted;
                 raise web.HTTPBadRequest(reason=e.reason)
 
         async with timer.step('build db args'):
-            spec_writer = SpecWriter(file_store, batch_id)
+            spec_writer = SpecWriter(file_store, batch_id, compress=batch_format_version.has_compressed_specs())
 
-            jobs_args = []
+            bunch_jobs = []
             job_parents_args = []
             job_attributes_args = []
 
-            inst_coll_resources = collections.defaultdict(
-                lambda: {
-                    'n_jobs': 0,
-                    'n_ready_jobs': 0,
-                    'ready_cores_mcpu': 0,
-                    'n_ready_cancellable_jobs': 0,
-                    'ready_cancellable_cores_mcpu': 0,
-                }
-            )
-
             prev_job_idx = None
             start_job_id = None
 
@@ -839,18 +835,6 @@ WHERE user = %s AND id = %s AND NOT deleted;
                 sa = spec.get('service_account')
                 check_service_account_permissions(user, sa)
 
-                icr = inst_coll_resources[inst_coll_name]
-                icr['n_jobs'] += 1
-                if len(parent_ids) == 0:
-                    state = 'Ready'
-                    icr['n_ready_jobs'] += 1
-                    icr['ready_cores_mcpu'] += cores_mcpu
-                    if not always_run:
-                        icr['n_ready_cancellable_jobs'] += 1
-                        icr['ready_cancellable_cores_mcpu'] += cores_mcpu
-                else:
-                    state = 'Pending'
-
                 network = spec.get('network')
                 if user != 'ci' and not (network is None or network == 'public'):
                     raise web.HTTPBadRequest(reason=f'unauthorized network {network}')
@@ -862,18 +846,7 @@ WHERE user = %s AND id = %s AND NOT deleted;
                 spec_writer.add(json.dumps(spec))
                 db_spec = batch_format_version.db_spec(spec)
 
-                jobs_args.append(
-                    (
-                        batch_id,
-                        job_id,
-                        state,
-                        json.dumps(db_spec),
-                        always_run,
-                        cores_mcpu,
-                        len(parent_ids),
-                        inst_coll_name,
-                    )
-                )
+                bunch_jobs.append((job_id, json.dumps(db_spec), always_run, cores_mcpu, inst_coll_name, parent_ids))
 
                 for parent_id in parent_ids:
                     job_parents_args.append((batch_id, job_id, parent_id))
@@ -892,11 +865,79 @@ WHERE user = %s AND id = %s AND NOT deleted;
 
             @transaction(db)
             async def insert(tx):
+                # parents in earlier bunches may have completed already: the
+                # share lock keeps them from completing until this bunch's
+                # job_parents rows are committed
+                bunch_job_ids = {job_id for job_id, *_ in bunch_jobs}
+                earlier_parent_ids = sorted(
+                    {parent_id for *_, parent_ids in bunch_jobs for parent_id in parent_ids} - bunch_job_ids
+                )
+                parent_states = {}
+                if earlier_parent_ids:
+                    records = tx.execute_and_fetchall(
+                        f'''
+SELECT job_id, state FROM jobs
+WHERE batch_id = %s AND job_id IN ({', '.join(['%s'] * len(earlier_parent_ids))})
+LOCK IN SHARE MODE;
+''',
+                        (batch_id, *earlier_parent_ids),
+                    )
+                    parent_states = {record['job_id']: record['state'] async for record in records}
+
+                jobs_args = []
+                inst_coll_resources = collections.defaultdict(
+                    lambda: {
+                        'n_jobs': 0,
+                        'n_ready_jobs': 0,
+                        'ready_cores_mcpu': 0,
+                        'n_cancelled_ready_jobs': 0,
+                        'n_ready_cancellable_jobs': 0,
+                        'ready_cancellable_cores_mcpu': 0,
+                    }
+                )
+                for job_id, db_spec, always_run, cores_mcpu, inst_coll_name, parent_ids in bunch_jobs:
+                    complete_parent_states = [
+                        parent_states[parent_id]
+                        for parent_id in parent_ids
+                        if parent_states.get(parent_id) in complete_states
+                    ]
+                    n_pending_parents = len(parent_ids) - len(complete_parent_states)
+                    cancelled = any(state != 'Success' for state in complete_parent_states)
+
+                    icr = inst_coll_resources[inst_coll_name]
+                    icr['n_jobs'] += 1
+                    if n_pending_parents == 0:
+                        state = 'Ready'
+                        if not always_run and cancelled:
+                            icr['n_cancelled_ready_jobs'] += 1
+                        else:
+                            icr['n_ready_jobs'] += 1
+                            icr['ready_cores_mcpu'] += cores_mcpu
+                            if not always_run:
+                                icr['n_ready_cancellable_jobs'] += 1
+                                icr['ready_cancellable_cores_mcpu'] += cores_mcpu
+                    else:
+                        state = 'Pending'
+
+                    jobs_args.append(
+                        (
+                            batch_id,
+                            job_id,
+                            state,
+                            db_spec,
+                            always_run,
+                            cores_mcpu,
+                            n_pending_parents,
+                            cancelled,
+                            inst_coll_name,
+                        )
+                    )
+
                 try:
                     await tx.execute_many(
                         '''
-INSERT INTO jobs (batch_id, job_id, state, spec, always_run, cores_mcpu, n_pending_parents, inst_coll)
-VALUES (%s, %s, %s, %s, %s, %s, %s, %s);
+INSERT INTO jobs (batch_id, job_id, state, spec, always_run, cores_mcpu, n_pending_parents, cancelled, inst_coll)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s);
 ''',
                         jobs_args,
                     )
@@ -931,28 +972,41 @@ VALUES (%s, %s, %s, %s);
                     n_jobs = resources['n_jobs']
                     n_ready_jobs = resources['n_ready_jobs']
                     ready_cores_mcpu = resources['ready_cores_mcpu']
+                    n_cancelled_ready_jobs = resources['n_cancelled_ready_jobs']
                     n_ready_cancellable_jobs = resources['n_ready_cancellable_jobs']
                     ready_cancellable_cores_mcpu = resources['ready_cancellable_cores_mcpu']
 
+                    # staging only counts the jobs close_batch checks for,
+                    # the ready jobs can be scheduled as soon as the bunch is
+                    # committed
                     await tx.execute_update(
                         '''
-INSERT INTO batches_inst_coll_staging (batch_id, inst_coll, token, n_jobs, n_ready_jobs, ready_cores_mcpu)
+INSERT INTO batches_inst_coll_staging (batch_id, inst_coll, token, n_jobs)
+VALUES (%s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+  n_jobs = n_jobs + %s;
+''',
+                        (batch_id, inst_coll, rand_token, n_jobs, n_jobs),
+                    )
+                    await tx.execute_update(
+                        '''
+INSERT INTO user_inst_coll_resources (user, inst_coll, token, n_ready_jobs, ready_cores_mcpu, n_cancelled_ready_jobs)
 VALUES (%s, %s, %s, %s, %s, %s)
 ON DUPLICATE KEY UPDATE
-  n_jobs = n_jobs + %s,
   n_ready_jobs = n_ready_jobs + %s,
-  ready_cores_mcpu = ready_cores_mcpu + %s;
+  ready_cores_mcpu = ready_cores_mcpu + %s,
+  n_cancelled_ready_jobs = n_cancelled_ready_jobs + %s;
 ''',
                         (
-                            batch_id,
+                            user,
                             inst_coll,
                             rand_token,
-                            n_jobs,
                             n_ready_jobs,
                             ready_cores_mcpu,
-                            n_jobs,
+                            n_cancelled_ready_jobs,
                             n_ready_jobs,
                             ready_cores_mcpu,
+                            n_cancelled_ready_jobs,
                         ),
                     )
                     await tx.execute_update(
@@ -990,9 +1044,13 @@ VALUES (%s, %s, %s);
             except Exception as err:
                 raise ValueError(
                     f'encountered exception while inserting a bunch'
-                    f'jobs_args={json.dumps(jobs_args)}'
+                    f'bunch_jobs={json.dumps(bunch_jobs)}'
                     f'job_parents_args={json.dumps(job_parents_args)}'
                 ) from err
+
+    # the bunch's ready jobs can be scheduled before the batch is closed
+    app['jobs_ready_state_changed'].set()
+
     return web.Response()
 
 
@@ -1070,7 +1128,8 @@ VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);
                 billing_project,
                 json.dumps(attributes),
                 batch_spec.get('callback'),
-                batch_spec['n_jobs'],
+                # batches whose jobs are streamed in give n_jobs when they are closed
+                batch_spec.get('n_jobs', 0),
                 now,
                 token,
                 'open',
@@ -1093,7 +1152,7 @@ VALUES (%s, %s, %s)
     return web.json_response({'id': id})
 
 
-async def _get_batch(app, batch_id):
+async def _get_batch_record(app, batch_id):
     db: Database = app['db']
 
     record = await db.select_and_fetchone(
@@ -1111,7 +1170,29 @@ GROUP BY batches.id;
     if not record:
         raise web.HTTPNotFound()
 
-    return batch_record_to_dict(record)
+    return record
+
+
+async def _get_batch(app, batch_id):
+    return batch_record_to_dict(await _get_batch_record(app, batch_id))
+
+
+def _wait_timeout(request):
+    try:
+        timeout = float(request.query.get('timeout', DEFAULT_WAIT_TIMEOUT_SECS))
+    except ValueError as e:
+        raise web.HTTPBadRequest(reason='invalid timeout') from e
+    return max(0, min(timeout, MAX_WAIT_TIMEOUT_SECS))
+
+
+def _wait_last_n_completed(request):
+    last_n_completed = request.query.get('last_n_completed')
+    if last_n_completed is None:
+        return None
+    try:
+        return int(last_n_completed)
+    except ValueError as e:
+        raise web.HTTPBadRequest(reason='invalid last_n_completed') from e
 
 
 async def _cancel_batch(app, batch_id):
@@ -1120,6 +1201,30 @@ async def _cancel_batch(app, batch_id):
     return web.Response()
 
 
+async def _cancel_job(app, batch_id, job_id):
+    db: Database = app['db']
+
+    record = await db.select_and_fetchone(
+        '''
+SELECT 1 FROM jobs
+WHERE batch_id = %s AND job_id = %s;
+''',
+        (batch_id, job_id),
+    )
+    if not record:
+        raise web.HTTPNotFound()
+
+    # jobs can only be cancelled on their own before they are scheduled
+    await db.execute_update(
+        '''
+UPDATE jobs SET cancelled = 1
+WHERE batch_id = %s AND job_id = %s AND state IN ('Pending', 'Ready') AND NOT always_run;
+''',
+        (batch_id, job_id),
+    )
+    app['cancel_batch_state_changed'].set()
+
+
 async def _delete_batch(app, batch_id):
     db: Database = app['db']
 
@@ -1136,7 +1241,7 @@ WHERE id = %s AND NOT deleted;
     await db.just_execute('CALL cancel_batch(%s);', (batch_id,))
     await db.execute_update('UPDATE batches SET deleted = 1 WHERE id = %s;', (batch_id,))
 
-    if record['state'] == 'running':
+    if record['state'] in ('open', 'running'):
         app['delete_batch_state_changed'].set()
 
 
@@ -1146,6 +1251,22 @@ async def get_batch(request, userdata, batch_id):  # pylint: disable=unused-argu
     return web.json_response(await _get_batch(request.app, batch_id))
 
 
+@routes.get('/api/v1alpha/batches/{batch_id}/wait')
+@rest_billing_project_users_only
+async def wait_batch(request, userdata, batch_id):  # pylint: disable=unused-argument
+    # Long poll: respond once the batch is complete or its number of
+    # completed jobs differs from last_n_completed, or on timeout.
+    timeout = _wait_timeout(request)
+    last_n_completed = _wait_last_n_completed(request)
+
+    record = await _get_batch_record(request.app, batch_id)
+    if record['state'] != 'complete' and last_n_completed in (None, record['n_completed']):
+        watcher: BatchStateWatcher = request.app['batch_state_watcher']
+        if await watcher.wait(batch_id, batch_state_signature(record), timeout):
+            record = await _get_batch_record(request.app, batch_id)
+    return web.json_response(batch_record_to_dict(record))
+
+
 @routes.patch('/api/v1alpha/batches/{batch_id}/cancel')
 @rest_billing_project_users_only
 async def cancel_batch(request, userdata, batch_id):  # pylint: disable=unused-argument
@@ -1153,6 +1274,14 @@ async def cancel_batch(request, userdata, batch_id):  # pylint: disable=unused-a
     return web.Response()
 
 
+@routes.patch('/api/v1alpha/batches/{batch_id}/jobs/{job_id}/cancel')
+@rest_billing_project_users_only
+async def cancel_job(request, userdata, batch_id):  # pylint: disable=unused-argument
+    job_id = int(request.match_info['job_id'])
+    await _handle_api_error(_cancel_job, request.app, batch_id, job_id)
+    return web.Response()
+
+
 @routes.patch('/api/v1alpha/batches/{batch_id}/close')
 @rest_authenticated_users_only
 async def close_batch(request, userdata):
@@ -1176,6 +1305,20 @@ WHERE user = %s AND id = %s AND NOT deleted;
     if not record:
         raise web.HTTPNotFound()
 
+    if request.can_read_body:
+        body = await request.json()
+        n_jobs = body.get('n_jobs')
+        if n_jobs is not None:
+            if not isinstance(n_jobs, int) or n_jobs < 0:
+                raise web.HTTPBadRequest(reason=f'invalid n_jobs {n_jobs}')
+            await db.execute_update(
+                '''
+UPDATE batches SET n_jobs = %s
+WHERE user = %s AND id = %s AND `state` = 'open' AND NOT deleted;
+''',
+                (n_jobs, user, batch_id),
+            )
+
     try:
         now = time_msecs()
         await check_call_procedure(db, 'CALL close_batch(%s, %s);', (batch_id, now))
@@ -1371,6 +1514,28 @@ async def get_job(request, userdata, batch_id):  # pylint: disable=unused-argume
     return web.json_response(status)
 
 
+@routes.get('/api/v1alpha/batches/{batch_id}/jobs/{job_id}/wait')
+@rest_billing_project_users_only
+async def wait_job(request, userdata, batch_id):  # pylint: disable=unused-argument
+    # Long poll: respond once the job is complete, or on timeout.
+    job_id = int(request.match_info['job_id'])
+    timeout = _wait_timeout(request)
+
+    # read the batch first so a job completing in between changes its state
+    batch_record = await _get_batch_record(request.app, batch_id)
+    status = await _get_job(request.app, batch_id, job_id)
+    if status['state'] not in complete_states:
+        watcher: BatchStateWatcher = request.app['batch_state_watcher']
+        deadline = time_msecs() + timeout * 1000
+        while status['state'] not in complete_states:
+            remaining = (deadline - time_msecs()) / 1000
+            if remaining <= 0 or not await watcher.wait(batch_id, batch_state_signature(batch_record), remaining):
+                break
+            batch_record = await _get_batch_record(request.app, batch_id)
+            status = await _get_job(request.app, batch_id, job_id)
+    return web.json_response(status)
+
+
 @routes.get('/batches/{batch_id}/jobs/{job_id}')
 @web_billing_project_users_only()
 @catch_ui_error_in_dev
@@ -2108,6 +2273,19 @@ async def cancel_batch_loop_body(app):
     return should_wait
 
 
+async def jobs_ready_loop_body(app):
+    async with client_session() as session:
+        await request_retry_transient_errors(
+            session,
+            'POST',
+            deploy_config.url('batch-driver', '/api/v1alpha/batches/jobs_ready'),
+            headers=app['batch_headers'],
+        )
+
+    should_wait = True
+    return should_wait
+
+
 async def delete_batch_loop_body(app):
     async with client_session() as session:
         await request_retry_transient_errors(
@@ -2168,10 +2346,21 @@ SELECT instance_id, internal_token, n_tokens, frozen FROM globals;
         retry_long_running('delete_batch_loop', run_if_changed, delete_batch_state_changed, delete_batch_loop_body, app)
     )
 
+    jobs_ready_state_changed = asyncio.Event()
+    app['jobs_ready_state_changed'] = jobs_ready_state_changed
+
+    app['task_manager'].ensure_future(
+        retry_long_running('jobs_ready_loop', run_if_changed, jobs_ready_state_changed, jobs_ready_loop_body, app)
+    )
+
     app['task_manager'].ensure_future(
         periodically_call(5, _refresh, app)
     )
 
+    batch_state_watcher = BatchStateWatcher(db)
+    app['batch_state_watcher'] = batch_state_watcher
+    app['task_manager'].ensure_future(retry_long_running('batch_state_watcher', batch_state_watcher.run))
+
 
 async def on_cleanup(app):
     try:
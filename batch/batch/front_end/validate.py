@@ -98,7 +98,7 @@ batch_validator = keyed(
         'attributes': nullable(dictof(str_type)),
         required('billing_project'): str_type,
         'callback': nullable(str_type),
-        required('n_jobs'): int_type,
+        'n_jobs': int_type,
         required('token'): str_type,
         'cancel_after_n_failures': nullable(numeric(**{"x > 0": lambda x: isinstance(x, int) and x > 0})),
     }
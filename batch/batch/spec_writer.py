@@ -1,4 +1,5 @@
 import logging
+import zlib
 
 from hailtop.utils import secret_alnum_string
 
@@ -9,11 +10,18 @@ class SpecWriter:
     byteorder = 'little'
     signed = False
     bytes_per_offset = 8
+    # compressed spec files hold blocks of this many newline-separated
+    # specs, each compressed independently; the index has one offset
+    # per block instead of one per job
+    jobs_per_block = 32
 
     @staticmethod
-    def get_index_file_offsets(job_id, start_job_id):
+    def get_index_file_offsets(job_id, start_job_id, compressed=False):
         assert job_id >= start_job_id
-        idx_start = SpecWriter.bytes_per_offset * (job_id - start_job_id)
+        idx = job_id - start_job_id
+        if compressed:
+            idx //= SpecWriter.jobs_per_block
+        idx_start = SpecWriter.bytes_per_offset * idx
         idx_end = (
             idx_start + 2 * SpecWriter.bytes_per_offset
         ) - 1  # `end` parameter in gcs is inclusive of last byte to return
@@ -26,6 +34,11 @@ class SpecWriter:
         next_spec_start = int.from_bytes(offsets[8:], byteorder=SpecWriter.byteorder, signed=SpecWriter.signed)
         return (spec_start, next_spec_start - 1)  # `end` parameter in gcs is inclusive of last byte to return
 
+    @staticmethod
+    def get_spec_from_block(block, job_id, start_job_id):
+        specs = zlib.decompress(block).split(b'\n')
+        return specs[(job_id - start_job_id) % SpecWriter.jobs_per_block].decode('utf-8')
+
     @staticmethod
     async def get_token_start_id(db, batch_id, job_id):
         bunch_record = await db.select_and_fetchone(
@@ -41,25 +54,42 @@ LIMIT 1;
         start_job_id = bunch_record['start_job_id']
         return (token, start_job_id)
 
-    def __init__(self, file_store, batch_id):
+    def __init__(self, file_store, batch_id, compress=False):
         self.file_store = file_store
         self.batch_id = batch_id
         self.token = secret_alnum_string(16)
+        self.compress = compress
 
         self._data_bytes = bytearray()
         self._offsets_bytes = bytearray()
         self._n_elements = 0
+        self._block = []
 
-    def add(self, data):
-        data_bytes = data.encode('utf-8')
+    def _add_entry(self, data_bytes):
         start = len(self._data_bytes)
 
         self._offsets_bytes.extend(start.to_bytes(8, byteorder=SpecWriter.byteorder, signed=SpecWriter.signed))
         self._data_bytes.extend(data_bytes)
 
+    def _add_block(self):
+        self._add_entry(zlib.compress(b'\n'.join(self._block)))
+        self._block = []
+
+    def add(self, data):
+        data_bytes = data.encode('utf-8')
+        if self.compress:
+            assert b'\n' not in data_bytes
+            self._block.append(data_bytes)
+            if len(self._block) == SpecWriter.jobs_per_block:
+                self._add_block()
+        else:
+            self._add_entry(data_bytes)
+
         self._n_elements += 1
 
     async def write(self):
+        if self._block:
+            self._add_block()
         end = len(self._data_bytes)
         self._offsets_bytes.extend(end.to_bytes(8, byteorder=SpecWriter.byteorder, signed=SpecWriter.signed))
 
@@ -0,0 +1,231 @@
+import asyncio
+import collections
+import errno
+import fcntl
+import hashlib
+import json
+import os
+import secrets
+import shutil
+from typing import Dict, List, Optional, Tuple
+
+from hailtop.aiotools.fs import FileStatus, RouterAsyncFS, Transfer
+from hailtop.utils import blocking_to_async
+
+from ..utils import Box, round_storage_bytes_to_gib
+from .transfer_service import TransferService
+
+# from linux/fs.h
+FICLONE = 0x40049409
+
+
+async def object_version(status: FileStatus) -> Optional[str]:
+    '''A string that changes whenever the object at a URL is replaced, or
+    None if the filesystem doesn't expose one.'''
+    for key in ('generation', 'etag'):
+        try:
+            return f'{key}:{await status[key]}'
+        except KeyError:
+            pass
+    md5 = await status.md5()
+    if md5 is not None:
+        return f'md5:{md5.hex()}'
+    return None
+
+
+class InputCacheEntry:
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self.pins = 0
+
+
+class InputCache:
+    '''A size-bounded cache of input objects shared by the jobs on a
+    worker.
+
+    Objects are keyed by URL and object version, so a replaced object
+    is never served stale.  Jobs pin the entries they use while they
+    copy them; unpinned entries are evicted least recently used first.
+    Callers must stat the object with the job's own credentials before
+    asking for it, so that jobs can only read cached objects they are
+    allowed to read.
+
+    The cache has no space of its own.  It takes whole GiB from
+    `space_remaining`, the worker's unreserved data disk space, as it
+    grows, and gives them back as entries are evicted, including when
+    a job needs the space (see `evict`).
+    '''
+
+    def __init__(self, root: str, space_remaining: Box, pool):
+        self.root = root
+        self.space_remaining = space_remaining
+        self.pool = pool
+        self.used_bytes = 0
+        self.reserved_gib = 0
+        self._entries: 'collections.OrderedDict[str, InputCacheEntry]' = collections.OrderedDict()
+        self._downloads: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def key(url: str, version: str) -> str:
+        return hashlib.sha256(json.dumps([url, version]).encode()).hexdigest()
+
+    def _pin(self, key: str) -> InputCacheEntry:
+        entry = self._entries[key]
+        self._entries.move_to_end(key)
+        entry.pins += 1
+        return entry
+
+    def release(self, key: str) -> None:
+        entry = self._entries[key]
+        assert entry.pins > 0
+        entry.pins -= 1
+
+    def _rebalance(self) -> None:
+        '''Take from or give back to the worker's free space so the cache
+        holds exactly the whole GiB its entries use.'''
+        needed_gib = round_storage_bytes_to_gib(self.used_bytes)
+        self.space_remaining.value -= needed_gib - self.reserved_gib
+        self.reserved_gib = needed_gib
+
+    def _fits(self, used_bytes: int) -> bool:
+        return round_storage_bytes_to_gib(used_bytes) - self.reserved_gib <= self.space_remaining.value
+
+    def _reserve(self, size: int) -> Optional[List[str]]:
+        '''Reserve `size` bytes, evicting unpinned entries as needed.
+        Returns the paths of the evicted entries, or None if there
+        isn't enough free or unpinned space.'''
+        victims = []
+        used_bytes = self.used_bytes + size
+        for key, entry in self._entries.items():
+            if self._fits(used_bytes):
+                break
+            if entry.pins == 0:
+                victims.append(key)
+                used_bytes -= entry.size
+        if not self._fits(used_bytes):
+            return None
+
+        victim_paths = [self._entries.pop(key).path for key in victims]
+        self.used_bytes = used_bytes
+        self._rebalance()
+        return victim_paths
+
+    def evict(self, gib: int) -> List[str]:
+        '''Evict unpinned entries until the worker has `gib` GiB free.
+        Evicts nothing if that isn't possible.  Returns the paths of the
+        evicted entries, which the caller must remove.'''
+
+        def fits(used_bytes):
+            return self.space_remaining.value + self.reserved_gib - round_storage_bytes_to_gib(used_bytes) >= gib
+
+        victims = []
+        used_bytes = self.used_bytes
+        for key, entry in self._entries.items():
+            if fits(used_bytes):
+                break
+            if entry.pins == 0:
+                victims.append(key)
+                used_bytes -= entry.size
+        if not fits(used_bytes):
+            return []
+
+        victim_paths = [self._entries.pop(key).path for key in victims]
+        self.used_bytes = used_bytes
+        self._rebalance()
+        return victim_paths
+
+    async def remove(self, paths: List[str]) -> None:
+        for path in paths:
+            await blocking_to_async(self.pool, _remove_if_exists, path)
+
+    async def _download(
+        self, transfers: TransferService, fs: RouterAsyncFS, url: str, key: str, size: int, evicted: List[str]
+    ) -> InputCacheEntry:
+        path = f'{self.root}/{key}'
+        tmp_path = f'{self.root}/tmp/{key}-{secrets.token_hex(8)}'
+        downloaded = False
+        try:
+            await self.remove(evicted)
+            await fs.makedirs(f'{self.root}/tmp/', exist_ok=True)
+            await transfers.copy(fs, [Transfer(url, tmp_path, treat_dest_as=Transfer.DEST_IS_TARGET)])
+            await blocking_to_async(self.pool, os.chmod, tmp_path, 0o444)
+            await blocking_to_async(self.pool, os.rename, tmp_path, path)
+            downloaded = True
+        finally:
+            if not downloaded:
+                self.used_bytes -= size
+                self._rebalance()
+                await blocking_to_async(self.pool, _remove_if_exists, tmp_path)
+        # pinned for the job that downloaded it, before any other job
+        # can evict it
+        entry = InputCacheEntry(path, size)
+        entry.pins = 1
+        self._entries[key] = entry
+        return entry
+
+    async def acquire(
+        self, transfers: TransferService, fs: RouterAsyncFS, url: str, status: FileStatus
+    ) -> Optional[Tuple[str, str, bool]]:
+        '''Pin the cached copy of `url`, downloading it through `fs` if
+        necessary.  Returns the cache key, the local path and whether
+        it was already cached, or None if the object can't be cached.
+        Pinned entries must be released with `release`.'''
+        version = await object_version(status)
+        if version is None:
+            return None
+        key = InputCache.key(url, version)
+        size = await status.size()
+
+        if key in self._entries:
+            return (key, self._pin(key).path, True)
+
+        download = self._downloads.get(key)
+        if download is not None:
+            try:
+                await asyncio.shield(download)
+            except Exception:
+                return None
+            if key not in self._entries:
+                # evicted before we got to pin it
+                return None
+            return (key, self._pin(key).path, True)
+
+        evicted = self._reserve(size)
+        if evicted is None:
+            return None
+
+        download = asyncio.ensure_future(self._download(transfers, fs, url, key, size, evicted))
+        self._downloads[key] = download
+        download.add_done_callback(lambda _: self._downloads.pop(key, None))
+        try:
+            entry = await asyncio.shield(download)
+        except asyncio.CancelledError:
+            download.add_done_callback(self._release_downloaded)
+            raise
+        return (key, entry.path, False)
+
+    def _release_downloaded(self, download: asyncio.Future) -> None:
+        if not download.cancelled() and download.exception() is None:
+            entry = download.result()
+            entry.pins -= 1
+
+
+def clone_or_copy(src: str, dest: str) -> None:
+    '''Copy `src` to a new, writable file at `dest`, sharing its blocks
+    if the filesystem supports reflinks.'''
+    with open(src, 'rb') as src_f, open(dest, 'wb') as dest_f:
+        try:
+            fcntl.ioctl(dest_f.fileno(), FICLONE, src_f.fileno())
+            return
+        except OSError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EXDEV):
+                raise
+    shutil.copyfile(src, dest)
+
+
+def _remove_if_exists(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import random
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import aiohttp
+
+log = logging.getLogger('job_status_reporter')
+
+
+class JobStatusReporter:
+    '''Posts job status updates to a driver endpoint in batches.
+
+    Updates queued while a request is in flight are sent together in the
+    next request, so a worker running many short jobs makes one request per
+    round trip to the driver rather than one per job.  `post_body` sends
+    one request body, `{'statuses': [...]}`, to the driver.
+    '''
+
+    MAX_UPDATES_PER_REQUEST = 100
+
+    def __init__(self, name: str, post_body: Callable[[Dict[str, Any]], Awaitable[None]]):
+        self.name = name
+        self.post_body = post_body
+        self.updates: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self.updates_available = asyncio.Event()
+
+    def post(self, status: Dict[str, Any]) -> asyncio.Future:
+        '''Queue `status` and return a future that completes once the driver
+        has received it.'''
+        fut = asyncio.get_event_loop().create_future()
+        self.updates.append((status, fut))
+        self.updates_available.set()
+        return fut
+
+    async def run(self):
+        while True:
+            await self.updates_available.wait()
+            updates = self.updates[: JobStatusReporter.MAX_UPDATES_PER_REQUEST]
+            del self.updates[: JobStatusReporter.MAX_UPDATES_PER_REQUEST]
+            if not self.updates:
+                self.updates_available.clear()
+
+            try:
+                await self.post_updates(updates)
+            except asyncio.CancelledError:
+                for _, fut in updates:
+                    fut.cancel()
+                raise
+            except Exception as e:
+                for _, fut in updates:
+                    if not fut.done():
+                        fut.set_exception(e)
+            else:
+                for _, fut in updates:
+                    if not fut.done():
+                        fut.set_result(None)
+
+    async def post_updates(self, updates: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        body = {'statuses': [status for status, _ in updates]}
+
+        delay_secs = 0.1
+        while True:
+            try:
+                await self.post_body(body)
+                return
+            except asyncio.CancelledError:  # pylint: disable=try-except-raise
+                raise
+            except Exception as e:
+                if isinstance(e, aiohttp.ClientResponseError) and e.status == 404:  # pylint: disable=no-member
+                    raise
+                log.warning(f'failed to post {len(updates)} {self.name} updates, retrying', exc_info=True)
+
+            await asyncio.sleep(delay_secs * random.uniform(0.7, 1.3))
+            # exponentially back off, up to (expected) max of 2m
+            delay_secs = min(delay_secs * 2, 2 * 60.0)
@@ -0,0 +1,68 @@
+import asyncio
+import base64
+import collections
+import hashlib
+import json
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from hailtop import httpx
+from hailtop.aiotools import WeightedSemaphore
+from hailtop.aiotools.fs import Copier, CopyReport, LocalAsyncFS, RouterAsyncFS, Transfer
+import hailtop.aiogoogle as aiogoogle
+
+
+class TransferService:
+    '''Copies job inputs and outputs in the worker process.
+
+    Every transfer on the worker shares one HTTP connection pool, one
+    bound on the number of concurrent file and part transfers, and one
+    bound on the memory used for transfer buffers.  Filesystems, and so
+    their access tokens, are kept for the most recently used user keys.
+    '''
+
+    def __init__(self, pool, max_concurrent_transfers: int = 100, max_filesystems: int = 16):
+        self.max_filesystems = max_filesystems
+        self.sema = asyncio.Semaphore(max_concurrent_transfers)
+        self.xfer_sema = WeightedSemaphore(20 * Copier.BUFFER_SIZE)
+        self._local_fs = LocalAsyncFS(pool)
+        self._http_session = httpx.ClientSession(
+            raise_for_status=True, connector=aiohttp.TCPConnector(limit=max_concurrent_transfers)
+        )
+        self._filesystems: 'collections.OrderedDict[Tuple[str, Optional[str]], RouterAsyncFS]' = (
+            collections.OrderedDict()
+        )
+
+    def user_fs(self, gsa_key: Dict[str, str], requester_pays_project: Optional[str]) -> RouterAsyncFS:
+        key_data = base64.b64decode(gsa_key['key.json'])
+        fs_key = (hashlib.sha256(key_data).hexdigest(), requester_pays_project)
+
+        fs = self._filesystems.get(fs_key)
+        if fs is not None:
+            self._filesystems.move_to_end(fs_key)
+            return fs
+
+        credentials = aiogoogle.Credentials.from_credentials_data(json.loads(key_data.decode()))
+        params = {'userProject': requester_pays_project} if requester_pays_project else None
+        session = aiogoogle.Session(credentials=credentials, params=params, http_session=self._http_session)
+        fs = RouterAsyncFS(
+            'file',
+            [self._local_fs, aiogoogle.GoogleStorageAsyncFS(storage_client=aiogoogle.StorageClient(session=session))],
+        )
+        self._filesystems[fs_key] = fs
+        while len(self._filesystems) > self.max_filesystems:
+            # the connection pool is shared, so there is nothing to close
+            self._filesystems.popitem(last=False)
+        return fs
+
+    async def copy(self, fs: RouterAsyncFS, transfers: List[Transfer]) -> CopyReport:
+        copier = Copier(fs, xfer_sema=self.xfer_sema)
+        copy_report = CopyReport(transfers)
+        async with self.sema:
+            await copier.copy(self.sema, copy_report, transfers, return_exceptions=False)
+        copy_report.mark_done()
+        return copy_report
+
+    async def close(self) -> None:
+        await self._http_session.close()
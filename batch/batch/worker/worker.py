@@ -1,15 +1,19 @@
 from typing import Optional, Dict, Callable, Tuple, Awaitable, Any
 import os
+import io
 import json
+import stat
 import sys
+import contextlib
 import re
 import logging
 import asyncio
-import random
 import traceback
 import base64
 import uuid
 import shutil
+import functools
+import urllib.parse
 import signal
 import aiohttp
 import aiohttp.client_exceptions
@@ -37,6 +41,7 @@ from hailtop.utils import (
     parse_docker_image_reference,
     blocking_to_async,
     periodically_call,
+    bounded_gather,
 )
 from hailtop.httpx import client_session
 from hailtop.batch_client.parse import parse_cpu_in_mcpu, parse_memory_in_bytes, parse_storage_in_bytes
@@ -72,6 +77,9 @@ from ..publicly_available_images import publicly_available_images
 from ..utils import storage_gib_to_bytes, Box
 
 from .disk import Disk
+from .input_cache import InputCache, clone_or_copy
+from .transfer_service import TransferService
+from .job_status_reporter import JobStatusReporter
 
 # uvloop.install()
 
@@ -104,6 +112,7 @@ BATCH_WORKER_IMAGE = os.environ['BATCH_WORKER_IMAGE']
 BATCH_WORKER_IMAGE_ID = os.environ['BATCH_WORKER_IMAGE_ID']
 UNRESERVED_WORKER_DATA_DISK_SIZE_GB = int(os.environ['UNRESERVED_WORKER_DATA_DISK_SIZE_GB'])
 assert UNRESERVED_WORKER_DATA_DISK_SIZE_GB >= 0
+INPUT_CACHE_PATH = '/batch/input-cache'
 
 log.info(f'CORES {CORES}')
 log.info(f'NAME {NAME}')
@@ -329,6 +338,10 @@ class Timings:
         self.timings[name] = dict()
         return ContainerStepManager(self.timings[name], self.is_deleted)
 
+    def record(self, name: str, values: Dict[str, float]):
+        assert name not in self.timings
+        self.timings[name] = values
+
     def to_dict(self):
         return self.timings
 
@@ -1001,6 +1014,147 @@ def copy_container(job, name, files, volume_mounts, cpu, memory, scratch, reques
     return Container(job, name, copy_spec)
 
 
+def is_plain_tree(root, path):
+    '''Whether `path`, every directory between `root` and it, and
+    everything below it are regular files or directories, not
+    symbolic links, pipes or devices.'''
+    current = root
+    for part in os.path.relpath(path, root).split(os.sep):
+        current = os.path.join(current, part)
+        if not os.path.lexists(current):
+            # missing sources fail the copy with the usual error
+            return True
+        mode = os.lstat(current).st_mode
+        if not (stat.S_ISREG(mode) or stat.S_ISDIR(mode)):
+            return False
+    for dirpath, dirnames, filenames in os.walk(path):
+        for name in dirnames + filenames:
+            mode = os.lstat(os.path.join(dirpath, name)).st_mode
+            if not (stat.S_ISREG(mode) or stat.S_ISDIR(mode)):
+                return False
+    return True
+
+
+class InProcessCopy:
+    '''Copies a job's inputs or outputs through the worker's transfer
+    service in place of a copy container, saving the container's
+    startup cost.  Reports the same status as a container so the
+    front end shows it as the job's input or output step.'''
+
+    def __init__(self, job, name, files):
+        self.job = job
+        self.name = name
+        self.files = files
+        self.deleted_event = asyncio.Event()
+
+        self.state = 'pending'
+        self.error = None
+        self.short_error = None
+        self.exit_code = None
+        self.log = ''
+
+        self.timings = Timings(self.is_job_deleted)
+
+    def is_job_deleted(self) -> bool:
+        return self.job.deleted
+
+    def step(self, name: str):
+        return self.timings.step(name)
+
+    async def copy(self, worker: 'Worker'):
+        fs = worker.transfer_service.user_fs(self.job.gsa_key, self.job.requester_pays_project)
+        transfers = [
+            aiotools.Transfer(
+                self.job.host_path(f['from']), self.job.host_path(f['to']), treat_dest_as=aiotools.Transfer.DEST_IS_TARGET
+            )
+            for f in self.files
+        ]
+        try:
+            copy_report = await worker.transfer_service.copy(fs, transfers)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # like the copy tool exiting with an error
+            self.log = traceback.format_exc()
+            self.exit_code = 1
+            return
+
+        summary = io.StringIO()
+        with contextlib.redirect_stdout(summary):
+            copy_report.summarize()
+        self.log = summary.getvalue()
+        self.exit_code = 0
+
+        duration_secs = max(copy_report._duration / 1000, 1e-3)
+        self.job.timings.record(
+            f'{self.name}_transfer',
+            {
+                'files': copy_report._progress.files,
+                'bytes': copy_report._progress.bytes,
+                'duration': copy_report._duration,
+                'bytes_per_second': copy_report._progress.bytes / duration_secs,
+            },
+        )
+
+    async def run(self, worker: 'Worker'):
+        try:
+            self.state = 'running'
+            with self.step('running'):
+                copy = asyncio.ensure_future(self.copy(worker))
+                deleted = asyncio.ensure_future(self.deleted_event.wait())
+                try:
+                    await asyncio.wait([copy, deleted], return_when=asyncio.FIRST_COMPLETED)
+                    if deleted.done():
+                        raise JobDeletedError()
+                    copy.result()
+                finally:
+                    for t in (copy, deleted):
+                        if not t.done():
+                            t.cancel()
+
+            with self.step('uploading_log'):
+                await worker.file_store.write_log_file(
+                    self.job.format_version,
+                    self.job.batch_id,
+                    self.job.job_id,
+                    self.job.attempt_id,
+                    self.name,
+                    self.log,
+                )
+
+            self.state = 'succeeded' if self.exit_code == 0 else 'failed'
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not isinstance(e, JobDeletedError):
+                log.exception(f'while running {self}')
+
+            self.state = 'error'
+            self.error = traceback.format_exc()
+
+    async def delete(self):
+        log.info(f'deleting {self}')
+        self.deleted_event.set()
+
+    async def status(self, state=None):
+        if not state:
+            state = self.state
+        status = {'name': self.name, 'state': state, 'timing': self.timings.to_dict()}
+        if self.error:
+            status['error'] = self.error
+        if self.short_error:
+            status['short_error'] = self.short_error
+        if self.exit_code is not None:
+            status['container_status'] = {'state': 'finished', 'exit_code': self.exit_code, 'out_of_memory': False}
+        return status
+
+    async def get_log(self):
+        return self.log
+
+    def __str__(self):
+        return f'in-process copy {self.job.id}/{self.name}'
+
+
 class Job:
     quota_project_id = 100
 
@@ -1223,6 +1377,10 @@ class DockerJob(Job):
 
         self.timings = Timings(lambda: False)
 
+        self.input_files = input_files
+        self.output_files = output_files
+        self.requester_pays_project = requester_pays_project
+
         if self.secrets:
             for secret in self.secrets:
                 volume_mount = {
@@ -1241,16 +1399,7 @@ class DockerJob(Job):
         containers = {}
 
         if input_files:
-            containers['input'] = copy_container(
-                self,
-                'input',
-                input_files,
-                self.input_volume_mounts,
-                self.cpu_in_mcpu,
-                self.memory_in_bytes,
-                self.scratch,
-                requester_pays_project,
-            )
+            containers['input'] = self.copy_step('input', input_files, self.input_volume_mounts)
 
         # main container
         main_spec = {
@@ -1279,25 +1428,60 @@ class DockerJob(Job):
         containers['main'] = Container(self, 'main', main_spec)
 
         if output_files:
-            containers['output'] = copy_container(
-                self,
-                'output',
-                output_files,
-                self.output_volume_mounts,
-                self.cpu_in_mcpu,
-                self.memory_in_bytes,
-                self.scratch,
-                requester_pays_project,
-            )
+            containers['output'] = self.copy_step('output', output_files, self.output_volume_mounts)
 
         self.containers = containers
 
     def step(self, name: str):
         return self.timings.step(name)
 
+    def host_path(self, path):
+        '''The worker's path for `path` in the job's /io directory.  Other
+        paths and URLs are returned unchanged.'''
+        if path.startswith('/io/'):
+            return self.io_host_path() + path[len('/io') :]
+        return path
+
+    def copy_step(self, name, files, volume_mounts):
+        '''The worker copies between GCS and the job's /io directory
+        itself.  Anything else, like other clouds or paths elsewhere in
+        the container, is copied by a container.'''
+        local, remote = ('to', 'from') if name == 'input' else ('from', 'to')
+
+        def is_io_path(path):
+            return path.startswith('/io/') and '..' not in path.split('/')
+
+        if all(urllib.parse.urlparse(f[remote]).scheme == 'gs' and is_io_path(f[local]) for f in files):
+            return InProcessCopy(self, name, files)
+        return copy_container(
+            self,
+            name,
+            files,
+            volume_mounts,
+            self.cpu_in_mcpu,
+            self.memory_in_bytes,
+            self.scratch,
+            self.requester_pays_project,
+        )
+
+    async def can_copy_outputs_in_process(self, worker):
+        '''The main container has written the job's /io directory, so
+        outputs are only copied in process if they can't lead outside it
+        or block.'''
+        for f in self.output_files:
+            src = f['from']
+            if not await blocking_to_async(worker.pool, is_plain_tree, self.io_host_path(), self.host_path(src)):
+                return False
+        return True
+
     async def setup_io(self):
         if not worker_config.job_private:
+            evicted = []
+            if worker.data_disk_space_remaining.value < self.external_storage_in_gib:
+                # cached inputs only use space no job has asked for
+                evicted = worker.input_cache.evict(self.external_storage_in_gib)
             if worker.data_disk_space_remaining.value < self.external_storage_in_gib:
+                await worker.input_cache.remove(evicted)
                 log.info(
                     f'worker data disk storage is full: {self.external_storage_in_gib}Gi requested and {worker.data_disk_space_remaining}Gi remaining'
                 )
@@ -1323,6 +1507,7 @@ class DockerJob(Job):
             log.info(
                 f'acquired {self.external_storage_in_gib}Gi from worker data disk storage with {worker.data_disk_space_remaining}Gi remaining'
             )
+            await worker.input_cache.remove(evicted)
 
         assert self.disk is None, self.disk
         os.makedirs(self.io_host_path())
@@ -1376,6 +1561,10 @@ class DockerJob(Job):
 
                 self.state = 'running'
 
+                if self.input_files and UNRESERVED_WORKER_DATA_DISK_SIZE_GB > 0:
+                    with self.step('localizing cached inputs'):
+                        await self.localize_cached_inputs(worker)
+
                 input = self.containers.get('input')
                 if input:
                     log.info(f'{self}: running input')
@@ -1391,6 +1580,17 @@ class DockerJob(Job):
                     log.info(f'{self} main: {main.state}')
 
                     output = self.containers.get('output')
+                    if isinstance(output, InProcessCopy) and not await self.can_copy_outputs_in_process(worker):
+                        output = self.containers['output'] = copy_container(
+                            self,
+                            'output',
+                            self.output_files,
+                            self.output_volume_mounts,
+                            self.cpu_in_mcpu,
+                            self.memory_in_bytes,
+                            self.scratch,
+                            self.requester_pays_project,
+                        )
                     if output:
                         log.info(f'{self}: running output')
                         await output.run(worker)
@@ -1427,6 +1627,69 @@ class DockerJob(Job):
 
                     await self.cleanup()
 
+    async def localize_cached_inputs(self, worker):
+        '''Serve the job's input objects from the worker's input cache
+        where possible.  Only the remaining inputs are left to the input
+        step.  Each job gets its own writable copy of a cached object,
+        as jobs may change, move or delete their inputs.  Copies share
+        blocks with the cache where the filesystem supports reflinks;
+        hard links don't work because the job's scratch directory is
+        its own XFS quota project and XFS refuses links across
+        projects.'''
+
+        def is_cacheable(f):
+            return (
+                urllib.parse.urlparse(f['from']).scheme == 'gs'
+                and not f['from'].endswith('/')
+                and f['to'].startswith('/io/')
+                and not f['to'].endswith('/')
+            )
+
+        cacheable = [f for f in self.input_files if is_cacheable(f)]
+        if not cacheable:
+            return
+
+        stats = {'hits': 0, 'misses': 0, 'bytes_saved': 0}
+        uncached = [f for f in self.input_files if not is_cacheable(f)]
+
+        fs = worker.transfer_service.user_fs(self.gsa_key, self.requester_pays_project)
+
+        async def localize(f):
+            try:
+                # statting with the user's credentials checks they can read the object
+                status = await fs.statfile(f['from'])
+                acquired = await worker.input_cache.acquire(worker.transfer_service, fs, f['from'], status)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.info(f'{self}: not caching input {f["from"]}', exc_info=True)
+                acquired = None
+            if acquired is None:
+                uncached.append(f)
+                return
+
+            key, path, hit = acquired
+            try:
+                dest = self.host_path(f['to'])
+                await blocking_to_async(worker.pool, os.makedirs, os.path.dirname(dest), exist_ok=True)
+                await blocking_to_async(worker.pool, clone_or_copy, path, dest)
+            finally:
+                worker.input_cache.release(key)
+            if hit:
+                stats['hits'] += 1
+                stats['bytes_saved'] += await status.size()
+            else:
+                stats['misses'] += 1
+
+        await bounded_gather(*[functools.partial(localize, f) for f in cacheable], parallelism=50)
+
+        self.timings.record('input_cache', stats)
+
+        if uncached:
+            self.containers['input'] = self.copy_step('input', uncached, self.input_volume_mounts)
+        else:
+            del self.containers['input']
+
     async def cleanup(self):
         self.end_time = time_msecs()
 
@@ -1435,6 +1698,7 @@ class DockerJob(Job):
             self.task_manager.ensure_future(worker.post_job_complete(self))
 
         log.info(f'{self}: cleaning up')
+
         try:
             if self.gcsfuse:
                 for b in self.gcsfuse:
@@ -1722,6 +1986,8 @@ class Worker:
         self.cpu_sem = FIFOWeightedSemaphore(self.cores_mcpu)
         self.data_disk_space_remaining = Box(UNRESERVED_WORKER_DATA_DISK_SIZE_GB)
         self.pool = concurrent.futures.ThreadPoolExecutor()
+        self.input_cache = InputCache(INPUT_CACHE_PATH, self.data_disk_space_remaining, self.pool)
+        self.transfer_service = TransferService(self.pool)
         self.jobs: Dict[Tuple[int, int], Job] = {}
         self.stop_event = asyncio.Event()
         self.task_manager = aiotools.BackgroundTaskManager()
@@ -1734,9 +2000,18 @@ class Worker:
         self.file_store = None
         self.headers = None
         self.compute_client = None
+        self.client_session = None
+
+        self.job_started_reporter = JobStatusReporter(
+            'job started', functools.partial(self.post_to_driver, '/api/v1alpha/instances/jobs_started')
+        )
+        self.job_complete_reporter = JobStatusReporter(
+            'job complete', functools.partial(self.post_to_driver, '/api/v1alpha/instances/jobs_complete')
+        )
 
     async def shutdown(self):
         self.task_manager.shutdown()
+        await self.transfer_service.close()
         if self.compute_client:
             await self.compute_client.close()
 
@@ -1762,7 +2037,9 @@ class Worker:
             start_job_id = body['start_job_id']
             addtl_spec = body['job_spec']
 
-            job_spec = await self.file_store.read_spec_file(batch_id, token, start_job_id, job_id)
+            job_spec = await self.file_store.read_spec_file(
+                batch_id, token, start_job_id, job_id, compressed=format_version.has_compressed_specs()
+            )
             job_spec = json.loads(job_spec)
 
             job_spec['attempt_id'] = addtl_spec['attempt_id']
@@ -1869,6 +2146,9 @@ class Worker:
         site = web.TCPSite(app_runner, '0.0.0.0', 5000)
         await site.start()
 
+        self.client_session = client_session()
+        self.task_manager.ensure_future(self.job_started_reporter.run())
+        self.task_manager.ensure_future(self.job_complete_reporter.run())
         self.task_manager.ensure_future(periodically_call(60, self.cleanup_old_images))
         try:
             while True:
@@ -1889,6 +2169,7 @@ class Worker:
             self.active = False
             log.info('shutting down')
             await self.file_store.close()
+            await self.client_session.close()
             await site.stop()
             log.info('stopped site')
             await app_runner.cleanup()
@@ -1913,6 +2194,10 @@ class Worker:
     async def kill(self, request):
         return await asyncio.shield(self.kill_1(request))
 
+    async def post_to_driver(self, path, body):
+        async with self.client_session.post(deploy_config.url('batch-driver', path), json=body, headers=self.headers):
+            pass
+
     async def post_job_complete_1(self, job):
         run_duration = job.end_time - job.start_time
 
@@ -1937,37 +2222,17 @@ class Worker:
             'status': db_status,
         }
 
-        body = {'status': status}
+        fut = self.job_complete_reporter.post(status)
 
-        start_time = time_msecs()
-        delay_secs = 0.1
-        while True:
-            try:
-                async with client_session() as session:
-                    await session.post(
-                        deploy_config.url('batch-driver', '/api/v1alpha/instances/job_complete'),
-                        json=body,
-                        headers=self.headers,
-                    )
-                    return
-            except asyncio.CancelledError:  # pylint: disable=try-except-raise
-                raise
-            except Exception as e:
-                if isinstance(e, aiohttp.ClientResponseError) and e.status == 404:  # pylint: disable=no-member
-                    raise
-                log.warning(f'failed to mark {job} complete, retrying', exc_info=True)
-
-            # unlist job after 3m or half the run duration
-            now = time_msecs()
-            elapsed = now - start_time
-            if job.id in self.jobs and elapsed > 180 * 1000 and elapsed > run_duration / 2:
+        # unlist job after 3m or half the run duration
+        try:
+            await asyncio.wait_for(asyncio.shield(fut), max(180, run_duration / 2 / 1000))
+        except asyncio.TimeoutError:
+            if job.id in self.jobs:
                 log.info(f'too much time elapsed marking {job} complete, removing from jobs, will keep retrying')
                 del self.jobs[job.id]
                 self.last_updated = time_msecs()
-
-            await asyncio.sleep(delay_secs * random.uniform(0.7, 1.3))
-            # exponentially back off, up to (expected) max of 2m
-            delay_secs = min(delay_secs * 2, 2 * 60.0)
+            await fut
 
     async def post_job_complete(self, job):
         try:
@@ -1994,16 +2259,7 @@ class Worker:
             'resources': full_status['resources'],
         }
 
-        body = {'status': status}
-
-        async with client_session() as session:
-            await request_retry_transient_errors(
-                session,
-                'POST',
-                deploy_config.url('batch-driver', '/api/v1alpha/instances/job_started'),
-                json=body,
-                headers=self.headers,
-            )
+        await self.job_started_reporter.post(status)
 
     async def post_job_started(self, job):
         try:
@@ -0,0 +1,194 @@
+DELIMITER $$
+
+DROP PROCEDURE IF EXISTS mark_job_complete_in_transaction $$
+CREATE PROCEDURE mark_job_complete_in_transaction(
+  IN in_batch_id BIGINT,
+  IN in_job_id INT,
+  IN in_attempt_id VARCHAR(40),
+  IN in_instance_name VARCHAR(100),
+  IN new_state VARCHAR(40),
+  IN new_status TEXT,
+  IN new_start_time BIGINT,
+  IN new_end_time BIGINT,
+  IN new_reason VARCHAR(40),
+  IN new_timestamp BIGINT,
+  OUT rc INT,
+  OUT cur_job_state VARCHAR(40),
+  OUT expected_attempt_id VARCHAR(40),
+  OUT delta_cores_mcpu INT
+)
+BEGIN
+  DECLARE cur_instance_state VARCHAR(40);
+  DECLARE cur_cores_mcpu INT;
+  DECLARE cur_end_time BIGINT;
+
+  SET cur_job_state = NULL;
+  SET expected_attempt_id = NULL;
+  SET delta_cores_mcpu = 0;
+
+  SELECT state, cores_mcpu
+  INTO cur_job_state, cur_cores_mcpu
+  FROM jobs
+  WHERE batch_id = in_batch_id AND job_id = in_job_id
+  FOR UPDATE;
+
+  CALL add_attempt(in_batch_id, in_job_id, in_attempt_id, in_instance_name, cur_cores_mcpu, delta_cores_mcpu);
+
+  SELECT end_time INTO cur_end_time FROM attempts
+  WHERE batch_id = in_batch_id AND job_id = in_job_id AND attempt_id = in_attempt_id
+  FOR UPDATE;
+
+  UPDATE attempts
+  SET start_time = new_start_time, end_time = new_end_time, reason = new_reason
+  WHERE batch_id = in_batch_id AND job_id = in_job_id AND attempt_id = in_attempt_id;
+
+  SELECT state INTO cur_instance_state FROM instances WHERE name = in_instance_name LOCK IN SHARE MODE;
+  IF cur_instance_state = 'active' AND cur_end_time IS NULL THEN
+    UPDATE instances
+    SET free_cores_mcpu = free_cores_mcpu + cur_cores_mcpu
+    WHERE name = in_instance_name;
+
+    SET delta_cores_mcpu = delta_cores_mcpu + cur_cores_mcpu;
+  END IF;
+
+  SELECT attempt_id INTO expected_attempt_id FROM jobs
+  WHERE batch_id = in_batch_id AND job_id = in_job_id
+  FOR UPDATE;
+
+  IF expected_attempt_id IS NOT NULL AND expected_attempt_id != in_attempt_id THEN
+    SET rc = 2;
+  ELSEIF cur_job_state = 'Ready' OR cur_job_state = 'Creating' OR cur_job_state = 'Running' THEN
+    UPDATE jobs
+    SET state = new_state, status = new_status, attempt_id = in_attempt_id
+    WHERE batch_id = in_batch_id AND job_id = in_job_id;
+
+    UPDATE batches SET n_completed = n_completed + 1 WHERE id = in_batch_id;
+    UPDATE batches
+      SET time_completed = new_timestamp,
+          `state` = 'complete'
+      WHERE id = in_batch_id AND n_completed = batches.n_jobs;
+
+    IF new_state = 'Cancelled' THEN
+      UPDATE batches SET n_cancelled = n_cancelled + 1 WHERE id = in_batch_id;
+    ELSEIF new_state = 'Error' OR new_state = 'Failed' THEN
+      UPDATE batches SET n_failed = n_failed + 1 WHERE id = in_batch_id;
+    ELSE
+      UPDATE batches SET n_succeeded = n_succeeded + 1 WHERE id = in_batch_id;
+    END IF;
+
+    UPDATE jobs
+      INNER JOIN `job_parents`
+        ON jobs.batch_id = `job_parents`.batch_id AND
+           jobs.job_id = `job_parents`.job_id
+      SET jobs.state = IF(jobs.n_pending_parents = 1, 'Ready', 'Pending'),
+          jobs.n_pending_parents = jobs.n_pending_parents - 1,
+          jobs.cancelled = IF(new_state = 'Success', jobs.cancelled, 1)
+      WHERE jobs.batch_id = in_batch_id AND
+            `job_parents`.batch_id = in_batch_id AND
+            `job_parents`.parent_id = in_job_id;
+
+    SET rc = 0;
+  ELSEIF cur_job_state = 'Cancelled' OR cur_job_state = 'Error' OR
+         cur_job_state = 'Failed' OR cur_job_state = 'Success' THEN
+    SET rc = 0;
+  ELSE
+    SET rc = 1;
+  END IF;
+END $$
+
+DROP PROCEDURE IF EXISTS mark_job_complete $$
+CREATE PROCEDURE mark_job_complete(
+  IN in_batch_id BIGINT,
+  IN in_job_id INT,
+  IN in_attempt_id VARCHAR(40),
+  IN in_instance_name VARCHAR(100),
+  IN new_state VARCHAR(40),
+  IN new_status TEXT,
+  IN new_start_time BIGINT,
+  IN new_end_time BIGINT,
+  IN new_reason VARCHAR(40),
+  IN new_timestamp BIGINT
+)
+BEGIN
+  DECLARE rc INT;
+  DECLARE cur_job_state VARCHAR(40);
+  DECLARE expected_attempt_id VARCHAR(40);
+  DECLARE delta_cores_mcpu INT DEFAULT 0;
+
+  START TRANSACTION;
+
+  CALL mark_job_complete_in_transaction(in_batch_id, in_job_id, in_attempt_id, in_instance_name,
+    new_state, new_status, new_start_time, new_end_time, new_reason, new_timestamp,
+    rc, cur_job_state, expected_attempt_id, delta_cores_mcpu);
+
+  COMMIT;
+
+  IF rc = 2 THEN
+    SELECT 2 as rc,
+      expected_attempt_id,
+      delta_cores_mcpu,
+      'input attempt id does not match expected attempt id' as message;
+  ELSEIF rc = 1 THEN
+    SELECT 1 as rc,
+      cur_job_state,
+      delta_cores_mcpu,
+      'job state not Ready, Creating, Running or complete' as message;
+  ELSE
+    SELECT 0 as rc,
+      cur_job_state as old_state,
+      delta_cores_mcpu;
+  END IF;
+END $$
+
+# in_jobs is a JSON array of objects with keys batch_id, job_id,
+# attempt_id, state, status, start_time and end_time; null values are
+# omitted and status is the JSON-encoded status text.  Returns one row
+# whose results column is a JSON array with one object per job, in
+# order, with the columns mark_job_complete would have returned.
+DROP PROCEDURE IF EXISTS mark_jobs_complete $$
+CREATE PROCEDURE mark_jobs_complete(
+  IN in_instance_name VARCHAR(100),
+  IN in_jobs JSON,
+  IN new_reason VARCHAR(40),
+  IN new_timestamp BIGINT
+)
+BEGIN
+  DECLARE i INT DEFAULT 0;
+  DECLARE cur_job JSON;
+  DECLARE rc INT;
+  DECLARE cur_job_state VARCHAR(40);
+  DECLARE expected_attempt_id VARCHAR(40);
+  DECLARE delta_cores_mcpu INT;
+  DECLARE results JSON DEFAULT JSON_ARRAY();
+
+  START TRANSACTION;
+
+  WHILE i < JSON_LENGTH(in_jobs) DO
+    SET cur_job = JSON_EXTRACT(in_jobs, CONCAT('$[', i, ']'));
+
+    CALL mark_job_complete_in_transaction(
+      JSON_EXTRACT(cur_job, '$.batch_id'),
+      JSON_EXTRACT(cur_job, '$.job_id'),
+      JSON_UNQUOTE(JSON_EXTRACT(cur_job, '$.attempt_id')),
+      in_instance_name,
+      JSON_UNQUOTE(JSON_EXTRACT(cur_job, '$.state')),
+      JSON_UNQUOTE(JSON_EXTRACT(cur_job, '$.status')),
+      JSON_EXTRACT(cur_job, '$.start_time'),
+      JSON_EXTRACT(cur_job, '$.end_time'),
+      new_reason,
+      new_timestamp,
+      rc, cur_job_state, expected_attempt_id, delta_cores_mcpu);
+
+    SET results = JSON_ARRAY_APPEND(results, '$', JSON_OBJECT(
+      'rc', rc,
+      'old_state', cur_job_state,
+      'expected_attempt_id', expected_attempt_id,
+      'delta_cores_mcpu', delta_cores_mcpu));
+    SET i = i + 1;
+  END WHILE;
+
+  COMMIT;
+  SELECT results;
+END $$
+
+DELIMITER ;
@@ -759,6 +759,7 @@ CREATE PROCEDURE close_batch(
 BEGIN
   DECLARE cur_batch_state VARCHAR(40);
   DECLARE expected_n_jobs INT;
+  DECLARE cur_n_completed INT;
   DECLARE staging_n_jobs INT;
   DECLARE staging_n_ready_jobs INT;
   DECLARE staging_ready_cores_mcpu BIGINT;
@@ -766,7 +767,7 @@ BEGIN
 
   START TRANSACTION;
 
-  SELECT `state`, n_jobs INTO cur_batch_state, expected_n_jobs FROM batches
+  SELECT `state`, n_jobs, n_completed INTO cur_batch_state, expected_n_jobs, cur_n_completed FROM batches
   WHERE id = in_batch_id AND NOT deleted
   FOR UPDATE;
 
@@ -783,7 +784,8 @@ BEGIN
     SELECT user INTO cur_user FROM batches WHERE id = in_batch_id;
 
     IF staging_n_jobs = expected_n_jobs THEN
-      IF expected_n_jobs = 0 THEN
+      # jobs of an open batch may all have completed before it was closed
+      IF cur_n_completed = expected_n_jobs THEN
         UPDATE batches SET `state` = 'complete', time_completed = in_timestamp, time_closed = in_timestamp
           WHERE id = in_batch_id;
       ELSE
@@ -791,6 +793,8 @@ BEGIN
           WHERE id = in_batch_id;
       END IF;
 
+      # bunches move their ready jobs to user_inst_coll_resources when they
+      # are inserted, this only moves those staged by older front ends
       INSERT INTO user_inst_coll_resources (user, inst_coll, token, n_ready_jobs, ready_cores_mcpu)
       SELECT user, inst_coll, 0, @n_ready_jobs := COALESCE(SUM(n_ready_jobs), 0), @ready_cores_mcpu := COALESCE(SUM(ready_cores_mcpu), 0)
       FROM batches_inst_coll_staging
@@ -832,7 +836,8 @@ BEGIN
   WHERE id = in_batch_id
   FOR UPDATE;
 
-  IF cur_batch_state = 'running' AND NOT cur_cancelled THEN
+  # the jobs of open batches are scheduled as their bunches are inserted
+  IF (cur_batch_state = 'open' OR cur_batch_state = 'running') AND NOT cur_cancelled THEN
     INSERT INTO user_inst_coll_resources (user, inst_coll, token,
       n_ready_jobs, ready_cores_mcpu,
       n_running_jobs, running_cores_mcpu,
@@ -1111,8 +1116,8 @@ BEGIN
   SELECT 0 as rc, delta_cores_mcpu;
 END $$
 
-DROP PROCEDURE IF EXISTS mark_job_complete $$
-CREATE PROCEDURE mark_job_complete(
+DROP PROCEDURE IF EXISTS mark_job_complete_in_transaction $$
+CREATE PROCEDURE mark_job_complete_in_transaction(
   IN in_batch_id BIGINT,
   IN in_job_id INT,
   IN in_attempt_id VARCHAR(40),
@@ -1122,17 +1127,20 @@ CREATE PROCEDURE mark_job_complete(
   IN new_start_time BIGINT,
   IN new_end_time BIGINT,
   IN new_reason VARCHAR(40),
-  IN new_timestamp BIGINT
+  IN new_timestamp BIGINT,
+  OUT rc INT,
+  OUT cur_job_state VARCHAR(40),
+  OUT expected_attempt_id VARCHAR(40),
+  OUT delta_cores_mcpu INT
 )
 BEGIN
-  DECLARE cur_job_state VARCHAR(40);
   DECLARE cur_instance_state VARCHAR(40);
   DECLARE cur_cores_mcpu INT;
   DECLARE cur_end_time BIGINT;
-  DECLARE delta_cores_mcpu INT DEFAULT 0;
-  DECLARE expected_attempt_id VARCHAR(40);
 
-  START TRANSACTION;
+  SET cur_job_state = NULL;
+  SET expected_attempt_id = NULL;
+  SET delta_cores_mcpu = 0;
 
   SELECT state, cores_mcpu
   INTO cur_job_state, cur_cores_mcpu
@@ -1164,21 +1172,18 @@ BEGIN
   FOR UPDATE;
 
   IF expected_attempt_id IS NOT NULL AND expected_attempt_id != in_attempt_id THEN
-    COMMIT;
-    SELECT 2 as rc,
-      expected_attempt_id,
-      delta_cores_mcpu,
-      'input attempt id does not match expected attempt id' as message;
+    SET rc = 2;
   ELSEIF cur_job_state = 'Ready' OR cur_job_state = 'Creating' OR cur_job_state = 'Running' THEN
     UPDATE jobs
     SET state = new_state, status = new_status, attempt_id = in_attempt_id
     WHERE batch_id = in_batch_id AND job_id = in_job_id;
 
     UPDATE batches SET n_completed = n_completed + 1 WHERE id = in_batch_id;
+    # an open batch is completed when it is closed
     UPDATE batches
       SET time_completed = new_timestamp,
           `state` = 'complete'
-      WHERE id = in_batch_id AND n_completed = batches.n_jobs;
+      WHERE id = in_batch_id AND `state` = 'running' AND n_completed = batches.n_jobs;
 
     IF new_state = 'Cancelled' THEN
       UPDATE batches SET n_cancelled = n_cancelled + 1 WHERE id = in_batch_id;
@@ -1199,23 +1204,108 @@ BEGIN
             `job_parents`.batch_id = in_batch_id AND
             `job_parents`.parent_id = in_job_id;
 
-    COMMIT;
-    SELECT 0 as rc,
-      cur_job_state as old_state,
-      delta_cores_mcpu;
+    SET rc = 0;
   ELSEIF cur_job_state = 'Cancelled' OR cur_job_state = 'Error' OR
          cur_job_state = 'Failed' OR cur_job_state = 'Success' THEN
-    COMMIT;
-    SELECT 0 as rc,
-      cur_job_state as old_state,
-      delta_cores_mcpu;
+    SET rc = 0;
   ELSE
-    COMMIT;
+    SET rc = 1;
+  END IF;
+END $$
+
+DROP PROCEDURE IF EXISTS mark_job_complete $$
+CREATE PROCEDURE mark_job_complete(
+  IN in_batch_id BIGINT,
+  IN in_job_id INT,
+  IN in_attempt_id VARCHAR(40),
+  IN in_instance_name VARCHAR(100),
+  IN new_state VARCHAR(40),
+  IN new_status TEXT,
+  IN new_start_time BIGINT,
+  IN new_end_time BIGINT,
+  IN new_reason VARCHAR(40),
+  IN new_timestamp BIGINT
+)
+BEGIN
+  DECLARE rc INT;
+  DECLARE cur_job_state VARCHAR(40);
+  DECLARE expected_attempt_id VARCHAR(40);
+  DECLARE delta_cores_mcpu INT DEFAULT 0;
+
+  START TRANSACTION;
+
+  CALL mark_job_complete_in_transaction(in_batch_id, in_job_id, in_attempt_id, in_instance_name,
+    new_state, new_status, new_start_time, new_end_time, new_reason, new_timestamp,
+    rc, cur_job_state, expected_attempt_id, delta_cores_mcpu);
+
+  COMMIT;
+
+  IF rc = 2 THEN
+    SELECT 2 as rc,
+      expected_attempt_id,
+      delta_cores_mcpu,
+      'input attempt id does not match expected attempt id' as message;
+  ELSEIF rc = 1 THEN
     SELECT 1 as rc,
       cur_job_state,
       delta_cores_mcpu,
       'job state not Ready, Creating, Running or complete' as message;
+  ELSE
+    SELECT 0 as rc,
+      cur_job_state as old_state,
+      delta_cores_mcpu;
   END IF;
 END $$
 
+# in_jobs is a JSON array of objects with keys batch_id, job_id,
+# attempt_id, state, status, start_time and end_time; null values are
+# omitted and status is the JSON-encoded status text.  Returns one row
+# whose results column is a JSON array with one object per job, in
+# order, with the columns mark_job_complete would have returned.
+DROP PROCEDURE IF EXISTS mark_jobs_complete $$
+CREATE PROCEDURE mark_jobs_complete(
+  IN in_instance_name VARCHAR(100),
+  IN in_jobs JSON,
+  IN new_reason VARCHAR(40),
+  IN new_timestamp BIGINT
+)
+BEGIN
+  DECLARE i INT DEFAULT 0;
+  DECLARE cur_job JSON;
+  DECLARE rc INT;
+  DECLARE cur_job_state VARCHAR(40);
+  DECLARE expected_attempt_id VARCHAR(40);
+  DECLARE delta_cores_mcpu INT;
+  DECLARE results JSON DEFAULT JSON_ARRAY();
+
+  START TRANSACTION;
+
+  WHILE i < JSON_LENGTH(in_jobs) DO
+    SET cur_job = JSON_EXTRACT(in_jobs, CONCAT('$[', i, ']'));
+
+    CALL mark_job_complete_in_transaction(
+      JSON_EXTRACT(cur_job, '$.batch_id'),
+      JSON_EXTRACT(cur_job, '$.job_id'),
+      JSON_UNQUOTE(JSON_EXTRACT(cur_job, '$.attempt_id')),
+      in_instance_name,
+      JSON_UNQUOTE(JSON_EXTRACT(cur_job, '$.state')),
+      JSON_UNQUOTE(JSON_EXTRACT(cur_job, '$.status')),
+      JSON_EXTRACT(cur_job, '$.start_time'),
+      JSON_EXTRACT(cur_job, '$.end_time'),
+      new_reason,
+      new_timestamp,
+      rc, cur_job_state, expected_attempt_id, delta_cores_mcpu);
+
+    SET results = JSON_ARRAY_APPEND(results, '$', JSON_OBJECT(
+      'rc', rc,
+      'old_state', cur_job_state,
+      'expected_attempt_id', expected_attempt_id,
+      'delta_cores_mcpu', delta_cores_mcpu));
+    SET i = i + 1;
+  END WHILE;
+
+  COMMIT;
+  SELECT results;
+END $$
+
 DELIMITER ;
@@ -1,4 +1,5 @@
 import os
+import aiohttp
 import pytest
 from hailtop.batch_client.aioclient import BatchClient
 
@@ -24,3 +25,72 @@ async def test_job(client):
     assert j._get_exit_code(status, 'main') == 0, (status, await j.log())
     assert (await j.log())['main'] == 'test\n'
     assert await j.is_complete()
+
+
+async def test_long_poll_wait(client):
+    b = client.create_batch()
+    j = b.create_job(DOCKER_ROOT_IMAGE, ['sleep', '5'])
+    b = await b.submit()
+
+    resp = await client._get(f'/api/v1alpha/batches/{b.id}/wait', params={'last_n_completed': 0, 'timeout': 60},
+                             timeout=aiohttp.ClientTimeout(total=90))
+    status = await resp.json()
+    assert status['complete'] and status['n_completed'] == 1, status
+
+    # already complete, returns immediately
+    resp = await client._get(f'/api/v1alpha/batches/{b.id}/jobs/{j.job_id}/wait', params={'timeout': 60},
+                             timeout=aiohttp.ClientTimeout(total=90))
+    status = await resp.json()
+    assert status['state'] == 'Success', (status, await j.log())
+
+
+async def test_long_poll_wait_bad_last_n_completed(client):
+    b = client.create_batch()
+    b.create_job(DOCKER_ROOT_IMAGE, ['true'])
+    b = await b.submit()
+
+    with pytest.raises(aiohttp.ClientResponseError) as excinfo:
+        await client._get(f'/api/v1alpha/batches/{b.id}/wait', params={'last_n_completed': 'one'})
+    assert excinfo.value.status == 400, excinfo.value
+
+
+async def test_streaming_submission(client):
+    builder = client.create_batch()
+    b = await builder.open()
+    head = builder.create_job(DOCKER_ROOT_IMAGE, ['echo', 'head'])
+    await builder.flush()
+    assert head.batch_id == b.id
+
+    # flushed jobs run before the batch is closed
+    status = await head.wait()
+    assert status['state'] == 'Success', status
+    assert not (await b.status())['closed']
+
+    # including the children of jobs that already completed
+    tails = [builder.create_job(DOCKER_ROOT_IMAGE, ['echo', 'tail'], parents=[head]) for _ in range(3)]
+    await builder.flush()
+    for tail in tails:
+        status = await tail.wait()
+        assert status['state'] == 'Success', status
+
+    last = builder.create_job(DOCKER_ROOT_IMAGE, ['true'], parents=tails)
+    b = await builder.submit()
+
+    status = await b.wait()
+    assert status['state'] == 'success', status
+    assert status['n_jobs'] == 5, status
+    assert (await last.status())['state'] == 'Success'
+
+
+async def test_close_streamed_batch_after_its_jobs_complete(client):
+    builder = client.create_batch()
+    await builder.open()
+    j = builder.create_job(DOCKER_ROOT_IMAGE, ['true'])
+    await builder.flush()
+    status = await j.wait()
+    assert status['state'] == 'Success', status
+
+    b = await builder.submit()
+    status = await b.status()
+    assert status['complete'] and status['state'] == 'success', status
+    assert status['n_jobs'] == 1 and status['n_completed'] == 1, status
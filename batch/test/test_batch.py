@@ -397,6 +397,53 @@ def test_cancel_batch(client):
             raise
 
 
+def test_cancel_job(client):
+    b = client.create_batch()
+    head = b.create_job(DOCKER_ROOT_IMAGE, ['sleep', '5'])
+    tail = b.create_job(DOCKER_ROOT_IMAGE, ['true'], parents=[head])
+    other = b.create_job(DOCKER_ROOT_IMAGE, ['true'], parents=[head])
+    b = b.submit()
+
+    tail.cancel()
+
+    status = tail.wait()
+    assert status['state'] == 'Cancelled', str(status)
+    status = head.wait()
+    assert status['state'] == 'Success', str(status)
+    status = other.wait()
+    assert status['state'] == 'Success', str(status)
+
+
+def test_many_short_jobs_marked_started_and_complete(client):
+    # workers report jobs like these to the jobs_started and jobs_complete
+    # endpoints several at a time
+    b = client.create_batch()
+    n_jobs = 40
+    jobs = [
+        b.create_job(DOCKER_ROOT_IMAGE, ['bash', '-c', 'exit 1' if i % 10 == 0 else 'true'])
+        for i in range(n_jobs)
+    ]
+    children = [b.create_job(DOCKER_ROOT_IMAGE, ['true'], parents=[j]) for j in jobs[:2]]
+    b = b.submit()
+    status = b.wait()
+
+    assert status['state'] == 'failure', str(status)
+    assert status['n_jobs'] == n_jobs + 2, str(status)
+    assert status['n_succeeded'] == n_jobs - 4 + 1, str(status)
+    assert status['n_failed'] == 4, str(status)
+    assert status['n_cancelled'] == 1, str(status)
+
+    assert children[0].status()['state'] == 'Cancelled'
+    assert children[1].status()['state'] == 'Success'
+
+    for j in jobs:
+        attempts = j.attempts()
+        assert len(attempts) >= 1, str(attempts)
+        attempt = attempts[-1]
+        assert 'start_time' in attempt and 'end_time' in attempt, str(attempts)
+        assert attempt['reason'] == 'completed', str(attempts)
+
+
 def test_get_nonexistent_job(client):
     try:
         client.get_job(1, 666)
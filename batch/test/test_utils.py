@@ -1,5 +1,18 @@
+import asyncio
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+import pytest
+
+from hailtop.aiotools import FileStatus, LocalAsyncFS, RouterAsyncFS
 from hailtop.batch_client.parse import parse_memory_in_bytes
-from batch.utils import adjust_cores_for_packability
+from batch.utils import adjust_cores_for_packability, Box
+from batch.spec_writer import SpecWriter
+from batch.worker.input_cache import InputCache, clone_or_copy
+from batch.worker.job_status_reporter import JobStatusReporter
+from batch.worker.transfer_service import TransferService
 
 
 def test_packability():
@@ -23,3 +36,158 @@ def test_memory_str_to_bytes():
     assert parse_memory_in_bytes('7') == 7
     assert parse_memory_in_bytes('1K') == 1000
     assert parse_memory_in_bytes('1Ki') == 1024
+
+
+class FakeSpecFileStore:
+    async def write_spec_file(self, batch_id, token, data_bytes, offsets_bytes):
+        self.data_bytes = data_bytes
+        self.offsets_bytes = offsets_bytes
+
+
+def test_compressed_spec_writer():
+    start_job_id = 3
+    specs = [json.dumps({'job_id': job_id, 'process': {'command': ['echo', str(job_id)]}})
+             for job_id in range(start_job_id, start_job_id + 100)]
+
+    file_store = FakeSpecFileStore()
+    spec_writer = SpecWriter(file_store, 1, compress=True)
+    for spec in specs:
+        spec_writer.add(spec)
+    asyncio.get_event_loop().run_until_complete(spec_writer.write())
+
+    for job_id, spec in enumerate(specs, start_job_id):
+        idx_start, idx_end = SpecWriter.get_index_file_offsets(job_id, start_job_id, compressed=True)
+        offsets = file_store.offsets_bytes[idx_start:idx_end + 1]
+        spec_start, spec_end = SpecWriter.get_spec_file_offsets(offsets)
+        block = bytes(file_store.data_bytes[spec_start:spec_end + 1])
+        assert SpecWriter.get_spec_from_block(block, job_id, start_job_id) == spec
+
+
+class FakeFileStatus(FileStatus):
+    def __init__(self, size, generation):
+        self._size = size
+        self._generation = generation
+
+    async def size(self):
+        return self._size
+
+    async def __getitem__(self, key):
+        if key == 'generation':
+            return self._generation
+        raise KeyError(key)
+
+
+def test_input_cache():
+    async def test():
+        with tempfile.TemporaryDirectory() as tmpdir, ThreadPoolExecutor() as thread_pool:
+            async with RouterAsyncFS('file', [LocalAsyncFS(thread_pool)]) as fs:
+                transfers = TransferService(thread_pool)
+                for name in ('a', 'b', 'c'):
+                    await fs.write(f'{tmpdir}/{name}', name.encode() * 10)
+
+                # the cache takes whole GiB of the worker's free space
+                half_gib = 2 ** 29
+                space_remaining = Box(1)
+                cache = InputCache(f'{tmpdir}/cache', space_remaining, thread_pool)
+                a_key, a_path, hit = await cache.acquire(transfers, fs, f'{tmpdir}/a', FakeFileStatus(half_gib, '1'))
+                assert not hit and await fs.read(a_path) == b'a' * 10
+                assert space_remaining.value == 0
+                assert await cache.acquire(transfers, fs, f'{tmpdir}/a', FakeFileStatus(half_gib, '1')) == (
+                    a_key,
+                    a_path,
+                    True,
+                )
+                cache.release(a_key)
+
+                b_key, _, _ = await cache.acquire(transfers, fs, f'{tmpdir}/b', FakeFileStatus(half_gib, '1'))
+                # a is still pinned once and b is pinned, so there is no room for c
+                assert await cache.acquire(transfers, fs, f'{tmpdir}/c', FakeFileStatus(half_gib, '1')) is None
+                assert cache.evict(1) == []
+
+                # a new generation of a is a different object; the old one is evicted
+                cache.release(a_key)
+                new_a_key, new_a_path, hit = await cache.acquire(
+                    transfers, fs, f'{tmpdir}/a', FakeFileStatus(half_gib, '2')
+                )
+                assert not hit and new_a_key != a_key
+                assert not await fs.exists(a_path)
+                assert cache.used_bytes == 2 * half_gib
+
+                # a job that needs the space gets it once nothing is pinned
+                cache.release(b_key)
+                cache.release(new_a_key)
+                evicted = cache.evict(1)
+                assert sorted(evicted) == sorted([new_a_path, f'{tmpdir}/cache/{b_key}'])
+                assert space_remaining.value == 1 and cache.used_bytes == 0
+                await cache.remove(evicted)
+                assert not await fs.exists(new_a_path)
+
+                # jobs get writable copies of cached objects
+                clone_or_copy(f'{tmpdir}/b', f'{tmpdir}/b-copy')
+                with open(f'{tmpdir}/b-copy', 'ab') as f:
+                    f.write(b'!')
+                assert await fs.read(f'{tmpdir}/b') == b'b' * 10
+                await transfers.close()
+
+    asyncio.get_event_loop().run_until_complete(test())
+
+
+def test_job_status_reporter_coalesces_updates():
+    async def test():
+        bodies = []
+        first_request_received = asyncio.Event()
+        release_first_request = asyncio.Event()
+
+        async def post_body(body):
+            bodies.append(body)
+            if len(bodies) == 1:
+                first_request_received.set()
+                await release_first_request.wait()
+
+        reporter = JobStatusReporter('test', post_body)
+        task = asyncio.ensure_future(reporter.run())
+        try:
+            first = reporter.post({'job_id': 0})
+            await first_request_received.wait()
+
+            # queued while the first request is in flight
+            rest = [reporter.post({'job_id': i}) for i in range(1, JobStatusReporter.MAX_UPDATES_PER_REQUEST + 6)]
+            assert not first.done()
+
+            release_first_request.set()
+            await asyncio.gather(first, *rest)
+
+            assert [len(body['statuses']) for body in bodies] == [1, JobStatusReporter.MAX_UPDATES_PER_REQUEST, 5]
+            job_ids = [status['job_id'] for body in bodies for status in body['statuses']]
+            assert job_ids == list(range(JobStatusReporter.MAX_UPDATES_PER_REQUEST + 6))
+        finally:
+            task.cancel()
+
+    asyncio.get_event_loop().run_until_complete(test())
+
+
+def test_job_status_reporter_retries_and_fails():
+    async def test():
+        n_attempts = 0
+
+        async def post_body(body):
+            nonlocal n_attempts
+            n_attempts += 1
+            if body['statuses'][0]['job_id'] == 'missing':
+                raise aiohttp.ClientResponseError(None, (), status=404)
+            if n_attempts < 3:
+                raise aiohttp.ClientResponseError(None, (), status=503)
+
+        reporter = JobStatusReporter('test', post_body)
+        task = asyncio.ensure_future(reporter.run())
+        try:
+            await reporter.post({'job_id': 0})
+            assert n_attempts == 3
+
+            with pytest.raises(aiohttp.ClientResponseError):
+                await reporter.post({'job_id': 'missing'})
+            assert n_attempts == 4
+        finally:
+            task.cancel()
+
+    asyncio.get_event_loop().run_until_complete(test())
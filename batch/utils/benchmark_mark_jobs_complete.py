@@ -0,0 +1,174 @@
+'''Time marking jobs complete one at a time against marking them in bulk.
+
+Run against a scratch MySQL database loaded with sql/estimated-current.sql,
+for example a local MySQL container:
+
+    docker run -d -p 3306:3306 -e MYSQL_ROOT_PASSWORD=pw -e MYSQL_DATABASE=batch mysql:8.0
+    mysql -h 127.0.0.1 -u root -ppw batch < sql/estimated-current.sql
+    python3 utils/benchmark_mark_jobs_complete.py --password pw
+
+Each run creates a batch of Running jobs on one active instance and marks
+them complete, either with one mark_job_complete call per job, as the
+driver did for every job_complete request, or with one mark_jobs_complete
+call per group of --jobs-per-call jobs, as the driver does for a
+jobs_complete request.  Both use --parallelism concurrent connections.
+'''
+
+import argparse
+import asyncio
+import json
+import secrets
+import time
+
+import aiomysql
+
+
+async def setup(pool, n_jobs):
+    suffix = secrets.token_hex(4)
+    inst_coll = f'benchmark-{suffix}'
+    instance_name = f'benchmark-instance-{suffix}'
+    billing_project = f'benchmark-{suffix}'
+    now = int(time.time() * 1000)
+
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute('SELECT * FROM globals;')
+            if await cursor.fetchone() is None:
+                await cursor.execute(
+                    "INSERT INTO globals (instance_id, internal_token, n_tokens) VALUES ('benchmark', 'benchmark', 200);"
+                )
+            await cursor.execute(
+                '''
+INSERT INTO inst_colls (name, is_pool, boot_disk_size_gb, max_instances, max_live_instances)
+VALUES (%s, 1, 10, 1, 1);
+''',
+                (inst_coll,),
+            )
+            await cursor.execute(
+                '''
+INSERT INTO instances (name, state, token, cores_mcpu, free_cores_mcpu, time_created, last_updated,
+  version, inst_coll, machine_type, preemptible)
+VALUES (%s, 'active', 'token', %s, 0, %s, %s, 0, %s, 'n1-standard-1', 1);
+''',
+                (instance_name, 250 * n_jobs, now, now, inst_coll),
+            )
+            await cursor.execute('INSERT INTO billing_projects (name) VALUES (%s);', (billing_project,))
+            await cursor.execute(
+                '''
+INSERT INTO batches (userdata, user, billing_project, state, n_jobs, time_created, time_closed, format_version)
+VALUES ('{}', 'benchmark', %s, 'running', %s, %s, %s, 6);
+''',
+                (billing_project, n_jobs, now, now),
+            )
+            batch_id = cursor.lastrowid
+            await cursor.executemany(
+                '''
+INSERT INTO jobs (batch_id, job_id, state, spec, always_run, cores_mcpu, n_pending_parents, attempt_id, inst_coll)
+VALUES (%s, %s, 'Running', '{}', 0, 250, 0, 'attempt', %s);
+''',
+                [(batch_id, job_id, inst_coll) for job_id in range(1, n_jobs + 1)],
+            )
+            await cursor.executemany(
+                '''
+INSERT INTO attempts (batch_id, job_id, attempt_id, instance_name, start_time)
+VALUES (%s, %s, 'attempt', %s, %s);
+''',
+                [(batch_id, job_id, instance_name, now) for job_id in range(1, n_jobs + 1)],
+            )
+        await conn.commit()
+
+    return batch_id, instance_name
+
+
+async def call(pool, sql, args):
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql, args)
+            await cursor.fetchall()
+
+
+async def mark_complete_one_at_a_time(pool, batch_id, instance_name, job_ids):
+    now = int(time.time() * 1000)
+    for job_id in job_ids:
+        await call(
+            pool,
+            'CALL mark_job_complete(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s);',
+            (batch_id, job_id, 'attempt', instance_name, 'Success', '{}', now, now, 'completed', now),
+        )
+
+
+async def mark_complete_in_bulk(pool, batch_id, instance_name, job_ids, jobs_per_call):
+    now = int(time.time() * 1000)
+    for i in range(0, len(job_ids), jobs_per_call):
+        jobs = [
+            {
+                'batch_id': batch_id,
+                'job_id': job_id,
+                'attempt_id': 'attempt',
+                'state': 'Success',
+                'status': '{}',
+                'start_time': now,
+                'end_time': now,
+            }
+            for job_id in job_ids[i : i + jobs_per_call]
+        ]
+        await call(
+            pool, 'CALL mark_jobs_complete(%s, %s, %s, %s);', (instance_name, json.dumps(jobs), 'completed', now)
+        )
+
+
+async def run(args, pool, bulk):
+    batch_id, instance_name = await setup(pool, args.n_jobs)
+    job_ids = list(range(1, args.n_jobs + 1))
+    shards = [job_ids[i :: args.parallelism] for i in range(args.parallelism)]
+
+    start = time.time()
+    if bulk:
+        await asyncio.gather(
+            *[mark_complete_in_bulk(pool, batch_id, instance_name, shard, args.jobs_per_call) for shard in shards]
+        )
+    else:
+        await asyncio.gather(*[mark_complete_one_at_a_time(pool, batch_id, instance_name, shard) for shard in shards])
+    elapsed = time.time() - start
+
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute('SELECT n_completed FROM batches WHERE id = %s;', (batch_id,))
+            (n_completed,) = await cursor.fetchone()
+    assert n_completed == args.n_jobs, (n_completed, args.n_jobs)
+
+    name = f'mark_jobs_complete ({args.jobs_per_call} jobs per call)' if bulk else 'mark_job_complete'
+    print(f'{name}: {args.n_jobs} jobs in {elapsed:.2f}s, {args.n_jobs / elapsed:.0f} jobs/s')
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3306)
+    parser.add_argument('--user', default='root')
+    parser.add_argument('--password', default='')
+    parser.add_argument('--db', default='batch')
+    parser.add_argument('--n-jobs', type=int, default=5000)
+    parser.add_argument('--jobs-per-call', type=int, default=100)
+    parser.add_argument('--parallelism', type=int, default=8)
+    args = parser.parse_args()
+
+    pool = await aiomysql.create_pool(
+        maxsize=args.parallelism,
+        host=args.host,
+        port=args.port,
+        user=args.user,
+        password=args.password,
+        db=args.db,
+        autocommit=True,
+    )
+    try:
+        await run(args, pool, bulk=False)
+        await run(args, pool, bulk=True)
+    finally:
+        pool.close()
+        await pool.wait_closed()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,51 @@
+import functools
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from hailtop.aiotools import LocalAsyncFS, ReadAheadReadableStream
+from hailtop.utils import async_to_blocking
+
+from .utils import benchmark
+
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+@functools.lru_cache()
+def stream_copy_source():
+    path = os.path.join(tempfile.mkdtemp(), 'src')
+    with open(path, 'wb') as f:
+        for _ in range(16):
+            f.write(os.urandom(CHUNK_SIZE))
+    return path
+
+
+async def stream_copy(src, dest, read_ahead):
+    with ThreadPoolExecutor() as thread_pool:
+        fs = LocalAsyncFS(thread_pool)
+        srcf = await fs.open(src)
+        if read_ahead:
+            srcf = ReadAheadReadableStream(srcf, CHUNK_SIZE, n_chunks=1)
+        async with srcf:
+            async with await fs.create(dest) as destf:
+                while True:
+                    b = await srcf.read(CHUNK_SIZE)
+                    if not b:
+                        break
+                    await destf.write(b)
+
+
+def local_stream_copy(read_ahead):
+    src = stream_copy_source()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        async_to_blocking(stream_copy(src, os.path.join(tmpdir, 'dest'), read_ahead))
+
+
+@benchmark()
+def local_stream_copy_128MiB():
+    local_stream_copy(read_ahead=False)
+
+
+@benchmark()
+def local_stream_copy_read_ahead_128MiB():
+    local_stream_copy(read_ahead=True)
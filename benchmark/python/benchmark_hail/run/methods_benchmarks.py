@@ -245,3 +245,29 @@ def logistic_regression_rows_wald_nd(mt_path):
                                           x=mt.x,
                                           covariates=[mt[key] for key in cov_dict.keys()])
     res._force_count()
+
+
+def _linear_mixed_model_alternatives(n=500, f=3, m=20_000):
+    import numpy as np
+    rng = np.random.RandomState(0)
+    x = np.hstack([np.ones((n, 1)), rng.normal(size=(n, f - 1))])
+    z = rng.normal(size=(n, n)) / np.sqrt(n)
+    y = x @ rng.normal(size=f) + z @ rng.normal(size=n) + rng.normal(size=n)
+    model, p = hl.stats.LinearMixedModel.from_kinship(y, x, z @ z.T)
+    model.fit()
+    # p is a view with negative strides, which matmul doesn't hand to BLAS
+    return model, np.ascontiguousarray(p) @ rng.normal(size=(n, m))
+
+
+@benchmark()
+def linear_mixed_model_fit_alternatives_numpy():
+    model, pa = _linear_mixed_model_alternatives()
+    model.fit_alternatives_numpy(pa, return_pandas=True)
+
+
+@benchmark()
+def linear_mixed_model_fit_alternatives_numpy_per_alternative():
+    # the per-alternative loop fit_alternatives_numpy replaced, for comparison
+    model, pa = _linear_mixed_model_alternatives()
+    for i in range(pa.shape[1]):
+        model._fit_alternative_numpy(pa[:, i], None)
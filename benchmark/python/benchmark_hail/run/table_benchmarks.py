@@ -425,3 +425,17 @@ def test_left_join_region_memory():
     high_mem_table2 = hl.utils.range_table(30).naive_coalesce(1).annotate(big_array=hl.zeros(50_000_000))
     joined = high_mem_table.join(high_mem_table2, how='left')
     joined._force_count()
+
+
+@benchmark()
+def python_only_1k_annotate_filter_render():
+    from hail.ir.renderer import CSERenderer
+
+    ht = hl.utils.range_table(100)
+    ht = ht.annotate(x=ht.idx)
+    for i in range(500):
+        ht = ht.annotate(x=ht.x + i)
+        ht = ht.filter(ht.x > i)
+    CSERenderer()(ht._tir)
+    str(ht._tir)
+    hash(ht._tir)
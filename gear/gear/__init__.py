@@ -9,6 +9,7 @@ from .auth import (
     web_authenticated_developers_only,
     rest_authenticated_developers_only,
     maybe_parse_bearer_header,
+    invalidate_userdata,
 )
 from .csrf import new_csrf_token, check_csrf_token
 from .auth_utils import insert_user, create_session
@@ -31,5 +32,6 @@ __all__ = [
     'create_session',
     'transaction',
     'maybe_parse_bearer_header',
+    'invalidate_userdata',
     'monitor_endpoints_middleware',
 ]
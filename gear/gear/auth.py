@@ -1,5 +1,8 @@
-from typing import Optional
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+import asyncio
+import collections
 import logging
+import time
 from functools import wraps
 import urllib.parse
 import aiohttp
@@ -8,6 +11,8 @@ import aiohttp_session
 from hailtop.config import get_deploy_config
 from hailtop.auth import async_get_userinfo
 
+from .metrics import USERDATA_CACHE_LOOKUPS, USERDATA_CACHE_SIZE
+
 log = logging.getLogger('gear.auth')
 
 deploy_config = get_deploy_config()
@@ -15,15 +20,94 @@ deploy_config = get_deploy_config()
 BEARER = 'Bearer '
 
 
+class UserdataCache:
+    '''A bounded cache of session ID to userdata.
+
+    Only the process that deletes a session can invalidate its entry, so
+    userdata is kept for just `ttl_secs`: a deleted session or user keeps
+    working for at most that long in every other service.  Unknown
+    sessions are cached for `negative_ttl_secs`.  Concurrent lookups of
+    the same session share one request.
+    '''
+
+    def __init__(self, max_size: int = 10000, ttl_secs: float = 5, negative_ttl_secs: float = 5):
+        self.max_size = max_size
+        self.ttl_secs = ttl_secs
+        self.negative_ttl_secs = negative_ttl_secs
+        self._entries: 'collections.OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]' = (
+            collections.OrderedDict()
+        )
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._invalidated_while_loading: Set[str] = set()
+
+    async def get(
+        self, session_id: str, load: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            expires, userdata = entry
+            if time.monotonic() < expires:
+                self._entries.move_to_end(session_id)
+                USERDATA_CACHE_LOOKUPS.labels(result='hit' if userdata else 'negative_hit').inc()
+                return userdata
+            del self._entries[session_id]
+
+        USERDATA_CACHE_LOOKUPS.labels(result='miss').inc()
+
+        loading = self._loading.get(session_id)
+        if loading is None:
+            loading = asyncio.ensure_future(self._load(session_id, load))
+            self._loading[session_id] = loading
+        return await asyncio.shield(loading)
+
+    async def _load(
+        self, session_id: str, load: Callable[[str], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Optional[Dict[str, Any]]:
+        try:
+            userdata = await load(session_id)
+        finally:
+            del self._loading[session_id]
+            invalidated = session_id in self._invalidated_while_loading
+            self._invalidated_while_loading.discard(session_id)
+        # the userdata of a session invalidated while it was loading may
+        # be stale, so it isn't cached
+        if not invalidated:
+            ttl = self.ttl_secs if userdata else self.negative_ttl_secs
+            self._entries[session_id] = (time.monotonic() + ttl, userdata)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            USERDATA_CACHE_SIZE.set(len(self._entries))
+        return userdata
+
+    def invalidate(self, session_id: str) -> None:
+        self._entries.pop(session_id, None)
+        if session_id in self._loading:
+            self._invalidated_while_loading.add(session_id)
+        USERDATA_CACHE_SIZE.set(len(self._entries))
+
+
+userdata_cache = UserdataCache()
+
+
+def invalidate_userdata(session_id: str) -> None:
+    '''Forget the cached userdata of `session_id`, for example after
+    deleting the session.'''
+    userdata_cache.invalidate(session_id)
+
+
 def maybe_parse_bearer_header(value: str) -> Optional[str]:
     if value.startswith(BEARER):
         return value[len(BEARER) :]
     return None
 
 
+async def _get_userinfo(session_id):
+    return await async_get_userinfo(deploy_config=deploy_config, session_id=session_id)
+
+
 async def _userdata_from_session_id(session_id):
     try:
-        return await async_get_userinfo(deploy_config=deploy_config, session_id=session_id)
+        return await userdata_cache.get(session_id, _get_userinfo)
     except aiohttp.ClientResponseError as e:
         log.exception('unknown exception getting userinfo')
         raise web.HTTPInternalServerError() from e
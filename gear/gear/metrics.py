@@ -5,6 +5,10 @@ from prometheus_async.aio import time as prom_async_time  # type: ignore
 REQUEST_TIME = pc.Summary('http_request_latency_seconds', 'Endpoint latency in seconds', ['endpoint', 'verb'])
 REQUEST_COUNT = pc.Counter('http_request_count', 'Number of HTTP requests', ['endpoint', 'verb', 'status'])
 CONCURRENT_REQUESTS = pc.Gauge('http_concurrent_requests', 'Number of in progress HTTP requests', ['endpoint', 'verb'])
+USERDATA_CACHE_LOOKUPS = pc.Counter(
+    'userdata_cache_lookups', 'Number of session userdata lookups by cache result (hit, negative_hit, miss)', ['result']
+)
+USERDATA_CACHE_SIZE = pc.Gauge('userdata_cache_size', 'Number of sessions in the userdata cache')
 
 
 @web.middleware
@@ -0,0 +1,96 @@
+import asyncio
+
+from gear.auth import UserdataCache
+
+
+class CountingLoader:
+    def __init__(self, userdata):
+        self.userdata = userdata
+        self.n_loads = 0
+
+    async def __call__(self, session_id):
+        self.n_loads += 1
+        return self.userdata
+
+
+def test_userdata_expires_after_ttl():
+    async def test():
+        cache = UserdataCache(ttl_secs=0.1)
+        load = CountingLoader({'username': 'test'})
+
+        assert await cache.get('session', load) == {'username': 'test'}
+        assert await cache.get('session', load) == {'username': 'test'}
+        assert load.n_loads == 1
+
+        await asyncio.sleep(0.2)
+        assert await cache.get('session', load) == {'username': 'test'}
+        assert load.n_loads == 2
+
+    asyncio.get_event_loop().run_until_complete(test())
+
+
+def test_unknown_session_is_cached_for_negative_ttl():
+    async def test():
+        cache = UserdataCache(ttl_secs=60, negative_ttl_secs=0.1)
+        load = CountingLoader(None)
+
+        assert await cache.get('session', load) is None
+        assert await cache.get('session', load) is None
+        assert load.n_loads == 1
+
+        await asyncio.sleep(0.2)
+        assert await cache.get('session', load) is None
+        assert load.n_loads == 2
+
+    asyncio.get_event_loop().run_until_complete(test())
+
+
+def test_invalidate_drops_cached_userdata():
+    async def test():
+        cache = UserdataCache()
+        load = CountingLoader({'username': 'test'})
+
+        await cache.get('session', load)
+        cache.invalidate('session')
+        load.userdata = None
+        assert await cache.get('session', load) is None
+        assert load.n_loads == 2
+
+    asyncio.get_event_loop().run_until_complete(test())
+
+
+def test_invalidate_while_loading_does_not_cache_stale_userdata():
+    async def test():
+        cache = UserdataCache()
+        started = asyncio.Event()
+        release = asyncio.Event()
+        n_loads = 0
+
+        async def load(session_id):
+            nonlocal n_loads
+            n_loads += 1
+            started.set()
+            await release.wait()
+            return {'username': 'test'}
+
+        first = asyncio.ensure_future(cache.get('session', load))
+        second = asyncio.ensure_future(cache.get('session', load))
+        await started.wait()
+        cache.invalidate('session')
+        release.set()
+
+        # concurrent lookups share one request, and still get its result
+        assert await first == {'username': 'test'}
+        assert await second == {'username': 'test'}
+        assert n_loads == 1
+
+        # but it was not cached, so the next lookup loads again
+        release.clear()
+        started.clear()
+        third = asyncio.ensure_future(cache.get('session', load))
+        await started.wait()
+        release.set()
+        assert await third == {'username': 'test'}
+        assert n_loads == 2
+
+    asyncio.get_event_loop().run_until_complete(test())
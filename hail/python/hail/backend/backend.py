@@ -1,6 +1,10 @@
 import abc
 from ..fs.fs import FS
 
+# Buffer spec for query results returned to Python in Hail's native binary
+# encoding.  See HailType._from_encoding for the decoder.
+ENCODED_RESULT_BUFFER_SPEC = '{"name":"BlockingBufferSpec","blockSize":65536,"child":{"name":"StreamBlockBufferSpec"}}'
+
 
 class Backend(abc.ABC):
     @abc.abstractmethod
@@ -11,6 +15,13 @@ class Backend(abc.ABC):
     def execute(self, ir, timed=False):
         pass
 
+    @abc.abstractmethod
+    def _execute_encoded(self, ir):
+        """Execute `ir` and return its result, wrapped in a one-element tuple,
+        in Hail's native encoding (see :data:`ENCODED_RESULT_BUFFER_SPEC`),
+        along with the timings of the execution, if available."""
+        pass
+
     @abc.abstractmethod
     def value_type(self, ir):
         pass
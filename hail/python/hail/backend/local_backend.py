@@ -205,7 +205,7 @@ class LocalBackend(Py4JBackend):
         if not hasattr(ir, '_jir'):
             r = CSERenderer(stop_at_jir=True)
             # FIXME parse should be static
-            ir._jir = parse(r(ir), ir_map=r.jirs)
+            ir._jir = parse(r(ir), ir_map=self._ir_map(r))
         return ir._jir
 
     def _to_java_value_ir(self, ir):
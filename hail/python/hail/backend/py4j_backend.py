@@ -5,8 +5,9 @@ import py4j
 
 import hail
 from hail.ir.renderer import CSERenderer
+from hail.expr.types import ttuple, tvoid
 from hail.utils.java import FatalError, Env, HailUserError
-from .backend import Backend
+from .backend import Backend, ENCODED_RESULT_BUFFER_SPEC
 
 
 def handle_java_exception(f):
@@ -55,10 +56,19 @@ class Py4JBackend(Backend):
     def _parse_value_ir(self, code, ref_map={}, ir_map={}):
         pass
 
+    def _ir_map(self, r):
+        """The IRs referenced by the rendering of `r`, including large
+        literals, which are passed to the JVM already encoded."""
+        ir_map = dict(r.jirs)
+        for literal_id, (typ, encoding) in r.literals.items():
+            ir_map[literal_id] = self.hail_package().expr.ir.EncodedLiteral.pyFromEncodedValue(
+                typ._parsable_string(), encoding)
+        return ir_map
+
     def register_ir_function(self, name, type_parameters, argument_names, argument_types, return_type, body):
         r = CSERenderer(stop_at_jir=True)
         code = r(body._ir)
-        jbody = (self._parse_value_ir(code, ref_map=dict(zip(argument_names, argument_types)), ir_map=r.jirs))
+        jbody = (self._parse_value_ir(code, ref_map=dict(zip(argument_names, argument_types)), ir_map=self._ir_map(r)))
 
         Env.hail().expr.ir.functions.IRFunctionRegistry.pyRegisterIR(
             name,
@@ -67,15 +77,12 @@ class Py4JBackend(Backend):
             return_type._parsable_string(),
             jbody)
 
-    def execute(self, ir, timed=False):
+    def _execute_encoded(self, ir):
         jir = self._to_java_value_ir(ir)
         # print(self._hail_package.expr.ir.Pretty.apply(jir, True, -1))
         try:
-            result = json.loads(self._jhc.backend().executeJSON(jir))
-            value = ir.typ._from_json(result['value'])
-            timings = result['timings']
-
-            return (value, timings) if timed else value
+            result_tuple = self._jhc.backend().executeEncode(jir, ENCODED_RESULT_BUFFER_SPEC)
+            return result_tuple._1(), json.loads(result_tuple._2())
         except FatalError as e:
             error_id = e._error_id
 
@@ -96,3 +103,12 @@ class Py4JBackend(Backend):
                 raise HailUserError(message_and_trace) from None
 
             raise e
+
+    def execute(self, ir, timed=False):
+        encoded_value, timings = self._execute_encoded(ir)
+        if ir.typ == tvoid:
+            value = None
+        else:
+            value = ttuple(ir.typ)._from_encoding(encoded_value)[0]
+
+        return (value, timings) if timed else value
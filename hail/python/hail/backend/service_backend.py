@@ -1,11 +1,17 @@
-from typing import Optional
+from typing import Dict, Optional
+from collections import OrderedDict
+import asyncio
+import hashlib
 import os
 import aiohttp
 import json
+import struct
+import time
 import warnings
 
 from hail.utils import FatalError
-from hail.expr.types import dtype, tvoid
+from hail.utils.java import Env
+from hail.expr.types import dtype, ttuple, tvoid
 from hail.expr.table_type import ttable
 from hail.expr.matrix_type import tmatrix
 from hail.expr.blockmatrix_type import tblockmatrix
@@ -13,20 +19,33 @@ from hail.expr.blockmatrix_type import tblockmatrix
 from hailtop.config import get_deploy_config, get_user_config, DeployConfig
 from hailtop.auth import service_auth_headers
 from hailtop.utils import async_to_blocking, retry_transient_errors, secret_alnum_string, TransientError
+from hail.ir import BaseIR, TableWrite, MatrixWrite, MatrixMultiWrite, BlockMatrixWrite, \
+    BlockMatrixMultiWrite, NDArrayWrite
 from hail.ir.renderer import CSERenderer
 
-from .backend import Backend
+from .backend import Backend, ENCODED_RESULT_BUFFER_SPEC
 from ..hail_logging import PythonOnlyLogger
 from ..fs.google_fs import GoogleCloudStorageFS
 
 
 class ServiceSocket:
+    """A persistent websocket to the query service over which any number of
+    requests, possibly concurrent, are multiplexed."""
+
     def __init__(self, *, deploy_config: Optional[DeployConfig] = None):
         if not deploy_config:
             deploy_config = get_deploy_config()
         self.deploy_config = deploy_config
         self.url = deploy_config.base_url('query')
         self._session: Optional[aiohttp.ClientSession] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._reader: Optional[asyncio.Future] = None
+        self._socket_lock: Optional[asyncio.Lock] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_request_id = 0
+
+        self.n_requests = 0
+        self.total_round_trip_seconds = 0.0
 
     async def session(self) -> aiohttp.ClientSession:
         if self._session is None:
@@ -35,41 +54,127 @@ class ServiceSocket:
         return self._session
 
     def close(self):
-        if self._session is not None:
-            async_to_blocking(self._session.close())
-            self._session = None
-
-    def handle_response(self, resp):
-        if resp.type == aiohttp.WSMsgType.CLOSE:
-            raise aiohttp.ServerDisconnectedError('Socket was closed by server. (code={resp.data})')
-        if resp.type == aiohttp.WSMsgType.ERROR:
-            raise FatalError(f'Error raised while waiting for response from server: {resp}.')
-        assert resp.type == aiohttp.WSMsgType.TEXT, resp.type
-        return resp.data
+        async def close():
+            if self._reader is not None:
+                self._reader.cancel()
+                self._reader = None
+            if self._ws is not None:
+                await self._ws.close()
+                self._ws = None
+            if self._session is not None:
+                await self._session.close()
+                self._session = None
+        async_to_blocking(close())
+
+    async def _socket(self) -> aiohttp.ClientWebSocketResponse:
+        # created here, on the loop that uses it
+        if self._socket_lock is None:
+            self._socket_lock = asyncio.Lock()
+        # so that concurrent requests don't each open a socket
+        async with self._socket_lock:
+            if self._ws is None or self._ws.closed:
+                session = await self.session()
+                self._ws = await session.ws_connect(f'{self.url}/api/v1alpha/session', max_msg_size=0)
+                self._reader = asyncio.ensure_future(self._read_responses(self._ws))
+            return self._ws
+
+    async def _read_responses(self, ws):
+        try:
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.BINARY:
+                    # encoded results are sent as a single binary message
+                    # prefixed with the request id
+                    request_id = struct.unpack_from('<q', msg.data)[0]
+                    result = memoryview(msg.data)[8:]
+                elif msg.type == aiohttp.WSMsgType.TEXT:
+                    response = json.loads(msg.data)
+                    request_id = response['id']
+                    if response['status'] != 200:
+                        result = FatalError(f'Error from server: {response["value"]}')
+                    else:
+                        result = response['value']
+                else:
+                    warnings.warn(f'lost connection to server: {msg}')
+                    break
+                fut = self._pending.pop(request_id, None)
+                if fut is not None and not fut.done():
+                    if isinstance(result, Exception):
+                        fut.set_exception(result)
+                    else:
+                        fut.set_result(result)
+        finally:
+            if self._ws is ws:
+                self._ws = None
+            pending = self._pending
+            self._pending = {}
+            for fut in pending.values():
+                if not fut.done():
+                    fut.set_exception(TransientError())
 
     async def async_request(self, endpoint, **data):
         data['token'] = secret_alnum_string()
-        session = await self.session()
-        async with session.ws_connect(f'{self.url}/api/v1alpha/{endpoint}') as socket:
-            await socket.send_str(json.dumps(data))
-            response = await socket.receive()
-            await socket.send_str('bye')
-            if response.type == aiohttp.WSMsgType.ERROR:
-                raise ValueError(f'bad response: {endpoint}; {data}; {response}')
-            if response.type in (aiohttp.WSMsgType.CLOSE,
-                                 aiohttp.WSMsgType.CLOSED):
-                warnings.warn(f'retrying after losing connection {endpoint}; {data}; {response}')
-                raise TransientError()
-            assert response.type == aiohttp.WSMsgType.TEXT
-            result = json.loads(response.data)
-            if result['status'] != 200:
-                raise FatalError(f'Error from server: {result["value"]}')
-            return result['value']
+        start = time.time()
+        ws = await self._socket()
+        request_id = self._next_request_id
+        self._next_request_id += 1
+        fut = asyncio.get_event_loop().create_future()
+        self._pending[request_id] = fut
+        try:
+            await ws.send_str(json.dumps({'id': request_id, 'endpoint': endpoint, 'data': data}))
+            return await fut
+        finally:
+            self._pending.pop(request_id, None)
+            self.n_requests += 1
+            self.total_round_trip_seconds += time.time() - start
 
     def request(self, endpoint, **data):
         return async_to_blocking(retry_transient_errors(self.async_request, endpoint, **data))
 
 
+class LRUCache:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._items: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try:
+            value = self._items[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def clear(self):
+        self._items.clear()
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+
+_WRITERS = (TableWrite, MatrixWrite, MatrixMultiWrite, BlockMatrixWrite, BlockMatrixMultiWrite, NDArrayWrite)
+
+
+def _contains_writer(ir) -> bool:
+    stack = [ir]
+    seen = {id(ir)}
+    while stack:
+        node = stack.pop()
+        if isinstance(node, _WRITERS):
+            return True
+        for child in node.children:
+            if isinstance(child, BaseIR) and id(child) not in seen:
+                seen.add(id(child))
+                stack.append(child)
+    return False
+
+
 class ServiceBackend(Backend):
     def __init__(self, billing_project: str = None, bucket: str = None, *, deploy_config=None,
                  skip_logging_configuration: bool = False):
@@ -100,11 +205,27 @@ class ServiceBackend(Backend):
         self._logger = PythonOnlyLogger(skip_logging_configuration)
 
         self.socket = ServiceSocket(deploy_config=deploy_config)
+        self._type_cache = LRUCache(4096)
+        self._uploaded_literals = set()
+        self._literal_dir = None
 
     @property
     def logger(self):
         return self._logger
 
+    @property
+    def request_stats(self) -> dict:
+        """Type cache hit rate and query service round-trip latency."""
+        lookups = self._type_cache.hits + self._type_cache.misses
+        n_requests = self.socket.n_requests
+        return {
+            'type_cache_hits': self._type_cache.hits,
+            'type_cache_misses': self._type_cache.misses,
+            'type_cache_hit_rate': self._type_cache.hits / lookups if lookups else 0.0,
+            'requests': n_requests,
+            'mean_round_trip_seconds': self.socket.total_round_trip_seconds / n_requests if n_requests else 0.0,
+        }
+
     @property
     def fs(self) -> GoogleCloudStorageFS:
         if self._fs is None:
@@ -113,30 +234,62 @@ class ServiceBackend(Backend):
         return self._fs
 
     def stop(self):
-        self.socket.close()
+        try:
+            if self._uploaded_literals:
+                self.fs.rmtree(self._literal_dir)
+                self._uploaded_literals = set()
+        finally:
+            self.socket.close()
+
+    def _literal_path(self, encoding):
+        # in the session's temporary directory, and removed when it stops
+        if self._literal_dir is None:
+            self._literal_dir = f'{Env.hc()._tmpdir}/literals-{secret_alnum_string()}'
+        return f'{self._literal_dir}/{hashlib.sha256(encoding).hexdigest()}'
 
     def _render(self, ir):
-        r = CSERenderer()
+        # large literals are uploaded and read by the query service from the
+        # path they are referenced by.  Paths are content addressed, so the
+        # rendering of an IR is stable and each literal is uploaded once.
+        r = CSERenderer(literal_id=self._literal_path)
+        code = r(ir)
         assert len(r.jirs) == 0
-        return r(ir)
-
-    def execute(self, ir, timed=False):
-        resp = self.socket.request('execute',
+        for path, (_, encoding) in r.literals.items():
+            if path not in self._uploaded_literals:
+                with self.fs.open(path, 'wb') as f:
+                    f.write(encoding)
+                self._uploaded_literals.add(path)
+        return code
+
+    def _execute_encoded(self, ir):
+        # the query may overwrite files whose types were cached
+        if _contains_writer(ir):
+            self._type_cache.clear()
+        resp = self.socket.request('execute_encode',
                                    code=self._render(ir),
                                    billing_project=self._billing_project,
-                                   bucket=self._bucket)
-        typ = dtype(resp['type'])
-        if typ == tvoid:
+                                   bucket=self._bucket,
+                                   buffer_spec=ENCODED_RESULT_BUFFER_SPEC)
+        # FIXME put back timings
+        return resp, None
+
+    def execute(self, ir, timed=False):
+        encoded_value, timings = self._execute_encoded(ir)
+        if ir.typ == tvoid:
             value = None
         else:
-            value = typ._convert_from_json_na(resp['value'])
-        # FIXME put back timings
+            value = ttuple(ir.typ)._from_encoding(encoded_value)[0]
 
-        return (value, None) if timed else value
+        return (value, timings) if timed else value
 
     def _request_type(self, ir, kind):
         code = self._render(ir)
-        return self.socket.request(f'type/{kind}', code=code)
+        key = (kind, hashlib.sha256(code.encode('utf-8')).digest())
+        resp = self._type_cache.get(key)
+        if resp is None:
+            resp = self.socket.request(f'type/{kind}', code=code)
+            self._type_cache.put(key, resp)
+        return resp
 
     def value_type(self, ir):
         resp = self._request_type(ir, 'value')
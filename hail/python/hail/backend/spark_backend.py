@@ -257,7 +257,7 @@ class SparkBackend(Py4JBackend):
         if not hasattr(ir, '_jir'):
             r = CSERenderer(stop_at_jir=True)
             # FIXME parse should be static
-            ir._jir = parse(r(ir), ir_map=r.jirs)
+            ir._jir = parse(r(ir), ir_map=self._ir_map(r))
         return ir._jir
 
     def _to_java_value_ir(self, ir):
@@ -361,7 +361,7 @@ class SparkBackend(Py4JBackend):
 
         r = CSERenderer(stop_at_jir=True)
         code = r(body._ir)
-        jbody = (self._parse_value_ir(code, ref_map=dict(zip(argument_names, argument_types)), ir_map=r.jirs))
+        jbody = (self._parse_value_ir(code, ref_map=dict(zip(argument_names, argument_types)), ir_map=self._ir_map(r)))
 
         Env.hail().expr.ir.functions.IRFunctionRegistry.pyRegisterIR(
             name,
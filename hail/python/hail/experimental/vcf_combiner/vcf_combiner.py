@@ -1,8 +1,11 @@
 """An experimental library for combining (g)VCFS into sparse matrix tables"""
 # these are necessary for the diver script included at the end of this file
+import hashlib
+import json
 import math
 import os
-import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List, Tuple, Dict
 
 import hail as hl
@@ -326,7 +329,7 @@ def calculate_new_intervals(mt, desired_average_partition_size: int, tmp_path: s
     # dense entries per row. However, give each row some base weight
     # to prevent densify computations from becoming unbalanced (these
     # scale roughly linearly with N_ROW * N_COL)
-    ht = mt.select_rows(weight=hl.agg.count() + (n_cols // 25) + 1).rows().checkpoint(tmp_path)
+    ht = mt.select_rows(weight=hl.agg.count() + (n_cols // 25) + 1).rows().checkpoint(tmp_path, _read_if_exists=True)
 
     total_weight = ht.aggregate(hl.agg.sum(ht.weight))
     partition_weight = int(total_weight / (n_rows / desired_average_partition_size))
@@ -440,6 +443,11 @@ class CombinerPlan(object):
         self.merge_per_phase = len(file_size[0])
         self.total_merge = self.merge_per_phase * len(phases)
 
+    def to_dict(self) -> dict:
+        return {'file_size': self.file_size,
+                'phases': [[[merge.inputs for merge in job.merges] for job in phase.jobs]
+                           for phase in self.phases]}
+
 
 class CombinerConfig(object):
     default_max_partitions_per_job = 75_000
@@ -524,6 +532,10 @@ class CombinerConfig(object):
         return CombinerPlan(file_size, phases)
 
 
+def _merge_done_path(tmp_path: str, phase_i: int, job_i: int, merge_i: int) -> str:
+    return os.path.join(tmp_path, 'done', f'phase{phase_i}_job{job_i}_merge{merge_i}')
+
+
 def run_combiner(sample_paths: List[str],
                  out_file: str,
                  tmp_path: str,
@@ -540,7 +552,8 @@ def run_combiner(sample_paths: List[str],
                  overwrite: bool = False,
                  reference_genome: str = 'default',
                  contig_recoding: Optional[Dict[str, str]] = None,
-                 key_by_locus_and_alleles: bool = False):
+                 key_by_locus_and_alleles: bool = False,
+                 max_concurrent_jobs: int = 1):
     """Run the Hail VCF combiner, performing a hierarchical merge to create a combined sparse matrix table.
 
     **Partitioning**
@@ -562,6 +575,13 @@ def run_combiner(sample_paths: List[str],
     Note also that the partitioning of the final, combined matrix table does not depend
     the GVCF input partitioning.
 
+    **Resuming**
+
+    The combiner plan is written under `tmp_path`, along with a marker for each
+    finished merge. Rerunning with the same arguments and `tmp_path` skips the
+    merges that already finished, unless `overwrite` is set. The final merge is
+    only skipped if `out_file` still exists.
+
     Parameters
     ----------
     sample_paths : :obj:`list` of :class:`str`
@@ -601,6 +621,8 @@ def run_combiner(sample_paths: List[str],
         differently-formatted data onto known references.
     key_by_locus_and_alleles : :obj:`bool`
         Key by both locus and alleles in the final output.
+    max_concurrent_jobs : :obj:`int`
+        Number of jobs of a phase to run at the same time.
 
     Returns
     -------
@@ -610,7 +632,6 @@ def run_combiner(sample_paths: List[str],
     flagname = 'no_ir_logging'
     prev_flag_value = hl._get_flags(flagname).get(flagname)
     hl._set_flags(**{flagname: '1'})
-    tmp_path += f'/combiner-temporary/{uuid.uuid4()}/'
     if header is not None:
         assert sample_names is not None
         assert len(sample_names) == len(sample_paths)
@@ -652,10 +673,32 @@ def run_combiner(sample_paths: List[str],
                             target_records=target_records)
     plan = config.plan(len(sample_paths))
 
+    # the temporary directory is determined by the inputs and the plan, so
+    # that rerunning the same combine finds the merges that already finished
+    run_key = json.dumps({'sample_paths': sample_paths,
+                          'sample_names': sample_names,
+                          'header': header,
+                          'out_file': out_file,
+                          'intervals': [str(interval) for interval in intervals],
+                          'reference_genome': str(reference_genome),
+                          'contig_recoding': contig_recoding,
+                          'key_by_locus_and_alleles': key_by_locus_and_alleles,
+                          'target_records': target_records,
+                          'plan': plan.to_dict()},
+                         sort_keys=True)
+    tmp_path += f'/combiner-temporary/{hashlib.sha256(run_key.encode()).hexdigest()[:32]}/'
+    plan_path = os.path.join(tmp_path, 'plan.json')
+    if hl.hadoop_exists(plan_path):
+        info(f"Resuming combiner run in {tmp_path}")
+    else:
+        with hl.hadoop_open(plan_path, 'w') as f:
+            json.dump(plan.to_dict(), f)
+
     files_to_merge = sample_paths
     n_phases = len(plan.phases)
     total_ops = len(files_to_merge) * n_phases
     total_work_done = 0
+    lock = threading.Lock()
     for phase_i, phase in enumerate(plan.phases):
         phase_i += 1  # used for info messages, 1-indexed for readability
 
@@ -670,12 +713,29 @@ def run_combiner(sample_paths: List[str],
                                                                  os.path.join(tmp_path,
                                                                               f'phase{phase_i}_interval_checkpoint.ht'))
 
-        new_files_to_merge = []
+        def run_job(job_i, job):
+            nonlocal total_work_done
 
-        for job_i, job in enumerate(phase.jobs):
             job_i += 1  # used for info messages, 1-indexed for readability
 
             n_merges = len(job.merges)
+            if phase_i == n_phases:
+                outputs = [out_file]
+            else:
+                tmp = f'{tmp_path}_phase{phase_i}_job{job_i}/'
+                pad = len(str(n_merges))
+                outputs = [tmp + str(n).zfill(pad) + '.mt' for n in range(n_merges)]
+
+            done_paths = [_merge_done_path(tmp_path, phase_i, job_i, merge_i) for merge_i in range(n_merges)]
+            if (not overwrite
+                    and all(hl.hadoop_exists(path) for path in done_paths)
+                    # the final output may have been deleted since
+                    and (phase_i < n_phases or hl.hadoop_exists(os.path.join(out_file, '_SUCCESS')))):
+                with lock:
+                    total_work_done += job.input_total_size
+                info(f"Skipping phase {phase_i}/{n_phases}, job {job_i}/{len(phase.jobs)}, finished in an earlier run.")
+                return outputs
+
             merge_str = hl.utils.misc.plural('file', n_merges)
             pct_total = 100 * job.input_total_size / total_ops
             info(
@@ -706,21 +766,31 @@ def run_combiner(sample_paths: List[str],
                 if key_by_locus_and_alleles:
                     final_mt = MatrixTable(MatrixKeyRowsBy(final_mt._mir, ['locus', 'alleles'], is_sorted=True))
                 final_mt.write(out_file, overwrite=overwrite)
-                new_files_to_merge = [out_file]
+                for path in done_paths:
+                    hl.hadoop_open(path, 'w').close()
                 info(f"Finished phase {phase_i}/{n_phases}, job {job_i}/{len(phase.jobs)}, 100% of total I/O finished.")
-                break
+                return outputs
 
-            tmp = f'{tmp_path}_phase{phase_i}_job{job_i}/'
             hl.experimental.write_matrix_tables(merge_mts, tmp, overwrite=True)
-            pad = len(str(len(merge_mts)))
-            new_files_to_merge.extend(tmp + str(n).zfill(pad) + '.mt' for n in range(len(merge_mts)))
-            total_work_done += job.input_total_size
+            for path in done_paths:
+                hl.hadoop_open(path, 'w').close()
+            with lock:
+                total_work_done += job.input_total_size
+                pct_done = 100 * total_work_done / total_ops
             info(
-                f"Finished {phase_i}/{n_phases}, job {job_i}/{len(phase.jobs)}, {100 * total_work_done / total_ops:.1f}% of total I/O finished.")
+                f"Finished {phase_i}/{n_phases}, job {job_i}/{len(phase.jobs)}, {pct_done:.1f}% of total I/O finished.")
+            return outputs
+
+        # jobs within a phase are independent
+        if max_concurrent_jobs > 1 and n_jobs > 1:
+            with ThreadPoolExecutor(max_workers=max_concurrent_jobs) as pool:
+                job_outputs = list(pool.map(run_job, range(n_jobs), phase.jobs))
+        else:
+            job_outputs = [run_job(job_i, job) for job_i, job in enumerate(phase.jobs)]
 
         info(f"Finished phase {phase_i}/{n_phases}.")
 
-        files_to_merge = new_files_to_merge
+        files_to_merge = [path for outputs in job_outputs for path in outputs]
 
     assert files_to_merge == [out_file]
 
@@ -14,6 +14,8 @@ from hail.genetics.reference_genome import reference_genome_type
 from hail.typecheck import typecheck, typecheck_method, oneof, transformed
 from hail.utils.java import escape_parsable
 from hail.utils import frozendict
+from hail.utils.byte_reader import ByteReader, strip_block_framing
+from hail.utils.byte_writer import ByteWriter
 
 __all__ = [
     'dtype',
@@ -262,6 +264,20 @@ class HailType(object):
     def _convert_from_json(self, x):
         return x
 
+    def _from_encoding(self, encoding):
+        return self._convert_from_encoding(ByteReader(strip_block_framing(encoding)))
+
+    def _convert_from_encoding(self, byte_reader):
+        raise ValueError(f"cannot decode values of type {self}")
+
+    def _to_encoding(self, value) -> bytes:
+        byte_writer = ByteWriter()
+        self._convert_to_encoding(byte_writer, value)
+        return byte_writer.getvalue()
+
+    def _convert_to_encoding(self, byte_writer, value):
+        raise ValueError(f"cannot encode values of type {self}")
+
     def _traverse(self, obj, f):
         """Traverse a nested type and object.
 
@@ -358,6 +374,12 @@ class _tint32(HailType):
     def max_value(self):
         return (1 << 31) - 1
 
+    def _convert_from_encoding(self, byte_reader):
+        return byte_reader.read_int32()
+
+    def _convert_to_encoding(self, byte_writer, value):
+        byte_writer.write_int32(value)
+
     def unify(self, t):
         return t == tint32
 
@@ -407,6 +429,12 @@ class _tint64(HailType):
     def max_value(self):
         return (1 << 63) - 1
 
+    def _convert_from_encoding(self, byte_reader):
+        return byte_reader.read_int64()
+
+    def _convert_to_encoding(self, byte_writer, value):
+        byte_writer.write_int64(value)
+
     def unify(self, t):
         return t == tint64
 
@@ -451,6 +479,12 @@ class _tfloat32(HailType):
         else:
             return str(x)
 
+    def _convert_from_encoding(self, byte_reader):
+        return byte_reader.read_float32()
+
+    def _convert_to_encoding(self, byte_writer, value):
+        byte_writer.write_float32(value)
+
     def unify(self, t):
         return t == tfloat32
 
@@ -495,6 +529,12 @@ class _tfloat64(HailType):
         else:
             return str(x)
 
+    def _convert_from_encoding(self, byte_reader):
+        return byte_reader.read_float64()
+
+    def _convert_to_encoding(self, byte_writer, value):
+        byte_writer.write_float64(value)
+
     def unify(self, t):
         return t == tfloat64
 
@@ -530,6 +570,15 @@ class _tstr(HailType):
     def _parsable_string(self):
         return "String"
 
+    def _convert_from_encoding(self, byte_reader):
+        length = byte_reader.read_int32()
+        return str(byte_reader.read_bytes_view(length), 'utf-8')
+
+    def _convert_to_encoding(self, byte_writer, value):
+        b = value.encode('utf-8')
+        byte_writer.write_int32(len(b))
+        byte_writer.write_bytes(b)
+
     def unify(self, t):
         return t == tstr
 
@@ -562,6 +611,12 @@ class _tbool(HailType):
     def _parsable_string(self):
         return "Boolean"
 
+    def _convert_from_encoding(self, byte_reader):
+        return byte_reader.read_bool()
+
+    def _convert_to_encoding(self, byte_writer, value):
+        byte_writer.write_bool(value)
+
     def unify(self, t):
         return t == tbool
 
@@ -676,6 +731,26 @@ class tndarray(HailType):
         }
         return json_dict
 
+    def _convert_from_encoding(self, byte_reader):
+        shape = [byte_reader.read_int64() for _ in range(self.ndim)]
+        if is_numeric(self._element_type):
+            n = int(np.prod(shape))
+            data = byte_reader.read_numpy(_encoded_numpy_dtype(self._element_type), n)
+            # elements are encoded in column major order
+            return np.array(data.reshape(shape, order='F'), order='C')
+        else:
+            raise TypeError("Hail cannot currently return ndarrays of non-numeric or boolean type.")
+
+    def _convert_to_encoding(self, byte_writer, value):
+        dtype = _encoded_numpy_dtype(self._element_type)
+        if dtype is None:
+            raise ValueError(f"cannot encode values of type {self}")
+        value = np.asarray(value)
+        for dim in value.shape:
+            byte_writer.write_int64(dim)
+        # elements are encoded in column major order
+        byte_writer.write_numpy(dtype, value.ravel(order='F'))
+
     def clear(self):
         self._element_type.clear()
         self._ndim.clear()
@@ -759,6 +834,30 @@ class tarray(HailType):
     def _convert_to_json(self, x):
         return [self.element_type._convert_to_json_na(elt) for elt in x]
 
+    def _convert_from_encoding(self, byte_reader):
+        return _decode_encoded_array(self.element_type, byte_reader)
+
+    def _convert_to_encoding(self, byte_writer, value):
+        _encode_encoded_array(self.element_type, byte_writer, value)
+
+    def _convert_from_encoding_to_numpy(self, byte_reader):
+        length = byte_reader.read_int32()
+        missing = byte_reader.read_missing_bits(length)
+        dtype = _encoded_numpy_dtype(self.element_type)
+        if dtype is None:
+            values = np.empty(length, dtype=object)
+            for i, m in enumerate(missing.tolist()):
+                if not m:
+                    values[i] = self.element_type._convert_from_encoding(byte_reader)
+            return values
+        n_missing = int(missing.sum())
+        present = byte_reader.read_numpy(dtype, length - n_missing)
+        if n_missing == 0:
+            return present.copy()
+        values = np.zeros(length, dtype=dtype)
+        values[~missing] = present
+        return np.ma.MaskedArray(values, mask=missing)
+
     def _propagate_jtypes(self, jtype):
         self._element_type._add_jtype(jtype.elementType())
 
@@ -897,6 +996,14 @@ class tset(HailType):
     def _convert_from_json(self, x):
         return frozenset({self.element_type._convert_from_json_na(elt) for elt in x})
 
+    def _convert_from_encoding(self, byte_reader):
+        return frozenset(_decode_encoded_array(self.element_type, byte_reader))
+
+    def _convert_to_encoding(self, byte_writer, value):
+        # the JVM expects set elements in its own sort order, so this must
+        # be read as an array and converted to a set there
+        _encode_encoded_array(self.element_type, byte_writer, value)
+
     def _convert_to_json(self, x):
         return [self.element_type._convert_to_json_na(elt) for elt in x]
 
@@ -1004,6 +1111,30 @@ class tdict(HailType):
         return [{'key': self.key_type._convert_to_json(k),
                  'value': self.value_type._convert_to_json(v)} for k, v in x.items()]
 
+    def _convert_from_encoding(self, byte_reader):
+        length = byte_reader.read_int32()
+        elt_missing = byte_reader.read_missing_bits(length).tolist()
+        result = {}
+        for missing in elt_missing:
+            assert not missing
+            kv_missing = byte_reader.read_missing_bits(2)
+            k = None if kv_missing[0] else self.key_type._convert_from_encoding(byte_reader)
+            v = None if kv_missing[1] else self.value_type._convert_from_encoding(byte_reader)
+            result[k] = v
+        return frozendict(result)
+
+    def _convert_to_encoding(self, byte_writer, value):
+        # as for sets, read as an array of (key, value) tuples and converted
+        # to a dict by the JVM
+        byte_writer.write_int32(len(value))
+        byte_writer.write_missing_bits([False] * len(value))
+        for k, v in value.items():
+            byte_writer.write_missing_bits([k is None, v is None])
+            if k is not None:
+                self.key_type._convert_to_encoding(byte_writer, k)
+            if v is not None:
+                self.value_type._convert_to_encoding(byte_writer, v)
+
     def _propagate_jtypes(self, jtype):
         self._key_type._add_jtype(jtype.keyType())
         self._value_type._add_jtype(jtype.valueType())
@@ -1156,6 +1287,19 @@ class tstruct(HailType, Mapping):
     def _convert_to_json(self, x):
         return {f: t._convert_to_json_na(x[f]) for f, t in self.items()}
 
+    def _convert_from_encoding(self, byte_reader):
+        from hail.utils import Struct
+        missing = byte_reader.read_missing_bits(len(self)).tolist()
+        return Struct(**{f: None if m else t._convert_from_encoding(byte_reader)
+                         for (f, t), m in zip(self.items(), missing)})
+
+    def _convert_to_encoding(self, byte_writer, value):
+        values = [value[f] for f in self]
+        byte_writer.write_missing_bits([v is None for v in values])
+        for t, v in zip(self.types, values):
+            if v is not None:
+                t._convert_to_encoding(byte_writer, v)
+
     def _is_prefix_of(self, other):
         return (isinstance(other, tstruct)
                 and len(self._fields) <= len(other._fields)
@@ -1411,6 +1555,17 @@ class ttuple(HailType, Sequence):
     def _convert_to_json(self, x):
         return [self.types[i]._convert_to_json_na(x[i]) for i in range(len(self.types))]
 
+    def _convert_from_encoding(self, byte_reader):
+        missing = byte_reader.read_missing_bits(len(self.types)).tolist()
+        return tuple(None if m else t._convert_from_encoding(byte_reader)
+                     for t, m in zip(self.types, missing))
+
+    def _convert_to_encoding(self, byte_writer, value):
+        byte_writer.write_missing_bits([v is None for v in value])
+        for t, v in zip(self.types, value):
+            if v is not None:
+                t._convert_to_encoding(byte_writer, v)
+
     def unify(self, t):
         if not (isinstance(t, ttuple) and len(self.types) == len(t.types)):
             return False
@@ -1477,6 +1632,29 @@ class _tcall(HailType):
     def _convert_to_json(self, x):
         return str(x)
 
+    def _convert_from_encoding(self, byte_reader):
+        # see is.hail.variant.Call for the bit layout
+        c = byte_reader.read_int32()
+        phased = (c & 0x1) == 1
+        ploidy = (c >> 1) & 0x3
+        allele_repr = c >> 3
+        if ploidy == 0:
+            return hl.Call([], phased=phased)
+        if ploidy == 1:
+            return hl.Call([allele_repr], phased=phased)
+        if ploidy != 2:
+            raise ValueError(f"unsupported ploidy in encoded call: {ploidy}")
+        # allele_repr = k * (k + 1) / 2 + j
+        k = int(math.sqrt(8 * allele_repr + 1) / 2 - 0.5)
+        while k * (k + 1) // 2 > allele_repr:
+            k -= 1
+        while (k + 1) * (k + 2) // 2 <= allele_repr:
+            k += 1
+        j = allele_repr - k * (k + 1) // 2
+        if phased:
+            return hl.Call([j, k - j], phased=True)
+        return hl.Call([j, k])
+
     def unify(self, t):
         return t == tcall
 
@@ -1548,6 +1726,15 @@ class tlocus(HailType):
     def _convert_to_json(self, x):
         return {'contig': x.contig, 'position': x.position}
 
+    def _convert_from_encoding(self, byte_reader):
+        contig = tstr._convert_from_encoding(byte_reader)
+        position = byte_reader.read_int32()
+        return genetics.Locus(contig, position, reference_genome=self.reference_genome)
+
+    def _convert_to_encoding(self, byte_writer, value):
+        tstr._convert_to_encoding(byte_writer, value.contig)
+        byte_writer.write_int32(value.position)
+
     def unify(self, t):
         return isinstance(t, tlocus) and self.reference_genome == t.reference_genome
 
@@ -1636,6 +1823,24 @@ class tinterval(HailType):
                 'includeStart': x.includes_start,
                 'includeEnd': x.includes_end}
 
+    def _convert_from_encoding(self, byte_reader):
+        from hail.utils import Interval
+        start_missing, end_missing = byte_reader.read_missing_bits(2).tolist()
+        start = None if start_missing else self.point_type._convert_from_encoding(byte_reader)
+        end = None if end_missing else self.point_type._convert_from_encoding(byte_reader)
+        includes_start = byte_reader.read_bool()
+        includes_end = byte_reader.read_bool()
+        return Interval(start, end, includes_start, includes_end, point_type=self.point_type)
+
+    def _convert_to_encoding(self, byte_writer, value):
+        byte_writer.write_missing_bits([value.start is None, value.end is None])
+        if value.start is not None:
+            self.point_type._convert_to_encoding(byte_writer, value.start)
+        if value.end is not None:
+            self.point_type._convert_to_encoding(byte_writer, value.end)
+        byte_writer.write_bool(value.includes_start)
+        byte_writer.write_bool(value.includes_end)
+
     def unify(self, t):
         return isinstance(t, tinterval) and self.point_type.unify(t.point_type)
 
@@ -1770,6 +1975,73 @@ _numeric_types = {_tbool, _tint32, _tint64, _tfloat32, _tfloat64}
 _primitive_types = _numeric_types.union({_tstr})
 _interned_types = _primitive_types.union({_tcall})
 
+_encoded_numpy_dtypes = {
+    _tbool: np.dtype('?'),
+    _tint32: np.dtype('<i4'),
+    _tint64: np.dtype('<i8'),
+    _tfloat32: np.dtype('<f4'),
+    _tfloat64: np.dtype('<f8'),
+}
+
+
+def _encoded_numpy_dtype(t):
+    return _encoded_numpy_dtypes.get(t.__class__)
+
+
+def _columns_from_encoding(columns_type, encoding):
+    """Decode an encoded ``tuple(struct{f1: array<t1>, ...})`` into a dict
+    from field name to NumPy array without building per-row objects.
+
+    Arrays of primitives become NumPy arrays of the corresponding NumPy type,
+    or :class:`numpy.ma.MaskedArray` if any element is missing.  Other arrays
+    become NumPy arrays of Python objects."""
+    byte_reader = ByteReader(strip_block_framing(encoding))
+    # neither the result tuple nor the struct of columns is missing
+    byte_reader.read_missing_bits(1)
+    byte_reader.read_missing_bits(len(columns_type))
+    return {f: t._convert_from_encoding_to_numpy(byte_reader) for f, t in columns_type.items()}
+
+
+def _decode_encoded_array(element_type, byte_reader):
+    length = byte_reader.read_int32()
+    missing = byte_reader.read_missing_bits(length)
+    dtype = _encoded_numpy_dtype(element_type)
+    if dtype is not None:
+        # present primitive elements are densely packed after the missing bits
+        n_missing = int(missing.sum())
+        values = byte_reader.read_numpy(dtype, length - n_missing).tolist()
+        if n_missing == 0:
+            return values
+        it = iter(values)
+        return [None if m else next(it) for m in missing.tolist()]
+    return [None if m else element_type._convert_from_encoding(byte_reader)
+            for m in missing.tolist()]
+
+
+def _encode_encoded_array(element_type, byte_writer, values):
+    dtype = _encoded_numpy_dtype(element_type)
+    if isinstance(values, np.ndarray) and dtype is not None:
+        # NumPy arrays have no missing values and are written in bulk
+        byte_writer.write_int32(len(values))
+        byte_writer.write_missing_bits(np.zeros(len(values), dtype=bool))
+        byte_writer.write_numpy(dtype, values)
+        return
+    values = list(values)
+    missing = [v is None for v in values]
+    byte_writer.write_int32(len(values))
+    byte_writer.write_missing_bits(missing)
+    present = [v for v in values if v is not None] if any(missing) else values
+    if dtype is not None:
+        byte_writer.write_numpy(dtype, present)
+    elif isinstance(element_type, _tstr):
+        # each string is its length followed by its UTF-8 bytes
+        byte_writer.write_bytes(b''.join(
+            len(b).to_bytes(4, 'little') + b
+            for b in (v.encode('utf-8') for v in present)))
+    else:
+        for v in present:
+            element_type._convert_to_encoding(byte_writer, v)
+
 
 @typecheck(t=HailType)
 def is_numeric(t) -> bool:
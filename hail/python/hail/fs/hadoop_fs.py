@@ -1,6 +1,13 @@
 import io
 import json
-from typing import Dict, List
+import mmap
+import os
+import secrets
+import tempfile
+import urllib.parse
+from typing import Dict, List, Optional
+
+from py4j.protocol import Py4JError
 
 from .fs import FS
 
@@ -18,7 +25,11 @@ class HadoopFS(FS):
         return self._open(path, mode, buffer_size, use_codec=True)
 
     def _open(self, path: str, mode: str = 'r', buffer_size: int = 8192, use_codec: bool = False):
-        if 'r' in mode:
+        local_path = _local_file_path(path)
+        if 'r' in mode and not use_codec and local_path is not None:
+            # no need to go through the JVM for local files
+            handle = open(local_path, 'rb', buffering=buffer_size)
+        elif 'r' in mode:
             handle = io.BufferedReader(HadoopReader(self, path, buffer_size, use_codec=use_codec), buffer_size=buffer_size)
         elif 'w' in mode:
             handle = io.BufferedWriter(HadoopWriter(self, path, use_codec=use_codec), buffer_size=buffer_size)
@@ -61,17 +72,67 @@ class HadoopFS(FS):
         return self._jfs.supportsScheme(scheme)
 
 
+def _local_file_path(path: str) -> Optional[str]:
+    parsed = urllib.parse.urlparse(path)
+    if parsed.scheme == 'file' and parsed.netloc in ('', 'localhost'):
+        return parsed.path
+    return None
+
+
 class HadoopReader(io.RawIOBase):
+    # Reads are served from chunks of this size which the JVM writes
+    # into a memory-mapped file shared with Python, rather than being
+    # marshaled over py4j.
+    SHARED_BUFFER_SIZE = 16 * 1024 * 1024
+    NONCE_SIZE = 16
+
     def __init__(self, hfs, path, buffer_size, use_codec=False):
         super(HadoopReader, self).__init__()
         self._seekable = not use_codec
         if use_codec:
             self._jfile = hfs._utils_package_object.readFileCodec(hfs._jfs, path, buffer_size)
+            # the decompressed size isn't known
+            shared_size = HadoopReader.SHARED_BUFFER_SIZE
         else:
             self._jfile = hfs._utils_package_object.readFile(hfs._jfs, path, buffer_size)
+            shared_size = min(self._jfile.getLen(), HadoopReader.SHARED_BUFFER_SIZE)
+        # a file that one py4j read returns isn't worth mapping a buffer for
+        if shared_size > max(buffer_size, HadoopReader.NONCE_SIZE):
+            self._shared = self._map_shared_buffer(shared_size)
+        else:
+            self._shared = None
+        self._chunk_start = 0
+        self._chunk_end = 0
+
+    def _map_shared_buffer(self, size: int) -> Optional[mmap.mmap]:
+        fd, path = tempfile.mkstemp(prefix='hail-hadoop-read-')
+        try:
+            os.ftruncate(fd, size)
+            shared = mmap.mmap(fd, size)
+            # the JVM checks it maps this file, and not one of its own at
+            # the same path, by finding the nonce at the start of it
+            nonce = secrets.token_bytes(HadoopReader.NONCE_SIZE)
+            shared[:len(nonce)] = nonce
+            try:
+                self._jfile.mapSharedBuffer(path, size, nonce.hex())
+            except Py4JError:
+                # the JVM may not share our filesystem, e.g. a remote
+                # gateway; fall back to reading over py4j
+                shared.close()
+                return None
+            return shared
+        finally:
+            os.close(fd)
+            os.remove(path)
+
+    def _buffered(self) -> int:
+        return self._chunk_end - self._chunk_start
 
     def close(self):
         self._jfile.close()
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
 
     def readable(self):
         return True
@@ -82,15 +143,30 @@ class HadoopReader(io.RawIOBase):
     def seek(self, offset, whence=io.SEEK_SET):
         if not 0 <= whence <= 2:
             raise io.UnsupportedOperation(f'unsupported whence value {whence}')
+        if whence == io.SEEK_CUR:
+            offset -= self._buffered()
+        self._chunk_start = self._chunk_end = 0
         return self._jfile.seek(offset, whence)
 
     def tell(self):
-        return self._jfile.getPosition()
+        return self._jfile.getPosition() - self._buffered()
 
     def readinto(self, b):
-        b_from_java = self._jfile.read(len(b))
-        n_read = len(b_from_java)
-        b[:n_read] = b_from_java
+        if self._shared is None:
+            b_from_java = self._jfile.read(len(b))
+            n_read = len(b_from_java)
+            b[:n_read] = b_from_java
+            return n_read
+
+        if self._buffered() == 0:
+            self._chunk_start = 0
+            self._chunk_end = self._jfile.readShared(len(self._shared))
+            if self._chunk_end == 0:
+                return 0
+        n_read = min(len(b), self._buffered())
+        with memoryview(b) as dest, memoryview(self._shared) as src:
+            dest[:n_read] = src[self._chunk_start:self._chunk_start + n_read]
+        self._chunk_start += n_read
         return n_read
 
 
@@ -32,10 +32,15 @@ class BaseIR(Renderable):
         self.children = children
         self._error_id = None
         self._stack_trace = None
+        self._hash = None
+        self._plain_render = None
+        self._cse_render = None
 
     def __str__(self):
-        r = PlainRenderer(stop_at_jir=False)
-        return r(self)
+        if self._plain_render is None:
+            r = PlainRenderer(stop_at_jir=False)
+            return r(self)
+        return self._plain_render
 
     def render_head(self, r: Renderer):
         head_str = self.head_str()
@@ -71,7 +76,23 @@ class BaseIR(Renderable):
         return
 
     def __eq__(self, other):
-        return isinstance(other, self.__class__) and self.children == other.children and self._eq(other)
+        # iterative, as pipelines can be deeper than the recursion limit
+        pairs = [(self, other)]
+        while pairs:
+            left, right = pairs.pop()
+            if left is right:
+                continue
+            if not isinstance(left, BaseIR) or type(left).__eq__ is not BaseIR.__eq__:
+                if left != right:
+                    return False
+                continue
+            if not (isinstance(right, left.__class__)
+                    and hash(left) == hash(right)
+                    and len(left.children) == len(right.children)
+                    and left._eq(right)):
+                return False
+            pairs.extend(zip(left.children, right.children))
+        return True
 
     def __ne__(self, other):
         return not self == other
@@ -91,7 +112,34 @@ class BaseIR(Renderable):
         return True
 
     def __hash__(self):
-        return 31 + hash(str(self))
+        if self._hash is None:
+            self._compute_hashes()
+        return self._hash
+
+    def _hash_head(self):
+        """Value hashed together with the IR name and the children's hashes.
+
+        Must not change after construction, and must agree whenever
+        :meth:`_eq` holds.
+        """
+        return self.head_str()
+
+    def _compute_hashes(self):
+        # Children are immutable, so each node's hash is computed once, bottom
+        # up, without recursing (pipelines can be thousands of nodes deep).
+        stack = [self]
+        while stack:
+            node = stack[-1]
+            pending = [child for child in node.children
+                       if isinstance(child, BaseIR) and child._hash is None]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            if node._hash is None:
+                node._hash = hash((node.__class__,
+                                   node._hash_head(),
+                                   tuple(hash(child) for child in node.children)))
 
     def new_block(self, i: int) -> bool:
         return self.renderable_new_block(self.renderable_idx_of_child(i))
@@ -22,7 +22,7 @@ class BlockMatrixRead(BlockMatrixIR):
         return self.reader == other.reader
 
     def _compute_type(self):
-        self._type = Env.backend().blockmatrix_type(self)
+        self._type = self.reader._local_type() or Env.backend().blockmatrix_type(self)
 
 
 class BlockMatrixMap(BlockMatrixIR):
@@ -1,6 +1,8 @@
 import abc
 import json
 
+from ..expr.blockmatrix_type import tblockmatrix
+from ..expr.types import tfloat64
 from ..typecheck import typecheck_method, sequenceof
 from ..utils.misc import escape_str
 
@@ -14,6 +16,11 @@ class BlockMatrixReader(object):
     def __eq__(self, other):
         pass
 
+    def _local_type(self):
+        """The type of the block matrix read, if it is known without asking the
+        backend, otherwise ``None``."""
+        return None
+
 
 class BlockMatrixNativeReader(BlockMatrixReader):
     @typecheck_method(path=str)
@@ -50,6 +57,11 @@ class BlockMatrixBinaryReader(BlockMatrixReader):
             self.shape == other.shape and \
             self.block_size == other.block_size
 
+    def _local_type(self):
+        from .blockmatrix_ir import _matrix_shape_to_tensor_shape
+        tensor_shape, is_row_vector = _matrix_shape_to_tensor_shape(*self.shape)
+        return tblockmatrix(tfloat64, tensor_shape, is_row_vector, self.block_size)
+
 
 class BlockMatrixPersistReader(BlockMatrixReader):
     def __init__(self, id, original):
@@ -65,5 +77,8 @@ class BlockMatrixPersistReader(BlockMatrixReader):
         return isinstance(other, BlockMatrixPersistReader) and \
             self.id == other.id
 
+    def _local_type(self):
+        return self.original.typ
+
     def unpersisted(self):
         return self.original
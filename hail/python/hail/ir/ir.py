@@ -2,11 +2,12 @@ import copy
 from collections import defaultdict
 
 import decorator
+import numpy as np
 
 import hail
 from hail.expr.types import dtype, HailType, hail_type, tint32, tint64, \
     tfloat32, tfloat64, tstr, tbool, tarray, tstream, tndarray, tset, tdict, \
-    tstruct, ttuple, tinterval, tvoid
+    tstruct, ttuple, tinterval, tlocus, tvoid
 from hail.ir.blockmatrix_writer import BlockMatrixWriter, BlockMatrixMultiWriter
 from hail.typecheck import typecheck, typecheck_method, sequenceof, numeric, \
     sized_tupleof, nullable, tupleof, anytype, func_spec
@@ -544,12 +545,23 @@ class MakeArray(IR):
     def copy(self, *args):
         return MakeArray(args, self._type)
 
+    def render_head(self, r):
+        if self._type is None:
+            # the head changes once type inference fills in '_type', so
+            # renderings containing it must not be cached
+            r.cacheable = False
+        return super().render_head(r)
+
     def head_str(self):
         return self._type._parsable_string() if self._type is not None else 'None'
 
     def _eq(self, other):
         return other._type == self._type
 
+    def _hash_head(self):
+        # '_type' is filled in by type inference when not given
+        return ''
+
     def _compute_type(self, env, agg_env):
         for a in self.args:
             a._compute_type(env, agg_env)
@@ -2606,13 +2618,64 @@ class BlockMatrixToValueApply(IR):
         self._type = tfloat64
 
 
+def _encodable_out_of_band(t, top_level=True):
+    # sets and dicts are sent as arrays and converted by the JVM, which is
+    # only done for the outermost container
+    if isinstance(t, tset):
+        return top_level and _encodable_out_of_band(t.element_type, False)
+    if isinstance(t, tdict):
+        return (top_level
+                and _encodable_out_of_band(t.key_type, False)
+                and _encodable_out_of_band(t.value_type, False))
+    if isinstance(t, tarray):
+        return _encodable_out_of_band(t.element_type, False)
+    if isinstance(t, tndarray):
+        return t.element_type in (tint32, tint64, tfloat32, tfloat64, tbool)
+    if isinstance(t, (tstruct, ttuple)):
+        return all(_encodable_out_of_band(c, False) for c in t.types)
+    if isinstance(t, tinterval):
+        return _encodable_out_of_band(t.point_type, False)
+    return t in (tint32, tint64, tfloat32, tfloat64, tbool, tstr) or isinstance(t, tlocus)
+
+
+def _value_hash(t, value):
+    # agrees with Literal._eq: sets and dicts are hashed independently of
+    # their iteration order, and arrays as numpy arrays or lists alike
+    if value is None:
+        return 0
+    if isinstance(t, tndarray):
+        return hash(np.shape(value))
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(t, tarray):
+        return hash(tuple(_value_hash(t.element_type, v) for v in value))
+    if isinstance(t, tset):
+        return hash(frozenset(_value_hash(t.element_type, v) for v in value))
+    if isinstance(t, tdict):
+        return hash(frozenset((_value_hash(t.key_type, k), _value_hash(t.value_type, v))
+                              for k, v in value.items()))
+    if isinstance(t, ttuple):
+        return hash(tuple(_value_hash(ct, v) for ct, v in zip(t.types, value)))
+    if isinstance(t, tstruct):
+        return hash(tuple(_value_hash(ft, value[f]) for f, ft in t.items()))
+    try:
+        return hash(value)
+    except TypeError:
+        return 0
+
+
 class Literal(IR):
+    # encoded size in bytes above which values are passed to the backend
+    # separately from the IR text
+    OUT_OF_BAND_THRESHOLD = 1 << 16
+
     @typecheck_method(typ=hail_type,
                       value=anytype)
     def __init__(self, typ, value):
         super(Literal, self).__init__()
         self._typ: HailType = typ
         self.value = value
+        self._encoding = None
 
     def copy(self):
         return Literal(self._typ, self.value)
@@ -2620,9 +2683,50 @@ class Literal(IR):
     def head_str(self):
         return f'{self._typ._parsable_string()} {dump_json(self._typ._convert_to_json_na(self.value))}'
 
+    def _out_of_band_encoding(self):
+        """The encoded value if it is large enough to be passed out of band,
+        otherwise ``None``."""
+        if self._encoding is None:
+            self._encoding = b''
+            if self.value is not None and _encodable_out_of_band(self._typ):
+                encoding = self._typ._to_encoding(self.value)
+                if len(encoding) >= Literal.OUT_OF_BAND_THRESHOLD:
+                    self._encoding = encoding
+        return self._encoding or None
+
+    def render_head(self, r):
+        encoding = self._out_of_band_encoding()
+        if encoding is None:
+            return super().render_head(r)
+        if isinstance(self._typ, tset):
+            encoded_type = tarray(self._typ.element_type)
+            wrap = 'ToSet'
+        elif isinstance(self._typ, tdict):
+            encoded_type = tarray(ttuple(self._typ.key_type, self._typ.value_type))
+            wrap = 'ToDict'
+        else:
+            encoded_type = self._typ
+            wrap = None
+        literal_id = r.add_literal(encoded_type, encoding)
+        if literal_id is None:
+            return super().render_head(r)
+        # the tail closes the outermost node
+        head = f'(EncodedLiteral {encoded_type._parsable_string()} "{escape_str(literal_id)}"'
+        if wrap is not None:
+            head = f'({wrap} (ToStream False {head}))'
+        return head
+
+    def _hash_head(self):
+        # the value's rendering depends on the iteration order of sets and
+        # dicts, and may be large
+        return (self._typ._parsable_string(), _value_hash(self._typ, self.value))
+
     def _eq(self, other):
-        return other._typ == self._typ and \
-            other.value == self.value
+        if other._typ != self._typ:
+            return False
+        if isinstance(self.value, np.ndarray) or isinstance(other.value, np.ndarray):
+            return np.array_equal(self.value, other.value)
+        return other.value == self.value
 
     def _compute_type(self, env, agg_env):
         self._type = self._typ
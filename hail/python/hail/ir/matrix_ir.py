@@ -58,7 +58,7 @@ class MatrixRead(MatrixIR):
         return self.reader == other.reader and self.drop_cols == other.drop_cols and self.drop_rows == other.drop_rows
 
     def _compute_type(self):
-        self._type = Env.backend().matrix_type(self)
+        self._type = self.reader._local_type() or Env.backend().matrix_type(self)
 
 
 class MatrixFilterRows(MatrixIR):
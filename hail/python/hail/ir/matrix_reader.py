@@ -21,6 +21,11 @@ class MatrixReader(object):
     def __eq__(self, other):
         pass
 
+    def _local_type(self):
+        """The type of the matrix table read, if it is known without asking the
+        backend, otherwise ``None``."""
+        return None
+
 
 class MatrixNativeReader(MatrixReader):
     @typecheck_method(path=str,
@@ -89,6 +94,12 @@ class MatrixRangeReader(MatrixReader):
             other.n_cols == self.n_cols and \
             other.n_partitions == self.n_partitions
 
+    def _local_type(self):
+        return hl.tmatrix(hl.tstruct(),
+                          hl.tstruct(col_idx=hl.tint32), ['col_idx'],
+                          hl.tstruct(row_idx=hl.tint32), ['row_idx'],
+                          hl.tstruct())
+
 
 class MatrixVCFReader(MatrixReader):
     @typecheck_method(path=oneof(str, sequenceof(str)),
@@ -94,12 +94,18 @@ class Renderer:
     def add_jir(self, jir):
         pass
 
+    def add_literal(self, typ, encoding):
+        """Register an encoded literal value to be passed alongside the
+        rendered IR, returning its id, or ``None`` to render it inline."""
+        return None
+
 
 class PlainRenderer(Renderer):
     def __init__(self, stop_at_jir=False):
         self.stop_at_jir = stop_at_jir
         self.count = 0
         self.jirs = {}
+        self.cacheable = True
 
     def add_jir(self, jir):
         jir_id = f'm{self.count}'
@@ -108,13 +114,17 @@ class PlainRenderer(Renderer):
         return jir_id
 
     def __call__(self, x: 'Renderable'):
+        root = x
+        self.cacheable = True
         stack = RQStack()
         builder = []
 
         while x is not None or stack.non_empty():
             if x is not None:
                 # TODO: it would be nice to put the JavaIR logic in BaseIR somewhere but this isn't trivial
-                if self.stop_at_jir and hasattr(x, '_jir'):
+                if not self.stop_at_jir and getattr(x, '_plain_render', None) is not None:
+                    builder.append(x._plain_render)
+                elif self.stop_at_jir and hasattr(x, '_jir'):
                     jir_id = self.add_jir(x._jir)
                     if isinstance(x, ir.MatrixIR):
                         builder.append(f'(JavaMatrix {jir_id})')
@@ -140,7 +150,12 @@ class PlainRenderer(Renderer):
                     builder.append(' ')
                     x = top.pop()
 
-        return ''.join(builder)
+        res = ''.join(builder)
+        # IRs are immutable, so a rendering that references no JavaIRs can be
+        # reused by later renderings of any IR containing this one
+        if not self.stop_at_jir and self.count == 0 and self.cacheable and isinstance(root, ir.BaseIR):
+            root._plain_render = res
+        return res
 
 
 Vars = Dict[str, int]
@@ -153,11 +168,14 @@ BindingSite = namedtuple(
 
 
 class CSERenderer(Renderer):
-    def __init__(self, stop_at_jir=False):
+    def __init__(self, stop_at_jir=False, literal_id=None):
         self.stop_at_jir = stop_at_jir
         self.jir_count = 0
         self.jirs = {}
+        self.literals = {}
+        self.literal_id = literal_id
         self.memo: Dict[int, Sequence[str]] = {}
+        self.cacheable = True
 
     def add_jir(self, jir):
         jir_id = f'm{self.jir_count}'
@@ -165,6 +183,14 @@ class CSERenderer(Renderer):
         self.jirs[jir_id] = jir
         return jir_id
 
+    def add_literal(self, typ, encoding):
+        if self.literal_id is None:
+            literal_id = f'l{len(self.literals)}'
+        else:
+            literal_id = self.literal_id(encoding)
+        self.literals[literal_id] = (typ, encoding)
+        return literal_id
+
     def _add_jir(self, node):
         jir_id = self.add_jir(node._jir)
         if isinstance(node, ir.MatrixIR):
@@ -180,8 +206,16 @@ class CSERenderer(Renderer):
         self.memo[id(node)] = jref
 
     def __call__(self, root: 'ir.BaseIR') -> str:
+        # with 'stop_at_jir', the result depends on which nodes have been
+        # converted to Java since the last call, so is not reusable
+        if not self.stop_at_jir and root._cse_render is not None:
+            return root._cse_render
+        self.cacheable = True
         binding_sites = CSEAnalysisPass(self)(root)
-        return CSEPrintPass(self)(root, binding_sites)
+        res = CSEPrintPass(self)(root, binding_sites)
+        if not self.stop_at_jir and not self.jirs and not self.literals and self.cacheable:
+            root._cse_render = res
+        return res
 
 
 class CSEAnalysisPass:
@@ -245,7 +245,7 @@ class TableRead(TableIR):
         return self.reader == other.reader and self.drop_rows == other.drop_rows
 
     def _compute_type(self):
-        self._type = Env.backend().table_type(self)
+        self._type = self.reader._local_type() or Env.backend().table_type(self)
 
 
 class MatrixEntriesTable(TableIR):
@@ -19,6 +19,11 @@ class TableReader(object):
     def __eq__(self, other):
         pass
 
+    def _local_type(self):
+        """The type of the table read, if it is known without asking the
+        backend, otherwise ``None``."""
+        return None
+
 
 class TableNativeReader(TableReader):
     @typecheck_method(path=str,
@@ -113,6 +118,9 @@ class StringTableReader(TableReader):
             other.path == self.path and \
             other.min_partitions == self.min_partitions
 
+    def _local_type(self):
+        return hl.ttable(hl.tstruct(), hl.tstruct(file=hl.tstr, text=hl.tstr), [])
+
 
 class TableFromBlockMatrixNativeReader(TableReader):
     @typecheck_method(path=str, n_partitions=nullable(int), maximum_cache_memory_in_bytes=nullable(int))
@@ -134,6 +142,9 @@ class TableFromBlockMatrixNativeReader(TableReader):
             other.n_partitions == self.n_partitions and \
             other.maximum_cache_memory_in_bytes == self.maximum_cache_memory_in_bytes
 
+    def _local_type(self):
+        return hl.ttable(hl.tstruct(), hl.tstruct(row_idx=hl.tint64, entries=hl.tarray(hl.tfloat64)), ['row_idx'])
+
 
 class AvroTableReader(TableReader):
     @typecheck_method(schema=avro.schema.Schema,
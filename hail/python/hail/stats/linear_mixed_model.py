@@ -780,20 +780,83 @@ class LinearMixedModel(object):
 
         n_cols = pa.shape[1]
         assert pa.shape[0] == self.r
-
         if self.low_rank:
             assert a.shape[0] == self.n and a.shape[1] == n_cols
-            data = [(i,) + self._fit_alternative_numpy(pa[:, i], a[:, i]) for i in range(n_cols)]
-        else:
-            data = [(i,) + self._fit_alternative_numpy(pa[:, i], None) for i in range(n_cols)]
 
-        df = pd.DataFrame.from_records(data, columns=['idx', 'beta', 'sigma_sq', 'chi_sq', 'p_value'])
+        # alternatives are fit in blocks of columns to bound the size of
+        # the (r, block_size) and (n, block_size) intermediates
+        block_size = max(1, (1 << 22) // self.n)
+        stats = np.empty((4, n_cols))
+        for start in range(0, n_cols, block_size):
+            stop = min(start + block_size, n_cols)
+            stats[:, start:stop] = self._fit_alternatives_numpy_block(
+                pa[:, start:stop], a[:, start:stop] if self.low_rank else None)
+
+        df = pd.DataFrame({'idx': np.arange(n_cols),
+                           'beta': stats[0],
+                           'sigma_sq': stats[1],
+                           'chi_sq': stats[2],
+                           'p_value': stats[3]})
 
         if return_pandas:
             return df
         else:
             return Table.from_pandas(df, key='idx')
 
+    def _fit_alternatives_numpy_block(self, pa, a):
+        r"""Fit the alternative model for each column of `pa` (and `a`).
+
+        With :math:`x_\star` prepended to :math:`X`, the system for the
+        alternative model is bordered by a row and column:
+
+        .. math::
+
+          \begin{pmatrix} d & c^T \\ c & X^T D X \end{pmatrix}
+          \begin{pmatrix} \beta_\star \\ \beta \end{pmatrix}
+          = \begin{pmatrix} e \\ X^T D y \end{pmatrix}
+
+        The Cholesky factor :math:`L` of :math:`X^T D X` is shared by all
+        alternatives, so with :math:`w = L^{-1} c` and :math:`z = L^{-1} X^T D y`,
+        the Schur complement :math:`d - w^T w` is positive exactly when the
+        system is positive definite, :math:`\beta_\star = (e - w^T z) / (d - w^T w)`,
+        and the residual sum of squares falls by :math:`\beta_\star (e - w^T z)`
+        from that of the null model.
+
+        Returns an array with rows `beta`, `sigma_sq`, `chi_sq` and `p_value`,
+        which are NaN where the system is not positive definite.
+        """
+        from scipy.linalg import solve_triangular
+        from scipy.stats.distributions import chi2
+
+        gamma = self.gamma
+        dpa = self._d_alt[:, np.newaxis] * pa
+
+        if self.low_rank:
+            xdy = self.py @ dpa + gamma * (self.y @ a)
+            xdx_diag = np.einsum('ij,ij->j', pa, dpa) + gamma * np.einsum('ij,ij->j', a, a)
+            xdx_off = self.px.T @ dpa + gamma * (self.x.T @ a)
+        else:
+            xdy = self.py @ dpa
+            xdx_diag = np.einsum('ij,ij->j', pa, dpa)
+            xdx_off = self.px.T @ dpa
+
+        chol = np.linalg.cholesky(self._xdx_alt[1:, 1:])
+        z = solve_triangular(chol, self._xdy_alt[1:], lower=True)
+        w = solve_triangular(chol, xdx_off, lower=True)
+
+        schur = xdx_diag - np.einsum('ij,ij->j', w, w)
+        schur = np.where(schur > 0, schur, np.nan)
+
+        numerator = xdy - w.T @ z
+        beta = numerator / schur
+        decrease = beta * numerator
+        residual_sq = self._residual_sq - decrease
+        sigma_sq = residual_sq / self._dof_alt
+        chi_sq = -self.n * np.log1p(-decrease / self._residual_sq)  # log1p => precision
+        p_value = chi2.sf(chi_sq, 1)
+
+        return np.stack([beta, sigma_sq, chi_sq, p_value])
+
     def _fit_alternative_numpy(self, pa, a):
         from scipy.linalg import solve, LinAlgError
         from scipy.stats.distributions import chi2
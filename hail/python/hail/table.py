@@ -1,5 +1,6 @@
 import collections
 import itertools
+import numpy as np
 import pandas
 import pyspark
 from typing import Optional, Dict, Callable
@@ -10,7 +11,7 @@ from hail.expr.expressions import Expression, StructExpression, \
     ExpressionException, TupleExpression, unify_all, NumericExpression, \
     StringExpression, CallExpression, CollectionExpression, DictExpression, \
     IntervalExpression, LocusExpression, NDArrayExpression, expr_array
-from hail.expr.types import hail_type, tstruct, types_match, tarray, tset
+from hail.expr.types import hail_type, tstruct, types_match, tarray, tset, _columns_from_encoding
 from hail.expr.table_type import ttable
 import hail.ir as ir
 from hail.typecheck import typecheck, typecheck_method, dictof, anytype, \
@@ -3237,25 +3238,87 @@ class Table(ExprContainer):
         """
         return Env.spark_backend('to_spark').to_spark(self, flatten)
 
-    @typecheck_method(flatten=bool)
-    def to_pandas(self, flatten=True):
+    @typecheck_method(flatten=bool, columnar=bool)
+    def to_pandas(self, flatten=True, columnar=False):
         """Converts this table to a Pandas DataFrame.
 
         Because conversion to Pandas is done through Spark, and Spark
         cannot represent complex types, types are expanded before
         flattening or conversion.
 
+        If `columnar` is ``True``, the table is instead collected with
+        :meth:`.to_numpy_columns`, which does not require Spark and does not
+        construct a Python object per row for fields of primitive numeric or
+        Boolean type. Missing values of integer and Boolean fields are
+        represented with Pandas' nullable ``Int32``, ``Int64`` and
+        ``boolean`` types; missing floating-point values become ``NaN``.
+
         Parameters
         ----------
         flatten : :obj:`bool`
             If ``True``, :meth:`flatten` before converting to Pandas DataFrame.
+        columnar : :obj:`bool`
+            If ``True``, collect the table column by column.
 
         Returns
         -------
         :class:`.pandas.DataFrame`
 
         """
-        return Env.spark_backend('to_pandas').to_pandas(self, flatten)
+        if not columnar:
+            return Env.spark_backend('to_pandas').to_pandas(self, flatten)
+
+        t = self.flatten() if flatten else self
+        data = {}
+        for f, values in t.to_numpy_columns().items():
+            if isinstance(values, np.ma.MaskedArray):
+                if np.issubdtype(values.dtype, np.floating):
+                    values = values.filled(np.nan)
+                elif values.dtype == np.bool_:
+                    values = pandas.arrays.BooleanArray(values.data, values.mask)
+                else:
+                    values = pandas.arrays.IntegerArray(values.data, values.mask)
+            data[f] = values
+        return pandas.DataFrame(data, columns=list(t.row))
+
+    def to_numpy_columns(self):
+        """Collect the rows of the table as one NumPy array per field.
+
+        Examples
+        --------
+
+        >>> columns = table1.select(table1.HT, table1.X).to_numpy_columns()
+        >>> columns['HT'].mean()  # doctest: +SKIP
+
+        Notes
+        -----
+        Fields of type :py:data:`.tint32`, :py:data:`.tint64`,
+        :py:data:`.tfloat32`, :py:data:`.tfloat64` and :py:data:`.tbool` are
+        transferred as contiguous buffers and returned as NumPy arrays of the
+        corresponding NumPy type, without constructing a Python object per
+        row. If a field has missing values, it is returned as a
+        :class:`numpy.ma.MaskedArray` whose mask is ``True`` where the value
+        is missing. Fields of all other types are returned as NumPy arrays of
+        Python objects, as they would be returned by :meth:`.collect`.
+
+        Rows are ordered as in :meth:`.collect`. To collect the fields of a
+        :class:`.MatrixTable`, use this method on the result of
+        :meth:`.MatrixTable.rows`, :meth:`.MatrixTable.cols` or
+        :meth:`.MatrixTable.entries`.
+
+        Warning
+        -------
+        Using this method can cause out of memory errors. Only collect small tables.
+
+        Returns
+        -------
+        :obj:`dict` of :obj:`str` to :class:`numpy.ndarray`
+            Collected values of each row field.
+        """
+        rows = self.collect(_localize=False)
+        columns = hl.rbind(rows, lambda rows: hl.struct(**{f: rows.map(lambda r: r[f]) for f in self.row}))
+        encoded_columns, _ = Env.backend()._execute_encoded(columns._ir)
+        return _columns_from_encoding(columns.dtype, encoded_columns)
 
     @staticmethod
     @typecheck(df=pandas.DataFrame,
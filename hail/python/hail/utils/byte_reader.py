@@ -0,0 +1,92 @@
+import struct
+
+import numpy as np
+
+_int32 = struct.Struct('<i')
+_int64 = struct.Struct('<q')
+_float32 = struct.Struct('<f')
+_float64 = struct.Struct('<d')
+
+
+def strip_block_framing(encoding):
+    """Concatenate the payloads of a block-framed encoding.
+
+    Values encoded with a ``BlockingBufferSpec`` whose child is a
+    ``StreamBlockBufferSpec`` are written as a sequence of blocks, each
+    prefixed with its length as a little-endian 32-bit integer.
+    """
+    view = memoryview(encoding)
+    n = len(view)
+    off = 0
+    blocks = []
+    while off < n:
+        block_len = _int32.unpack_from(view, off)[0]
+        off += 4
+        blocks.append(view[off:off + block_len])
+        off += block_len
+    if len(blocks) == 1:
+        return blocks[0]
+    return memoryview(b''.join(blocks))
+
+
+class ByteReader:
+    """Sequential reader over a value encoded with Hail's native codec.
+
+    All multi-byte primitives are little-endian.  Missingness of the
+    elements of an array or the fields of a struct is written as a bit
+    vector, least significant bit first, before the present values.
+    """
+
+    def __init__(self, byte_memview, offset=0):
+        self._memview = byte_memview
+        self._offset = offset
+
+    def read_int32(self) -> int:
+        res = _int32.unpack_from(self._memview, self._offset)[0]
+        self._offset += 4
+        return res
+
+    def read_int64(self) -> int:
+        res = _int64.unpack_from(self._memview, self._offset)[0]
+        self._offset += 8
+        return res
+
+    def read_float32(self) -> float:
+        res = _float32.unpack_from(self._memview, self._offset)[0]
+        self._offset += 4
+        return res
+
+    def read_float64(self) -> float:
+        res = _float64.unpack_from(self._memview, self._offset)[0]
+        self._offset += 8
+        return res
+
+    def read_bool(self) -> bool:
+        res = self._memview[self._offset] != 0
+        self._offset += 1
+        return res
+
+    def read_bytes_view(self, num_bytes):
+        res = self._memview[self._offset:self._offset + num_bytes]
+        self._offset += num_bytes
+        return res
+
+    def read_bytes(self, num_bytes) -> bytes:
+        return self.read_bytes_view(num_bytes).tobytes()
+
+    def read_missing_bits(self, n) -> np.ndarray:
+        """Read the missing bits for `n` values as a boolean array."""
+        n_bytes = (n + 7) >> 3
+        if n_bytes == 0:
+            return np.zeros(0, dtype=bool)
+        bits = np.frombuffer(self.read_bytes_view(n_bytes), dtype=np.uint8)
+        return np.unpackbits(bits, count=n, bitorder='little').view(bool)
+
+    def read_numpy(self, dtype, n) -> np.ndarray:
+        """Read `n` densely packed values of the NumPy type `dtype`.
+
+        The result is a read-only view on the underlying buffer."""
+        dtype = np.dtype(dtype)
+        res = np.frombuffer(self._memview, dtype=dtype, count=n, offset=self._offset)
+        self._offset += n * dtype.itemsize
+        return res
@@ -0,0 +1,50 @@
+import struct
+
+import numpy as np
+
+_int32 = struct.Struct('<i')
+_int64 = struct.Struct('<q')
+_float32 = struct.Struct('<f')
+_float64 = struct.Struct('<d')
+
+
+class ByteWriter:
+    """Sequential writer of a value in Hail's native codec.
+
+    The inverse of :class:`.ByteReader`: multi-byte primitives are
+    little-endian, and missingness is written as a bit vector, least
+    significant bit first, before the present values.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+
+    def write_int32(self, v):
+        self._buf += _int32.pack(v)
+
+    def write_int64(self, v):
+        self._buf += _int64.pack(v)
+
+    def write_float32(self, v):
+        self._buf += _float32.pack(v)
+
+    def write_float64(self, v):
+        self._buf += _float64.pack(v)
+
+    def write_bool(self, v):
+        self._buf.append(1 if v else 0)
+
+    def write_bytes(self, b):
+        self._buf += b
+
+    def write_missing_bits(self, missing):
+        """Write the missing bits of a sequence of booleans."""
+        if len(missing) > 0:
+            self._buf += np.packbits(np.asarray(missing, dtype=bool), bitorder='little').tobytes()
+
+    def write_numpy(self, dtype, values):
+        """Write `values` densely packed as the NumPy type `dtype`."""
+        self._buf += np.ascontiguousarray(values, dtype=dtype).tobytes()
+
+    def getvalue(self) -> bytes:
+        return bytes(self._buf)
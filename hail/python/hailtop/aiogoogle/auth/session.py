@@ -64,13 +64,23 @@ class Session(BaseSession):
     _session: aiohttp.ClientSession
     _access_token: AccessToken
 
-    def __init__(self, *, credentials: Credentials = None, params: Optional[Mapping[str, str]] = None, **kwargs):
+    def __init__(self, *, credentials: Credentials = None, params: Optional[Mapping[str, str]] = None,
+                 http_session: Optional[hailtop.httpx.ClientSession] = None, **kwargs):
+        '''If `http_session` is given, requests are made through it, so
+        sessions with different credentials can share its connection
+        pool.  It is not closed when this session is closed.'''
         if credentials is None:
             credentials = Credentials.default_credentials()
-        if 'raise_for_status' not in kwargs:
-            kwargs['raise_for_status'] = True
         self._params = params
-        self._session = hailtop.httpx.ClientSession(**kwargs)
+        if http_session is None:
+            if 'raise_for_status' not in kwargs:
+                kwargs['raise_for_status'] = True
+            http_session = hailtop.httpx.ClientSession(**kwargs)
+            self._owns_session = True
+        else:
+            assert not kwargs
+            self._owns_session = False
+        self._session = http_session
         self._access_token = AccessToken(credentials)
 
     async def request(self, method: str, url: str, **kwargs):
@@ -98,6 +108,7 @@ class Session(BaseSession):
 
     async def close(self) -> None:
         if hasattr(self, '_session'):
-            await self._session.close()
+            if self._owns_session:
+                await self._session.close()
             del self._session
         del self._access_token
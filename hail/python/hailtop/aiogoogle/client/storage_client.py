@@ -1,4 +1,6 @@
 import os
+import base64
+import datetime
 from typing import Tuple, Any, Set, Optional, MutableMapping, Dict, AsyncIterator, cast, Type, List
 from types import TracebackType
 from multidict import CIMultiDictProxy  # pylint: disable=unused-import
@@ -358,6 +360,28 @@ class StorageClient(BaseClient):
         }
         await self.post(f'/b/{bucket}/o/{urllib.parse.quote(destination, safe="")}/compose', **kwargs)
 
+    async def rewrite_object(self, bucket: str, name: str, dest_bucket: str, dest_name: str, **kwargs) -> None:
+        assert name and dest_name
+        # Copy an object without downloading it.  Large copies, or
+        # copies between locations or storage classes, may take
+        # several calls, each continuing from the last rewriteToken.
+        # See:
+        # https://cloud.google.com/storage/docs/json_api/v1/objects/rewrite
+        if 'params' in kwargs:
+            params = kwargs['params']
+        else:
+            params = {}
+            kwargs['params'] = params
+        assert 'rewriteToken' not in params
+
+        path = (f'/b/{bucket}/o/{urllib.parse.quote(name, safe="")}'
+                f'/rewriteTo/b/{dest_bucket}/o/{urllib.parse.quote(dest_name, safe="")}')
+        while True:
+            resp = await self.post(path, **kwargs)
+            if resp['done']:
+                return
+            params['rewriteToken'] = resp['rewriteToken']
+
 
 class GetObjectFileStatus(FileStatus):
     def __init__(self, items: Dict[str, str]):
@@ -366,6 +390,19 @@ class GetObjectFileStatus(FileStatus):
     async def size(self) -> int:
         return int(self._items['size'])
 
+    async def md5(self) -> Optional[bytes]:
+        # composite objects have no MD5
+        md5_hash = self._items.get('md5Hash')
+        if md5_hash is None:
+            return None
+        return base64.b64decode(md5_hash)
+
+    async def mtime(self) -> Optional[float]:
+        updated = self._items.get('updated')
+        if updated is None:
+            return None
+        return datetime.datetime.fromisoformat(updated.replace('Z', '+00:00')).timestamp()
+
     async def __getitem__(self, key: str) -> str:
         return self._items[key]
 
@@ -542,6 +579,19 @@ class GoogleStorageAsyncFS(AsyncFS):
             num_parts: int) -> GoogleStorageMultiPartCreate:
         return GoogleStorageMultiPartCreate(sema, self, url, num_parts)
 
+    def supports_copy_within(self, src: str, dest: str) -> bool:
+        return True
+
+    async def copy_within(self, src: str, dest: str, size: int) -> None:  # pylint: disable=unused-argument
+        src_bucket, src_name = self._get_bucket_name(src)
+        dest_bucket, dest_name = self._get_bucket_name(dest)
+        try:
+            await self._storage_client.rewrite_object(src_bucket, src_name, dest_bucket, dest_name)
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                raise FileNotFoundError(src) from e
+            raise
+
     async def staturl(self, url: str) -> str:
         return await self._staturl_parallel_isfile_isdir(url)
 
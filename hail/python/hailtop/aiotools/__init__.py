@@ -1,6 +1,6 @@
 from .exceptions import FileAndDirectoryError, UnexpectedEOFError
 from .stream import (
-    ReadableStream, WritableStream, blocking_readable_stream_to_async,
+    ReadableStream, WritableStream, ReadAheadReadableStream, blocking_readable_stream_to_async,
     blocking_writable_stream_to_async)
 from .fs import (
     FileStatus, FileListEntry, AsyncFS, LocalAsyncFS, RouterAsyncFS, Transfer,
@@ -8,10 +8,12 @@ from .fs import (
 from .utils import FeedableAsyncIterable, WriteBuffer
 from .tasks import BackgroundTaskManager
 from .weighted_semaphore import WeightedSemaphore
+from .adaptive_semaphore import AdaptiveSemaphore
 
 __all__ = [
     'ReadableStream',
     'WritableStream',
+    'ReadAheadReadableStream',
     'blocking_readable_stream_to_async',
     'blocking_writable_stream_to_async',
     'FileStatus',
@@ -26,5 +28,6 @@ __all__ = [
     'MultiPartCreate',
     'UnexpectedEOFError',
     'WeightedSemaphore',
+    'AdaptiveSemaphore',
     'WriteBuffer',
 ]
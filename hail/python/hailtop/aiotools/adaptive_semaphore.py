@@ -0,0 +1,78 @@
+from typing import Deque, Optional, Type
+from types import TracebackType
+from collections import deque
+import asyncio
+
+
+class AdaptiveSemaphore:
+    '''A semaphore, usable in place of `asyncio.Semaphore`, whose limit
+    can be changed while it is in use.  Lowering the limit doesn't
+    preempt holders: new acquisitions wait until fewer than `limit`
+    are held.
+    '''
+
+    def __init__(self, value: int):
+        assert value >= 1
+        self._limit = value
+        self._held = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def set_limit(self, value: int) -> None:
+        assert value >= 1
+        self._limit = value
+        self._wake()
+
+    def held(self) -> int:
+        return self._held
+
+    def waiting(self) -> int:
+        return sum(1 for fut in self._waiters if not fut.done())
+
+    def locked(self) -> bool:
+        return self._held >= self._limit
+
+    def _wake(self) -> None:
+        while self._waiters and self._held < self._limit:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self._held += 1
+                fut.set_result(None)
+
+    async def acquire(self) -> bool:
+        if not self._waiters and self._held < self._limit:
+            self._held += 1
+            return True
+
+        fut = asyncio.get_event_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # granted after we were cancelled
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+            raise
+        return True
+
+    def release(self) -> None:
+        assert self._held > 0
+        self._held -= 1
+        self._wake()
+
+    async def __aenter__(self) -> None:
+        await self.acquire()
+
+    async def __aexit__(self,
+                        exc_type: Optional[Type[BaseException]],
+                        exc_val: Optional[BaseException],
+                        exc_tb: Optional[TracebackType]) -> None:
+        self.release()
@@ -14,7 +14,7 @@ from azure.storage.blob import BlobProperties
 from azure.storage.blob.aio import BlobClient, ContainerClient, BlobServiceClient, StorageStreamDownloader
 from azure.storage.blob.aio._list_blobs_helper import BlobPrefix
 import azure.core.exceptions
-from hailtop.utils import retry_transient_errors, flatten, OnlineBoundedGather2, first_extant_file
+from hailtop.utils import retry_transient_errors, flatten, OnlineBoundedGather2, first_extant_file, sleep_and_backoff
 from hailtop.aiotools import UnexpectedEOFError
 
 from .fs import (AsyncFS, ReadableStream, WritableStream, MultiPartCreate, FileListEntry, FileStatus,
@@ -241,6 +241,17 @@ class AzureFileStatus(FileStatus):
     async def size(self) -> int:
         return self.blob_props.size
 
+    async def md5(self) -> Optional[bytes]:
+        # only set for blobs uploaded in a single request or with an
+        # explicit Content-MD5
+        content_md5 = self.blob_props.content_settings.content_md5
+        if content_md5 is None:
+            return None
+        return bytes(content_md5)
+
+    async def mtime(self) -> Optional[float]:
+        return self.blob_props.last_modified.timestamp()
+
     async def __getitem__(self, key: str) -> Any:
         return self.blob_props.__dict__[key]
 
@@ -426,6 +437,35 @@ class AzureAsyncFS(AsyncFS):
     async def staturl(self, url: str) -> str:
         return await self._staturl_parallel_isfile_isdir(url)
 
+    def supports_copy_within(self, src: str, dest: str) -> bool:
+        # Copying from another account requires the source be
+        # authorized by a SAS token, which we don't have.
+        src_account, _, _ = self._get_account_container_name(src)
+        dest_account, _, _ = self._get_account_container_name(dest)
+        return src_account == dest_account
+
+    async def copy_within(self, src: str, dest: str, size: int) -> None:  # pylint: disable=unused-argument
+        src_client = self.get_blob_client(src)
+        dest_client = self.get_blob_client(dest)
+        try:
+            copy_props = await dest_client.start_copy_from_url(src_client.url)
+        except azure.core.exceptions.ResourceNotFoundError as e:
+            raise FileNotFoundError(src) from e
+
+        # Copies within an account usually complete synchronously,
+        # but large ones may finish asynchronously.
+        status = copy_props['copy_status']
+        description = None
+        delay = 0.1
+        while status == 'pending':
+            delay = await sleep_and_backoff(delay)
+            blob_props = await dest_client.get_blob_properties()
+            status = blob_props.copy.status
+            description = blob_props.copy.status_description
+
+        if status != 'success':
+            raise OSError(f'copy of {src} to {dest} {status}: {description}')
+
     async def remove(self, url: str) -> None:
         try:
             await self.get_blob_client(url).delete_blob()
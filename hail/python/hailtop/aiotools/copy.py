@@ -1,10 +1,11 @@
 from typing import List, Optional
-import sys
+import argparse
 import json
 import urllib
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
-from hailtop.aiotools.fs import RouterAsyncFS, LocalAsyncFS, Transfer
+from hailtop.aiotools.fs import RouterAsyncFS, LocalAsyncFS, Transfer, Copier, CopyReport
+from hailtop.aiotools.adaptive_semaphore import AdaptiveSemaphore
 from hailtop.aiogoogle import GoogleStorageAsyncFS
 from hailtop.aiotools.s3asyncfs import S3AsyncFS
 from hailtop.aiotools.azurefs import AzureAsyncFS
@@ -40,7 +41,9 @@ def filesystem_from_scheme(scheme, thread_pool=None, gcs_params=None):
 
 
 async def copy(requester_pays_project: Optional[str],
-               transfers: List[Transfer]
+               transfers: List[Transfer],
+               sync: bool = False,
+               max_parallelism: int = 1000
                ) -> None:
     gcs_params = {'userProject': requester_pays_project} if requester_pays_project else None
     schemes = referenced_schemes(transfers)
@@ -51,20 +54,34 @@ async def copy(requester_pays_project: Optional[str],
                                               gcs_params=gcs_params)
                        for s in schemes]
         async with RouterAsyncFS(default_scheme, filesystems) as fs:
-            sema = asyncio.Semaphore(50)
+            # Start at a modest parallelism and let the controller
+            # adapt it to the observed throughput.
+            sema = AdaptiveSemaphore(min(50, max_parallelism))
+            copier = Copier(fs, sync=sync, max_parallelism=max_parallelism)
+            copy_report = CopyReport(transfers)
             async with sema:
-                copy_report = await fs.copy(sema, transfers)
-                copy_report.summarize()
+                await copier.copy(sema, copy_report, transfers, return_exceptions=False)
+            copy_report.mark_done()
+            copy_report.summarize()
 
 
 async def main() -> None:
-    assert len(sys.argv) == 3
-    requster_pays_project = json.loads(sys.argv[1])
-    files = json.loads(sys.argv[2])
+    parser = argparse.ArgumentParser(description='Copy files between local and cloud storage.')
+    parser.add_argument('requester_pays_project', type=json.loads,
+                        help='JSON-encoded project to bill for requester pays buckets, or null')
+    parser.add_argument('files', type=json.loads,
+                        help='JSON-encoded list of {"from": ..., "to": ...} transfers')
+    parser.add_argument('--sync', action='store_true',
+                        help='skip files whose destination has the same size and checksum, or is newer')
+    parser.add_argument('--max-parallelism', type=int, default=1000,
+                        help='upper bound on the adaptively chosen number of concurrent transfers')
+    args = parser.parse_args()
 
     await copy(
-        requster_pays_project,
-        [Transfer(f['from'], f['to'], treat_dest_as=Transfer.DEST_IS_TARGET) for f in files]
+        args.requester_pays_project,
+        [Transfer(f['from'], f['to'], treat_dest_as=Transfer.DEST_IS_TARGET) for f in args.files],
+        sync=args.sync,
+        max_parallelism=args.max_parallelism
     )
 
 
@@ -4,19 +4,24 @@ import abc
 import os
 import os.path
 import io
+import errno
 import stat
 import shutil
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 import urllib.parse
 import functools
+import time
 import humanize
 from hailtop.utils import (
     retry_transient_errors, blocking_to_async, url_basename, url_join, bounded_gather2,
-    time_msecs, humanize_timedelta_msecs, OnlineBoundedGather2)
+    time_msecs, humanize_timedelta_msecs, OnlineBoundedGather2, is_transient_error)
 from .exceptions import FileAndDirectoryError, UnexpectedEOFError
 from .weighted_semaphore import WeightedSemaphore
-from .stream import ReadableStream, WritableStream, blocking_readable_stream_to_async, blocking_writable_stream_to_async
+from .adaptive_semaphore import AdaptiveSemaphore
+from .stream import (
+    ReadableStream, WritableStream, ReadAheadReadableStream, blocking_readable_stream_to_async,
+    blocking_writable_stream_to_async)
 
 
 class FileStatus(abc.ABC):
@@ -28,6 +33,15 @@ class FileStatus(abc.ABC):
     async def __getitem__(self, key: str) -> Any:
         pass
 
+    async def md5(self) -> Optional[bytes]:
+        '''The MD5 digest of the file, if the filesystem records it.'''
+        return None
+
+    async def mtime(self) -> Optional[float]:
+        '''The modification time of the file in seconds since the epoch,
+        if the filesystem records it.'''
+        return None
+
 
 class FileListEntry(abc.ABC):
     @abc.abstractmethod
@@ -178,6 +192,17 @@ class AsyncFS(abc.ABC):
             async for entry in it:
                 await pool.call(self._remove_doesnt_exist_ok, await entry.url())
 
+    def supports_copy_within(self, src: str, dest: str) -> bool:  # pylint: disable=unused-argument
+        '''Whether `copy_within` can copy `src` to `dest` without streaming
+        the data through this process.'''
+        return False
+
+    async def copy_within(self, src: str, dest: str, size: int) -> None:
+        '''Copy the file `src` of `size` bytes to `dest` using a copy
+        primitive of the filesystem itself.  Only called when
+        `supports_copy_within(src, dest)` is true.'''
+        raise NotImplementedError
+
     async def touch(self, url: str) -> None:
         async with await self.create(url):
             pass
@@ -228,11 +253,17 @@ class AsyncFS(abc.ABC):
         the destination filesystem is used.'''
         return 128 * 1024 * 1024
 
+    @staticmethod
+    def _max_copy_part_size():
+        '''Largest part size an adaptive copy will use for very large files.'''
+        return 1024 * 1024 * 1024
+
     async def copy(self,
                    sema: asyncio.Semaphore,
                    transfer: Union['Transfer', List['Transfer']],
-                   return_exceptions: bool = False) -> 'CopyReport':
-        copier = Copier(self)
+                   return_exceptions: bool = False,
+                   sync: bool = False) -> 'CopyReport':
+        copier = Copier(self, sync=sync)
         copy_report = CopyReport(transfer)
         await copier.copy(sema, copy_report, transfer, return_exceptions)
         copy_report.mark_done()
@@ -247,6 +278,9 @@ class LocalStatFileStatus(FileStatus):
     async def size(self) -> int:
         return self._stat_result.st_size
 
+    async def mtime(self) -> Optional[float]:
+        return self._stat_result.st_mtime
+
     async def __getitem__(self, key: str) -> Any:
         raise KeyError(key)
 
@@ -311,6 +345,24 @@ class LocalMultiPartCreate(MultiPartCreate):
                 pass
 
 
+def _copy_file_range(src_path: str, dest_path: str) -> None:
+    # copy_file_range copies inside the kernel and shares extents on
+    # filesystems that support reflinks.  It fails without copying
+    # anything when the files are on different filesystems or the
+    # filesystem doesn't support it, in which case fall back to
+    # shutil, which uses sendfile where it can.
+    if hasattr(os, 'copy_file_range'):
+        with open(src_path, 'rb') as srcf, open(dest_path, 'wb') as destf:
+            try:
+                while os.copy_file_range(srcf.fileno(), destf.fileno(), 1 << 30) > 0:
+                    pass
+                return
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+    shutil.copyfile(src_path, dest_path)
+
+
 class LocalAsyncFS(AsyncFS):
     def __init__(self, thread_pool: ThreadPoolExecutor, max_workers=None):
         if not thread_pool:
@@ -359,6 +411,12 @@ class LocalAsyncFS(AsyncFS):
             pass
         return LocalMultiPartCreate(self, self._get_path(url), num_parts)
 
+    def supports_copy_within(self, src: str, dest: str) -> bool:
+        return True
+
+    async def copy_within(self, src: str, dest: str, size: int) -> None:  # pylint: disable=unused-argument
+        await blocking_to_async(self._thread_pool, _copy_file_range, self._get_path(src), self._get_path(dest))
+
     async def statfile(self, url: str) -> LocalStatFileStatus:
         path = self._get_path(url)
         stat_result = await blocking_to_async(self._thread_pool, os.stat, path)
@@ -460,14 +518,48 @@ class Transfer:
         self.treat_dest_as = treat_dest_as
 
 
+class CopyProgress:
+    '''Running totals of a copy, sampled to compute recent rates.'''
+
+    def __init__(self):
+        self.bytes = 0
+        self.files = 0
+        self.transient_errors = 0
+        self.bytes_per_second: Optional[float] = None
+        self.files_per_second: Optional[float] = None
+        self._sample_time = time.monotonic()
+        self._sample_bytes = 0
+        self._sample_files = 0
+        self._sample_transient_errors = 0
+
+    def sample(self):
+        '''Update and return the transfer rates and the number of transient
+        errors since the last sample.'''
+        now = time.monotonic()
+        elapsed = max(now - self._sample_time, 1e-6)
+        self.bytes_per_second = (self.bytes - self._sample_bytes) / elapsed
+        self.files_per_second = (self.files - self._sample_files) / elapsed
+        transient_errors = self.transient_errors - self._sample_transient_errors
+        self._sample_time = now
+        self._sample_bytes = self.bytes
+        self._sample_files = self.files
+        self._sample_transient_errors = self.transient_errors
+        return self.bytes_per_second, self.files_per_second, transient_errors
+
+
 class SourceReport:
-    def __init__(self, source):
+    def __init__(self, source, progress: Optional[CopyProgress] = None):
         self._source = source
+        if progress is None:
+            progress = CopyProgress()
+        self._progress = progress
         self._source_type: Optional[str] = None
         self._files = 0
         self._bytes = 0
         self._errors = 0
         self._complete = 0
+        self._skipped = 0
+        self._skipped_bytes = 0
         self._first_file_error: Optional[Dict[str, Any]] = None
         self._exception: Optional[Exception] = None
 
@@ -487,12 +579,12 @@ class SourceReport:
 class TransferReport:
     _source_report: Union[SourceReport, List[SourceReport]]
 
-    def __init__(self, transfer: Transfer):
+    def __init__(self, transfer: Transfer, progress: Optional[CopyProgress] = None):
         self._transfer = transfer
         if isinstance(transfer.src, str):
-            self._source_report = SourceReport(transfer.src)
+            self._source_report = SourceReport(transfer.src, progress)
         else:
-            self._source_report = [SourceReport(s) for s in transfer.src]
+            self._source_report = [SourceReport(s, progress) for s in transfer.src]
         self._exception: Optional[Exception] = None
 
     def set_exception(self, exception: Exception):
@@ -505,12 +597,21 @@ class CopyReport:
         self._start_time = time_msecs()
         self._end_time = None
         self._duration = None
+        self._progress = CopyProgress()
         if isinstance(transfer, Transfer):
-            self._transfer_report: Union[TransferReport, List[TransferReport]] = TransferReport(transfer)
+            self._transfer_report: Union[TransferReport, List[TransferReport]] = TransferReport(transfer, self._progress)
         else:
-            self._transfer_report = [TransferReport(t) for t in transfer]
+            self._transfer_report = [TransferReport(t, self._progress) for t in transfer]
         self._exception: Optional[Exception] = None
 
+    def bytes_per_second(self) -> Optional[float]:
+        '''The transfer rate when the copy's progress was last sampled.  An
+        adaptive copy samples it periodically.'''
+        return self._progress.bytes_per_second
+
+    def files_per_second(self) -> Optional[float]:
+        return self._progress.files_per_second
+
     def set_exception(self, exception: Exception):
         assert not self._exception
         self._exception = exception
@@ -539,18 +640,50 @@ class CopyReport:
         total_sources = len(source_reports)
         total_files = sum([sr._files for sr in source_reports])
         total_bytes = sum([sr._bytes for sr in source_reports])
+        total_skipped = sum([sr._skipped for sr in source_reports])
+        total_skipped_bytes = sum([sr._skipped_bytes for sr in source_reports])
+        transferred_bytes = total_bytes - total_skipped_bytes
 
         print('Transfer summary:')
         print(f'  Transfers: {total_transfers}')
         print(f'  Sources: {total_sources}')
         print(f'  Files: {total_files}')
         print(f'  Bytes: {humanize.naturalsize(total_bytes)}')
+        if total_skipped:
+            print(f'  Skipped files: {total_skipped}')
+            print(f'  Skipped bytes: {humanize.naturalsize(total_skipped_bytes)}')
         print(f'  Time: {humanize_timedelta_msecs(self._duration)}')
-        print(f'  Average transfer rate: {humanize.naturalsize(total_bytes / (self._duration / 1000))}/s')
+        print(f'  Average transfer rate: {humanize.naturalsize(transferred_bytes / (self._duration / 1000))}/s')
+        print(f'  Average files per second: {total_files / (self._duration / 1000):.1f}')
+        if self._progress.transient_errors:
+            print(f'  Transient errors: {self._progress.transient_errors}')
 
         print('Sources:')
         for sr in source_reports:
-            print(f'  {sr._source}: {sr._files} files, {humanize.naturalsize(sr._bytes)}')
+            skipped = f', {sr._skipped} unchanged files skipped' if sr._skipped else ''
+            print(f'  {sr._source}: {sr._files} files, {humanize.naturalsize(sr._bytes)}{skipped}')
+
+
+async def _file_unchanged(srcstat: FileStatus, deststat: FileStatus) -> bool:
+    '''Whether a sync can skip copying a file with status `srcstat` over
+    one with status `deststat`.
+
+    Files must have the same size.  If both filesystems record an MD5,
+    they must agree.  Otherwise, the destination must have been
+    modified no earlier than the source, that is, it was written after
+    the source was last changed.
+    '''
+    if await srcstat.size() != await deststat.size():
+        return False
+
+    src_md5 = await srcstat.md5()
+    dest_md5 = await deststat.md5()
+    if src_md5 is not None and dest_md5 is not None:
+        return src_md5 == dest_md5
+
+    src_mtime = await srcstat.mtime()
+    dest_mtime = await deststat.mtime()
+    return src_mtime is not None and dest_mtime is not None and dest_mtime >= src_mtime
 
 
 class SourceCopier:
@@ -559,13 +692,14 @@ class SourceCopier:
     created for each source.
     '''
 
-    def __init__(self, router_fs: 'RouterAsyncFS', xfer_sema: WeightedSemaphore, src: str, dest: str, treat_dest_as: str, dest_type_task):
+    def __init__(self, router_fs: 'RouterAsyncFS', xfer_sema: WeightedSemaphore, src: str, dest: str, treat_dest_as: str, dest_type_task, sync: bool = False):
         self.router_fs = router_fs
         self.xfer_sema = xfer_sema
         self.src = src
         self.dest = dest
         self.treat_dest_as = treat_dest_as
         self.dest_type_task = dest_type_task
+        self.sync = sync
 
         self.src_is_file: Optional[bool] = None
         self.src_is_dir: Optional[bool] = None
@@ -578,24 +712,50 @@ class SourceCopier:
         if self.pending == 0:
             self.barrier.set()
 
-    async def _copy_file(self, srcfile: str, size: int, destfile: str) -> None:
+    async def _retry_transient_errors(self, source_report: SourceReport, f, *args):
+        # count transient errors; an adaptive copy backs off on them
+        async def counting_transient_errors():
+            try:
+                return await f(*args)
+            except Exception as e:
+                if is_transient_error(e):
+                    source_report._progress.transient_errors += 1
+                raise
+
+        return await retry_transient_errors(counting_transient_errors)
+
+    async def _copy_file(self, progress: CopyProgress, srcfile: str, size: int, destfile: str) -> None:
+        assert not destfile.endswith('/')
+
+        # Read the next chunk while writing this one.  The read-ahead
+        # stream accounts for its buffers against xfer_sema.
+        chunk_size = max(min(Copier.BUFFER_SIZE, size), 1)
+        async with ReadAheadReadableStream(await self.router_fs.open(srcfile), chunk_size, n_chunks=1, sema=self.xfer_sema) as srcf:
+            try:
+                dest_cm = await self.router_fs.create(destfile, retry_writes=False)
+            except FileNotFoundError:
+                await self.router_fs.makedirs(os.path.dirname(destfile), exist_ok=True)
+                dest_cm = await self.router_fs.create(destfile)
+
+            async with dest_cm as destf:
+                while True:
+                    b = await srcf.read(chunk_size)
+                    if not b:
+                        return
+                    written = await destf.write(b)
+                    assert written == len(b)
+                    progress.bytes += written
+
+    async def _copy_within(self, srcfile: str, size: int, destfile: str) -> None:
         assert not destfile.endswith('/')
 
-        async with self.xfer_sema.acquire_manager(min(Copier.BUFFER_SIZE, size)):
-            async with await self.router_fs.open(srcfile) as srcf:
-                try:
-                    dest_cm = await self.router_fs.create(destfile, retry_writes=False)
-                except FileNotFoundError:
-                    await self.router_fs.makedirs(os.path.dirname(destfile), exist_ok=True)
-                    dest_cm = await self.router_fs.create(destfile)
-
-                async with dest_cm as destf:
-                    while True:
-                        b = await srcf.read(Copier.BUFFER_SIZE)
-                        if not b:
-                            return
-                        written = await destf.write(b)
-                        assert written == len(b)
+        try:
+            await self.router_fs.copy_within(srcfile, destfile, size)
+        except FileNotFoundError:
+            if not await self.router_fs.exists(srcfile):
+                raise
+            await self.router_fs.makedirs(os.path.dirname(destfile), exist_ok=True)
+            await self.router_fs.copy_within(srcfile, destfile, size)
 
     async def _copy_part(self,
                          source_report: SourceReport,
@@ -616,6 +776,7 @@ class SourceCopier:
                                 raise UnexpectedEOFError()
                             written = await destf.write(b)
                             assert written == len(b)
+                            source_report._progress.bytes += written
                             n -= len(b)
         except Exception as e:
             if return_exceptions:
@@ -633,11 +794,22 @@ class SourceCopier:
             return_exceptions: bool):
         size = await srcstat.size()
 
+        # Same-filesystem copies don't need to move the data through
+        # this process.
+        if self.router_fs.supports_copy_within(srcfile, destfile):
+            await self._retry_transient_errors(source_report, self._copy_within, srcfile, size, destfile)
+            source_report._progress.bytes += size
+            return
+
         dest_fs = self.router_fs._get_fs(destfile)
         part_size = dest_fs._copy_part_size()
+        if isinstance(sema, AdaptiveSemaphore):
+            # Split very large files into only as many parts as can
+            # currently run concurrently, up to the largest part size.
+            part_size = max(part_size, min(dest_fs._max_copy_part_size(), -(-size // sema.limit)))
 
         if size <= part_size:
-            await retry_transient_errors(self._copy_file, srcfile, size, destfile)
+            await self._retry_transient_errors(source_report, self._copy_file, source_report._progress, srcfile, size, destfile)
             return
 
         n_parts, rem = divmod(size, part_size)
@@ -653,7 +825,8 @@ class SourceCopier:
         async with part_creator:
             async def f(i):
                 this_part_size = rem if i == n_parts - 1 and rem else part_size
-                await retry_transient_errors(
+                await self._retry_transient_errors(
+                    source_report,
                     self._copy_part,
                     source_report, part_size, srcfile, i, this_part_size, part_creator, return_exceptions)
 
@@ -669,13 +842,20 @@ class SourceCopier:
             srcfile: str,
             srcstat: FileStatus,
             destfile: str,
-            return_exceptions: bool):
+            return_exceptions: bool,
+            deststat: Optional[FileStatus] = None):
+        size = await srcstat.size()
         source_report._files += 1
-        source_report._bytes += await srcstat.size()
+        source_report._bytes += size
         success = False
         try:
-            await self._copy_file_multi_part_main(sema, source_report, srcfile, srcstat, destfile, return_exceptions)
+            if deststat is not None and await _file_unchanged(srcstat, deststat):
+                source_report._skipped += 1
+                source_report._skipped_bytes += size
+            else:
+                await self._copy_file_multi_part_main(sema, source_report, srcfile, srcstat, destfile, return_exceptions)
             source_report._complete += 1
+            source_report._progress.files += 1
             success = True
         except Exception as e:
             if return_exceptions:
@@ -733,7 +913,35 @@ class SourceCopier:
         if full_dest_type == AsyncFS.DIR:
             raise IsADirectoryError(full_dest)
 
-        await self._copy_file_multi_part(sema, source_report, src, srcstat, full_dest, return_exceptions)
+        deststat = None
+        if self.sync:
+            try:
+                deststat = await self.router_fs.statfile(full_dest)
+            except FileNotFoundError:
+                pass
+
+        await self._copy_file_multi_part(sema, source_report, src, srcstat, full_dest, return_exceptions, deststat)
+
+    async def _dest_entries(self, full_dest: str) -> Dict[str, FileListEntry]:
+        '''The files under `full_dest`, keyed by path relative to it.  One
+        recursive listing gives the status of every destination file,
+        rather than a stat per file.'''
+        if not full_dest.endswith('/'):
+            full_dest = full_dest + '/'
+
+        try:
+            destentries = await self.router_fs.listfiles(full_dest, recursive=True)
+        except (NotADirectoryError, FileNotFoundError):
+            return {}
+
+        entries = {}
+        async for destentry in destentries:
+            destfile = destentry.url_maybe_trailing_slash()
+            assert destfile.startswith(full_dest)
+            if destfile.endswith('/') or not await destentry.is_file():
+                continue
+            entries[destfile[len(full_dest):]] = destentry
+        return entries
 
     async def copy_as_dir(self, sema: asyncio.Semaphore, source_report: SourceReport, return_exceptions: bool):
         try:
@@ -761,6 +969,11 @@ class SourceCopier:
         if full_dest_type == AsyncFS.FILE:
             raise NotADirectoryError(full_dest)
 
+        if self.sync:
+            destentries = await self._dest_entries(full_dest)
+        else:
+            destentries = {}
+
         async def copy_source(srcentry):
             srcfile = srcentry.url_maybe_trailing_slash()
             assert srcfile.startswith(src)
@@ -772,7 +985,10 @@ class SourceCopier:
             relsrcfile = srcfile[len(src):]
             assert not relsrcfile.startswith('/')
 
-            await self._copy_file_multi_part(sema, source_report, srcfile, await srcentry.status(), url_join(full_dest, relsrcfile), return_exceptions)
+            destentry = destentries.get(relsrcfile)
+            deststat = await destentry.status() if destentry is not None else None
+
+            await self._copy_file_multi_part(sema, source_report, srcfile, await srcentry.status(), url_join(full_dest, relsrcfile), return_exceptions, deststat)
 
         await bounded_gather2(sema, *[
             functools.partial(copy_source, srcentry)
@@ -804,19 +1020,107 @@ class SourceCopier:
                 raise e
 
 
+class CopyController:
+    '''Adapts the parallelism of a copy to its observed throughput with
+    additive increase, multiplicative decrease (AIMD).
+
+    Every `interval` seconds, the controller samples the copy's
+    progress.  If there were transient errors, it halves the limit of
+    `sema`.  If the last increase made the copy slower in both bytes
+    and files per second, it backs off by a quarter.  Otherwise, if
+    tasks are waiting on `sema`, it increases the limit by `increase`.
+    '''
+
+    DECREASE_ON_ERROR = 0.5
+    DECREASE_ON_SLOWDOWN = 0.75
+    SLOWDOWN_TOLERANCE = 0.9
+
+    def __init__(self,
+                 sema: AdaptiveSemaphore,
+                 progress: CopyProgress,
+                 *,
+                 min_limit: int = 1,
+                 max_limit: int = 1000,
+                 increase: int = 10,
+                 interval: float = 1.0):
+        self._sema = sema
+        self._progress = progress
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._increase = increase
+        self._interval = interval
+        self._last_bytes_per_second = 0.0
+        self._last_files_per_second = 0.0
+        self._increased = False
+        self._task: Optional[asyncio.Task] = None
+
+    def _adjust(self) -> None:
+        bytes_per_second, files_per_second, transient_errors = self._progress.sample()
+        slower = (bytes_per_second < self.SLOWDOWN_TOLERANCE * self._last_bytes_per_second
+                  and files_per_second < self.SLOWDOWN_TOLERANCE * self._last_files_per_second)
+
+        limit = self._sema.limit
+        increased = False
+        if transient_errors > 0:
+            limit = int(limit * self.DECREASE_ON_ERROR)
+        elif self._increased and slower:
+            limit = int(limit * self.DECREASE_ON_SLOWDOWN)
+        elif self._sema.waiting() > 0:
+            limit = limit + self._increase
+            increased = True
+        limit = max(self._min_limit, min(self._max_limit, limit))
+        self._increased = increased and limit > self._sema.limit
+
+        self._sema.set_limit(limit)
+        self._last_bytes_per_second = bytes_per_second
+        self._last_files_per_second = files_per_second
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            self._adjust()
+
+    async def __aenter__(self) -> 'CopyController':
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self,
+                        exc_type: Optional[Type[BaseException]],
+                        exc_val: Optional[BaseException],
+                        exc_tb: Optional[TracebackType]) -> None:
+        assert self._task is not None
+        self._task.cancel()
+        await asyncio.wait([self._task])
+        self._progress.sample()
+
+
 class Copier:
     '''
     This class implements copy for a list of transfers.
+
+    If the semaphore bounding the copy is an `AdaptiveSemaphore`, its
+    limit is adapted to the copy's throughput by a `CopyController`.
     '''
 
     BUFFER_SIZE = 8 * 1024 * 1024
 
-    def __init__(self, router_fs):
+    def __init__(self, router_fs, sync: bool = False, max_parallelism: int = 1000,
+                 xfer_sema: Optional[WeightedSemaphore] = None):
         self.router_fs = router_fs
+        # If sync, files whose destination is unchanged from the
+        # source are not copied.
+        self.sync = sync
+        # the largest limit a CopyController will give an
+        # AdaptiveSemaphore
+        self.max_parallelism = max_parallelism
         # This is essentially a limit on amount of memory in temporary
         # buffers during copying.  We allow ~10 full-sized copies to
-        # run concurrently.
-        self.xfer_sema = WeightedSemaphore(10 * Copier.BUFFER_SIZE)
+        # run concurrently, or ~5 streaming copies which each buffer
+        # the chunk being written and the one being read ahead.
+        # Copiers can share one to bound their memory together.
+        if xfer_sema is None:
+            xfer_sema = WeightedSemaphore(10 * Copier.BUFFER_SIZE)
+        self.xfer_sema = xfer_sema
 
     async def _dest_type(self, transfer: Transfer):
         '''Return the (real or assumed) type of `dest`.
@@ -841,7 +1145,7 @@ class Copier:
         return dest_type
 
     async def copy_source(self, sema: asyncio.Semaphore, transfer: Transfer, source_report: SourceReport, src: str, dest_type_task, return_exceptions: bool):
-        src_copier = SourceCopier(self.router_fs, self.xfer_sema, src, transfer.dest, transfer.treat_dest_as, dest_type_task)
+        src_copier = SourceCopier(self.router_fs, self.xfer_sema, src, transfer.dest, transfer.treat_dest_as, dest_type_task, sync=self.sync)
         await src_copier.copy(sema, source_report, return_exceptions)
 
     async def _copy_one_transfer(self, sema: asyncio.Semaphore, transfer_report: TransferReport, transfer: Transfer, return_exceptions: bool):
@@ -880,6 +1184,13 @@ class Copier:
                 raise e
 
     async def copy(self, sema: asyncio.Semaphore, copy_report: CopyReport, transfer: Union[Transfer, List[Transfer]], return_exceptions: bool):
+        if isinstance(sema, AdaptiveSemaphore):
+            async with CopyController(sema, copy_report._progress, max_limit=self.max_parallelism):
+                await self._copy(sema, copy_report, transfer, return_exceptions)
+        else:
+            await self._copy(sema, copy_report, transfer, return_exceptions)
+
+    async def _copy(self, sema: asyncio.Semaphore, copy_report: CopyReport, transfer: Union[Transfer, List[Transfer]], return_exceptions: bool):
         transfer_report = copy_report._transfer_report
         try:
             if isinstance(transfer, Transfer):
@@ -954,6 +1265,15 @@ class RouterAsyncFS(AsyncFS):
         fs = self._get_fs(url)
         return await fs.multi_part_create(sema, url, num_parts)
 
+    def supports_copy_within(self, src: str, dest: str) -> bool:
+        fs = self._get_fs(src)
+        return fs is self._get_fs(dest) and fs.supports_copy_within(src, dest)
+
+    async def copy_within(self, src: str, dest: str, size: int) -> None:
+        fs = self._get_fs(src)
+        assert fs is self._get_fs(dest)
+        return await fs.copy_within(src, dest, size)
+
     async def statfile(self, url: str) -> FileStatus:
         fs = self._get_fs(url)
         return await fs.statfile(url)
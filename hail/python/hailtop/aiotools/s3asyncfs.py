@@ -57,6 +57,16 @@ class PageIterator:
         raise StopAsyncIteration
 
 
+def _etag_md5(etag: str) -> Optional[bytes]:
+    # The ETag of an object uploaded in a single part is the hex MD5
+    # of its contents.  Multi-part ETags have the form <hex>-<n parts>
+    # and aren't the MD5 of the object.
+    etag = etag.strip('"')
+    if '-' in etag:
+        return None
+    return bytes.fromhex(etag)
+
+
 class S3HeadObjectFileStatus(FileStatus):
     def __init__(self, head_object_resp):
         self.head_object_resp = head_object_resp
@@ -64,6 +74,12 @@ class S3HeadObjectFileStatus(FileStatus):
     async def size(self) -> int:
         return self.head_object_resp['ContentLength']
 
+    async def md5(self) -> Optional[bytes]:
+        return _etag_md5(self.head_object_resp['ETag'])
+
+    async def mtime(self) -> Optional[float]:
+        return self.head_object_resp['LastModified'].timestamp()
+
     async def __getitem__(self, key: str) -> Any:
         return self.head_object_resp[key]
 
@@ -75,6 +91,12 @@ class S3ListFilesFileStatus(FileStatus):
     async def size(self) -> int:
         return self._item['Size']
 
+    async def md5(self) -> Optional[bytes]:
+        return _etag_md5(self._item['ETag'])
+
+    async def mtime(self) -> Optional[float]:
+        return self._item['LastModified'].timestamp()
+
     async def __getitem__(self, key: str) -> Any:
         return self._item[key]
 
@@ -344,6 +366,61 @@ class S3AsyncFS(AsyncFS):
         bucket, name = self._get_bucket_name(url)
         return S3MultiPartCreate(sema, self, bucket, name, num_parts)
 
+    def supports_copy_within(self, src: str, dest: str) -> bool:
+        return True
+
+    async def _copy_within_multi_part(self, src_bucket: str, src_name: str, dest_bucket: str, dest_name: str, size: int) -> None:
+        part_size = S3AsyncFS._copy_within_part_size(size)
+        n_parts = (size + part_size - 1) // part_size
+
+        resp = await blocking_to_async(self._thread_pool, self._s3.create_multipart_upload,
+                                       Bucket=dest_bucket,
+                                       Key=dest_name)
+        upload_id = resp['UploadId']
+
+        async def copy_part(i: int) -> Dict[str, Any]:
+            start = i * part_size
+            end = min(start + part_size, size) - 1
+            resp = await blocking_to_async(self._thread_pool, self._s3.upload_part_copy,
+                                           Bucket=dest_bucket,
+                                           Key=dest_name,
+                                           CopySource={'Bucket': src_bucket, 'Key': src_name},
+                                           CopySourceRange=f'bytes={start}-{end}',
+                                           PartNumber=i + 1,
+                                           UploadId=upload_id)
+            return {'ETag': resp['CopyPartResult']['ETag'], 'PartNumber': i + 1}
+
+        try:
+            parts = await asyncio.gather(*[copy_part(i) for i in range(n_parts)])
+        except:
+            await blocking_to_async(self._thread_pool, self._s3.abort_multipart_upload,
+                                    Bucket=dest_bucket,
+                                    Key=dest_name,
+                                    UploadId=upload_id)
+            raise
+
+        await blocking_to_async(self._thread_pool, self._s3.complete_multipart_upload,
+                                Bucket=dest_bucket,
+                                Key=dest_name,
+                                MultipartUpload={'Parts': parts},
+                                UploadId=upload_id)
+
+    async def copy_within(self, src: str, dest: str, size: int) -> None:
+        src_bucket, src_name = self._get_bucket_name(src)
+        dest_bucket, dest_name = self._get_bucket_name(dest)
+        try:
+            # CopyObject is limited to 5GiB; larger objects are copied
+            # part by part with UploadPartCopy.
+            if size <= 5 * 1024 * 1024 * 1024:
+                await blocking_to_async(self._thread_pool, self._s3.copy_object,
+                                        Bucket=dest_bucket,
+                                        Key=dest_name,
+                                        CopySource={'Bucket': src_bucket, 'Key': src_name})
+            else:
+                await self._copy_within_multi_part(src_bucket, src_name, dest_bucket, dest_name, size)
+        except self._s3.exceptions.NoSuchKey as e:
+            raise FileNotFoundError(src) from e
+
     async def mkdir(self, url: str) -> None:
         pass
 
@@ -459,3 +536,16 @@ class S3AsyncFS(AsyncFS):
         # Because the S3 upload_part API call requires the entire part
         # be loaded into memory, use a smaller part size.
         return 8 * 1024 * 1024
+
+    @staticmethod
+    def _max_copy_part_size():
+        # Parts are loaded into memory, so don't make them bigger.
+        return S3AsyncFS._copy_part_size()
+
+    @staticmethod
+    def _copy_within_part_size(size: int) -> int:
+        # Parts copied with UploadPartCopy are never loaded into
+        # memory, so use large parts.  10000 (the maximum number of
+        # parts) of 512MiB only cover 5000GiB, short of the maximum
+        # object size of 5TiB, so larger objects get larger parts.
+        return max(512 * 1024 * 1024, (size + 9999) // 10000)
@@ -3,11 +3,13 @@ from types import TracebackType
 import abc
 import io
 import os
+import asyncio
 from concurrent.futures import ThreadPoolExecutor
 import janus
 from hailtop.utils import blocking_to_async
 
 from .exceptions import UnexpectedEOFError
+from .weighted_semaphore import WeightedSemaphore
 
 
 class ReadableStream(abc.ABC):
@@ -152,6 +154,140 @@ class _WritableStreamFromBlocking(WritableStream):
         del self._f
 
 
+class ReadAheadReadableStream(ReadableStream):
+    '''Wraps a ReadableStream, reading up to `n_chunks` chunks of
+    `chunk_size` bytes ahead of the caller in a background task, so
+    reading from the stream overlaps with whatever the caller does
+    with the data, typically writing it somewhere else.
+
+    If `sema` is given, `chunk_size` units are held for each chunk
+    read ahead and for the chunk the caller is currently consuming, so
+    at most `n_chunks + 1` chunks are held at a time.  The latter is
+    released on the next read, so the caller must be done with the
+    data returned by a read by the time of the next.
+    '''
+
+    def __init__(self, stream: ReadableStream, chunk_size: int, *, n_chunks: int = 2, sema: Optional[WeightedSemaphore] = None):
+        super().__init__()
+        assert chunk_size > 0 and n_chunks > 0
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._sema = sema
+        # bytes, None at end of stream, or the exception raised by the
+        # underlying stream
+        self._chunks: asyncio.Queue = asyncio.Queue()
+        # chunks being read or read but not yet taken by the caller
+        self._slots = asyncio.Semaphore(n_chunks)
+        self._n_held = 0
+        self._chunk: Optional[bytes] = None
+        self._offset = 0
+        self._eos = False
+        self._pending_read: Optional[asyncio.Future] = None
+        self._task = asyncio.ensure_future(self._read_ahead())
+
+    async def _acquire(self) -> None:
+        if self._sema is not None:
+            await self._sema.acquire(self._chunk_size)
+        self._n_held += 1
+
+    def _release(self) -> None:
+        assert self._n_held > 0
+        self._n_held -= 1
+        if self._sema is not None:
+            self._sema.release(self._chunk_size)
+
+    async def _read_ahead(self) -> None:
+        try:
+            while True:
+                await self._slots.acquire()
+                await self._acquire()
+                # shield the read so closing waits for it to finish
+                # rather than closing the underlying stream under it
+                self._pending_read = asyncio.ensure_future(self._stream.read(self._chunk_size))
+                try:
+                    b = await asyncio.shield(self._pending_read)
+                except Exception:
+                    self._pending_read = None
+                    self._release()
+                    raise
+                self._pending_read = None
+                if not b:
+                    self._release()
+                    await self._chunks.put(None)
+                    return
+                await self._chunks.put(b)
+        except Exception as e:  # pylint: disable=broad-except
+            await self._chunks.put(e)
+
+    async def _fill(self) -> bool:
+        if self._chunk is not None:
+            if self._offset < len(self._chunk):
+                return True
+            self._chunk = None
+            self._release()
+        if self._eos:
+            return False
+
+        item = await self._chunks.get()
+        self._slots.release()
+        if item is None:
+            self._eos = True
+            return False
+        if isinstance(item, Exception):
+            self._eos = True
+            raise item
+        self._chunk = item
+        self._offset = 0
+        return True
+
+    def _take(self, n: int) -> bytes:
+        chunk = self._chunk
+        assert chunk is not None
+        if self._offset == 0 and n >= len(chunk):
+            self._offset = len(chunk)
+            return chunk
+        end = min(self._offset + n, len(chunk))
+        b = chunk[self._offset:end]
+        self._offset = end
+        return b
+
+    async def read(self, n: int = -1) -> bytes:
+        assert not self._closed
+        if n == -1:
+            data = []
+            while await self._fill():
+                data.append(self._take(self._chunk_size))
+            return b''.join(data)
+        if n == 0 or not await self._fill():
+            return b''
+        return self._take(n)
+
+    async def readexactly(self, n: int) -> bytes:
+        assert not self._closed and n >= 0
+        data = []
+        while n > 0:
+            if not await self._fill():
+                raise UnexpectedEOFError()
+            b = self._take(n)
+            data.append(b)
+            n -= len(b)
+        return b''.join(data)
+
+    async def _wait_closed(self) -> None:
+        self._task.cancel()
+        await asyncio.wait([self._task])
+        if self._pending_read is not None:
+            await asyncio.wait([self._pending_read])
+            if not self._pending_read.cancelled():
+                self._pending_read.exception()  # retrieve, don't log
+            self._release()
+            self._pending_read = None
+        while self._n_held > 0:
+            self._release()
+        self._chunk = None
+        await self._stream.wait_closed()
+
+
 def blocking_readable_stream_to_async(thread_pool: ThreadPoolExecutor, f: BinaryIO) -> _ReadableStreamFromBlocking:
     return _ReadableStreamFromBlocking(thread_pool, f)
 
@@ -48,4 +48,13 @@ class WeightedSemaphore:
 
         event = asyncio.Event()
         self.events.add((n, event))
-        await event.wait()
+        try:
+            await event.wait()
+        except asyncio.CancelledError:
+            # Don't leak the units if they were granted after we were
+            # cancelled.
+            if event.is_set():
+                self.release(n)
+            else:
+                self.events.remove((n, event))
+            raise
@@ -1,24 +1,30 @@
-from typing import Optional, Dict, Any, TypeVar, Generic
+from typing import Optional, Dict, Any, TypeVar, Generic, List, Tuple
 import sys
 import abc
+import asyncio
 import os
+import signal
 import subprocess as sp
 import uuid
 import time
 import functools
 import copy
+import urllib.parse
 from shlex import quote as shq
 import webbrowser
 import warnings
 from concurrent.futures import ThreadPoolExecutor
 
 from hailtop.config import get_deploy_config, get_user_config
-from hailtop.utils import is_google_registry_domain, parse_docker_image_reference, async_to_blocking, bounded_gather, tqdm
+from hailtop.utils import (is_google_registry_domain, parse_docker_image_reference, async_to_blocking,
+                           bounded_gather, tqdm, time_msecs)
 from hailtop.batch.hail_genetics_images import HAIL_GENETICS_IMAGES
-from hailtop.batch_client.parse import parse_cpu_in_mcpu
+from hailtop.batch_client.parse import parse_cpu_in_mcpu, parse_memory_in_bytes
 import hailtop.batch_client.client as bc
 from hailtop.batch_client.client import BatchClient
-from hailtop.aiotools import RouterAsyncFS, LocalAsyncFS, AsyncFS
+from hailtop.aiotools import RouterAsyncFS, LocalAsyncFS, AsyncFS, Transfer
+from hailtop.aiotools.fs import Copier, CopyReport
+from hailtop.aiotools.copy import referenced_schemes, filesystem_from_scheme
 from hailtop.aiogoogle import GoogleStorageAsyncFS
 
 from . import resource, batch, job as _job  # pylint: disable=unused-import
@@ -35,6 +41,10 @@ enables the user to monitor the asynchronous execution of a Batch.
 SelfType = TypeVar('SelfType')
 
 
+def _is_url(path: str) -> bool:
+    return urllib.parse.urlparse(path).scheme != ''
+
+
 class Backend(abc.ABC, Generic[RunningBatchType]):
     """
     Abstract class for backends.
@@ -106,14 +116,36 @@ class LocalBackend(Backend[None]):
         Additional flags to pass to `docker run`. Only used if a job specifies
         a docker image. This option will override the value set by the environment
         variable `HAIL_BATCH_EXTRA_DOCKER_RUN_FLAGS`.
+    parallelism:
+        Maximum number of jobs to run at the same time. Defaults to the number
+        of cores on this computer. Independent jobs run concurrently as long as
+        their total `cpu` and `memory` requests fit on this computer.
+    copy_parallelism:
+        Maximum number of files to copy at the same time when localizing inputs
+        and writing outputs.
     """
 
     def __init__(self,
                  tmp_dir: str = '/tmp/',
                  gsa_key_file: Optional[str] = None,
-                 extra_docker_run_flags: Optional[str] = None):
+                 extra_docker_run_flags: Optional[str] = None,
+                 parallelism: Optional[int] = None,
+                 copy_parallelism: int = 50):
         self._tmp_dir = tmp_dir.rstrip('/')
 
+        n_cores = os.cpu_count() or 1
+        if parallelism is None:
+            parallelism = n_cores
+        if parallelism < 1:
+            raise ValueError(f'parallelism must be positive, found {parallelism}')
+        self._parallelism = parallelism
+        self._copy_parallelism = copy_parallelism
+        self._available_mcpu = n_cores * 1000
+        try:
+            self._available_memory: Optional[int] = os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+        except (AttributeError, ValueError, OSError):
+            self._available_memory = None
+
         flags = ''
 
         if extra_docker_run_flags is not None:
@@ -127,7 +159,8 @@ class LocalBackend(Backend[None]):
             flags += f' -v {gsa_key_file}:/gsa-key/key.json'
 
         self._extra_docker_run_flags = flags
-        self.__fs: AsyncFS = LocalAsyncFS(ThreadPoolExecutor())
+        self._thread_pool = ThreadPoolExecutor()
+        self.__fs: AsyncFS = LocalAsyncFS(self._thread_pool)
 
     @property
     def _fs(self):
@@ -170,66 +203,75 @@ class LocalBackend(Backend[None]):
                     f"cd {tmpdir}",
                     '\n']
 
-        def run_code(code):
+        def run_code(code, timeout=None):
             code = '\n'.join(code)
             if dry_run:
                 print(code)
             else:
-                try:
-                    sp.check_call(code, shell=True)
-                except sp.CalledProcessError as e:
-                    print(e)
-                    print(e.output)
-                    raise
+                # in its own process group, so that on a timeout the
+                # commands the shell started are killed along with it
+                with sp.Popen(code, shell=True, start_new_session=True) as proc:
+                    try:
+                        try:
+                            proc.wait(timeout=timeout)
+                        except BaseException:
+                            os.killpg(proc.pid, signal.SIGKILL)
+                            proc.wait()
+                            raise
+                        if proc.returncode != 0:
+                            raise sp.CalledProcessError(proc.returncode, code)
+                    except (sp.CalledProcessError, sp.TimeoutExpired) as e:
+                        print(e)
+                        print(e.output)
+                        raise
 
         copied_input_resource_files = set()
+        localized_input_paths: Dict[str, str] = {}
         os.makedirs(tmpdir + '/inputs/', exist_ok=True)
 
-        if batch.requester_pays_project:
-            requester_pays_project = f'-u {batch.requester_pays_project}'
-        else:
-            requester_pays_project = ''
-
-        def copy_input(job, r):
+        def copy_input(job, r) -> Tuple[List[str], List[Transfer]]:
             if isinstance(r, resource.InputResourceFile):
                 if r not in copied_input_resource_files:
                     copied_input_resource_files.add(r)
 
-                    if r._input_path.startswith('gs://'):
-                        return [f'gsutil {requester_pays_project} cp -r {shq(r._input_path)} {shq(r._get_path(tmpdir))}']
+                    dest = r._get_path(os.path.expanduser(tmpdir))
+                    os.makedirs(os.path.dirname(dest), exist_ok=True)
 
-                    absolute_input_path = os.path.realpath(os.path.expanduser(r._input_path))
+                    if _is_url(r._input_path):
+                        # several resources may be read from the same path,
+                        # which is only copied once
+                        if r._input_path in localized_input_paths:
+                            return [f'ln -sf {shq(localized_input_paths[r._input_path])} {shq(dest)}'], []
+                        localized_input_paths[r._input_path] = dest
+                        return [], [Transfer(r._input_path, dest, treat_dest_as=Transfer.DEST_IS_TARGET)]
 
-                    dest = r._get_path(os.path.expanduser(tmpdir))
-                    dir = os.path.dirname(dest)
-                    os.makedirs(dir, exist_ok=True)
+                    absolute_input_path = os.path.realpath(os.path.expanduser(r._input_path))
 
                     if job._image is not None:  # pylint: disable-msg=W0640
-                        return [f'cp {shq(absolute_input_path)} {shq(dest)}']
+                        return [], [Transfer(absolute_input_path, dest, treat_dest_as=Transfer.DEST_IS_TARGET)]
 
-                    return [f'ln -sf {shq(absolute_input_path)} {shq(dest)}']
+                    return [f'ln -sf {shq(absolute_input_path)} {shq(dest)}'], []
 
-                return []
+                return [], []
 
             assert isinstance(r, (resource.JobResourceFile, resource.PythonResult))
-            return []
+            return [], []
 
-        def copy_external_output(r):
-            def _cp(dest):
-                if not dest.startswith('gs://'):
+        def copy_external_output(r) -> List[Transfer]:
+            def _dest(dest):
+                if not _is_url(dest):
                     dest = os.path.expanduser(dest)
                     dest = os.path.abspath(dest)
-                    directory = os.path.dirname(dest)
-                    os.makedirs(directory, exist_ok=True)
-                    return 'cp'
-                return f'gsutil {requester_pays_project} cp -r'
+                return dest
 
             if isinstance(r, resource.InputResourceFile):
-                return [f'{_cp(dest)} {shq(r._input_path)} {shq(dest)}'
-                        for dest in r._output_paths]
-
-            assert isinstance(r, (resource.JobResourceFile, resource.PythonResult))
-            return [f'{_cp(dest)} {r._get_path(tmpdir)} {shq(dest)}'
+                src = r._input_path
+                if not _is_url(src):
+                    src = os.path.abspath(os.path.expanduser(src))
+            else:
+                assert isinstance(r, (resource.JobResourceFile, resource.PythonResult))
+                src = r._get_path(tmpdir)
+            return [Transfer(src, _dest(dest), treat_dest_as=Transfer.DEST_IS_TARGET)
                     for dest in r._output_paths]
 
         def symlink_input_resource_group(r):
@@ -241,20 +283,35 @@ class LocalBackend(Backend[None]):
                     symlinks.append(f'ln -sf {shq(src)} {shq(dest)}')
             return symlinks
 
-        try:
-            write_inputs = [x for r in batch._input_resources for x in copy_external_output(r)]
-            if write_inputs:
-                code = new_code_block()
-                code += ["# Write input resources to output destinations"]
-                code += write_inputs
-                code += ['\n']
-                run_code(code)
+        async def execute():
+            write_inputs = [t for r in batch._input_resources for t in copy_external_output(r)]
 
+            steps: Dict[_job.Job, List[Tuple[str, Any]]] = {}
+            localize_code = []
+            localize_transfers = []
+            call_cache_transfers: Dict[_job.Job, List[Transfer]] = {}
             for job in batch._jobs:
-                async_to_blocking(job._compile(tmpdir, tmpdir))
-
                 os.makedirs(f'{tmpdir}/{job._dirname}/', exist_ok=True)
 
+                output_transfers = [t for r in job._external_outputs for t in copy_external_output(r)]
+
+                if job._cached_outputs is not None:
+                    # put the cached outputs where the job would have
+                    # written them, for the jobs that read them
+                    restore_transfers = [Transfer(url, r._get_path(tmpdir), treat_dest_as=Transfer.DEST_IS_TARGET)
+                                         for r, url in job._cached_outputs.items()]
+                    steps[job] = [('restore', restore_transfers), ('output', output_transfers)]
+                    continue
+
+                await job._compile(tmpdir, tmpdir)
+
+                # inputs are shared between jobs, so they are localized up front
+                # rather than by whichever job happens to run first
+                for r in job._inputs:
+                    code, transfers = copy_input(job, r)
+                    localize_code += code
+                    localize_transfers += transfers
+
                 code = new_code_block()
 
                 code.append(f"# {job._job_id}: {job.name if job.name else ''}")
@@ -264,8 +321,8 @@ class LocalBackend(Backend[None]):
                     user_code = [f'# {line}' for cmd in job._user_code for line in cmd.split('\n')]
                     code.append('\n'.join(user_code))
 
-                code += [x for r in job._inputs for x in copy_input(job, r)]
-                code += [x for r in job._mentioned for x in symlink_input_resource_group(r)]
+                input_code = new_code_block()
+                input_code += [x for r in job._mentioned for x in symlink_input_resource_group(r)]
 
                 env = {**job._env, 'BATCH_TMPDIR': tmpdir}
                 env_declarations = [f'export {k}={v}' for k, v in env.items()]
@@ -307,17 +364,200 @@ class LocalBackend(Backend[None]):
                                 f"{job_shell} -c {quoted_job_script}")
                 else:
                     code.append(f"{job_shell} -c {quoted_job_script}")
-
-                code += [x for r in job._external_outputs for x in copy_external_output(r)]
                 code += ['\n']
 
-                run_code(code)
+                steps[job] = [('input', input_code), ('main', code), ('output', output_transfers)]
+
+                if batch._call_cache is not None and job._call_cache_key is not None and not dry_run:
+                    call_cache_transfers[job] = [
+                        Transfer(r._get_path(tmpdir), batch._call_cache.output_url(job, r),
+                                 treat_dest_as=Transfer.DEST_IS_TARGET)
+                        for r in batch._call_cache.outputs(job)]
+
+            all_transfers = write_inputs + localize_transfers + [
+                t for job_steps in steps.values() for name, step in job_steps if name in ('restore', 'output')
+                for t in step] + [t for transfers in call_cache_transfers.values() for t in transfers]
+            schemes = referenced_schemes(all_transfers) | {'file'}
+            gcs_params = {'userProject': batch.requester_pays_project} if batch.requester_pays_project else None
+            filesystems = [filesystem_from_scheme(scheme, thread_pool=self._thread_pool, gcs_params=gcs_params)
+                           for scheme in schemes]
+            async with RouterAsyncFS('file', filesystems) as fs:
+                # one copier, and so one bound on transfer buffers, is
+                # shared by every job of the batch
+                copier = Copier(fs)
+                sema = asyncio.Semaphore(self._copy_parallelism)
+
+                async def copy_files(transfers: List[Transfer]):
+                    if not transfers:
+                        return
+                    if dry_run:
+                        print('\n'.join(f'# copy {t.src} {t.dest}' for t in transfers))
+                        return
+                    async with sema:
+                        await copier.copy(sema, CopyReport(transfers), transfers, return_exceptions=False)
+
+                async def save_to_call_cache(job, transfers):
+                    assert batch._call_cache is not None
+                    await copy_files(transfers)
+                    # written last, so only complete entries are used
+                    await fs.makedirs(os.path.dirname(batch._call_cache.manifest_url(job)), exist_ok=True)
+                    await fs.write(batch._call_cache.manifest_url(job), batch._call_cache.manifest(job))
+
+                for job, transfers in call_cache_transfers.items():
+                    steps[job].append(('call_cache', functools.partial(save_to_call_cache, job, transfers)))
+
+                await copy_files(write_inputs)
+
+                await copy_files(localize_transfers)
+                if localize_code:
+                    code = new_code_block()
+                    code += ["# Localize input resources"]
+                    code += localize_code
+                    code += ['\n']
+                    run_code(code)
+
+                if dry_run:
+                    for job in batch._jobs:
+                        for name, step in steps[job]:
+                            if name in ('input', 'main'):
+                                run_code(step)
+                            else:
+                                await copy_files(step)
+                else:
+                    await self._run_jobs(batch._jobs, steps, run_code, copy_files)
+
+        try:
+            async_to_blocking(execute())
         finally:
             if delete_scratch_on_exit:
                 sp.run(f'rm -rf {tmpdir}', shell=True, check=False)
 
         print('Batch completed successfully!')
 
+    def _job_resources(self, job: '_job.Job') -> Tuple[int, int]:
+        mcpu = parse_cpu_in_mcpu(job._cpu) if job._cpu else None
+        if mcpu is None:
+            mcpu = 1000
+
+        memory = None
+        if job._memory is not None:
+            memory_ratios = {'lowmem': 1024**3, 'standard': 4 * 1024**3, 'highmem': 7 * 1024**3}
+            if job._memory in memory_ratios:
+                memory = int(memory_ratios[job._memory] * (mcpu / 1000))
+            else:
+                memory = parse_memory_in_bytes(job._memory)
+
+        # a job that asks for more than this computer has still runs, alone
+        mcpu = min(mcpu, self._available_mcpu)
+        if memory is None or self._available_memory is None:
+            memory = 0
+        else:
+            memory = min(memory, self._available_memory)
+        return (mcpu, memory)
+
+    async def _run_jobs(self, jobs, steps, run_code, copy_files):
+        """Run `jobs` as a dependency graph on a bounded pool of workers.
+
+        A job starts once all of its parents are complete and its `cpu` and
+        `memory` requests fit in what is not used by running jobs. A job
+        whose parent failed or was cancelled is cancelled unless it is marked
+        `always_run`. Once every job is complete, the error of the first
+        failed job, if any, is raised.
+        """
+        loop = asyncio.get_event_loop()
+
+        async def run_job(job):
+            timing: Dict[str, Dict[str, int]] = {}
+            start_time = time_msecs()
+            try:
+                for name, step in steps[job]:
+                    step_timing = timing[name] = {'start_time': time_msecs()}
+                    try:
+                        if name in ('input', 'main'):
+                            timeout = job._timeout if name == 'main' else None
+                            await loop.run_in_executor(pool, functools.partial(run_code, step, timeout=timeout))
+                        elif name == 'call_cache':
+                            await step()
+                        else:
+                            await copy_files(step)
+                    finally:
+                        finish_time = time_msecs()
+                        step_timing['finish_time'] = finish_time
+                        step_timing['duration'] = finish_time - step_timing['start_time']
+                error = None
+            except Exception as e:  # pylint: disable=broad-except
+                error = e
+            finish_time = time_msecs()
+            status = {
+                'state': 'Success' if error is None else 'Failed',
+                'start_time': start_time,
+                'end_time': finish_time,
+                'duration': finish_time - start_time,
+                'timing': timing
+            }
+            return status, error
+
+        def report(job, status):
+            duration = ''
+            if 'duration' in status:
+                timing = ', '.join(f'{name} {t["duration"] / 1000:.3f}s' for name, t in status['timing'].items())
+                duration = f' in {status["duration"] / 1000:.3f}s ({timing})'
+            print(f"Job {job._job_id}{' ' + job.name if job.name else ''}: {status['state']}{duration}")
+
+        resources = {job: self._job_resources(job) for job in jobs}
+        states: Dict[_job.Job, str] = {}
+        errors: Dict[_job.Job, Exception] = {}
+        pending = list(jobs)
+        running: Dict[asyncio.Task, _job.Job] = {}
+        used_mcpu = 0
+        used_memory = 0
+
+        with ThreadPoolExecutor(max_workers=self._parallelism) as pool:
+            while pending or running:
+                still_pending = []
+                for job in pending:
+                    parent_states = [states.get(parent) for parent in job._dependencies]
+                    if any(state is None for state in parent_states):
+                        still_pending.append(job)
+                        continue
+                    if not job._always_run and any(state != 'Success' for state in parent_states):
+                        states[job] = 'Cancelled'
+                        report(job, {'state': 'Cancelled'})
+                        continue
+                    mcpu, memory = resources[job]
+                    if running and (len(running) >= self._parallelism
+                                    or used_mcpu + mcpu > self._available_mcpu
+                                    or (self._available_memory is not None
+                                        and used_memory + memory > self._available_memory)):
+                        still_pending.append(job)
+                        continue
+                    used_mcpu += mcpu
+                    used_memory += memory
+                    running[asyncio.create_task(run_job(job))] = job
+                pending = still_pending
+
+                if not running:
+                    if pending:
+                        raise BatchException('jobs depend on jobs which are not in the batch: '
+                                             + ', '.join(str(job._job_id) for job in pending))
+                    break
+
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for fut in done:
+                    job = running.pop(fut)
+                    mcpu, memory = resources[job]
+                    used_mcpu -= mcpu
+                    used_memory -= memory
+                    status, error = fut.result()
+                    states[job] = status['state']
+                    if error is not None:
+                        errors[job] = error
+                    report(job, status)
+
+        for job in jobs:
+            if job in errors:
+                raise errors[job]
+
     def _get_scratch_dir(self):
         def _get_random_name():
             dir = f'{self._tmp_dir}/batch/{uuid.uuid4().hex[:6]}'
@@ -329,7 +569,9 @@ class LocalBackend(Backend[None]):
         return _get_random_name()
 
     def _close(self):
-        async_to_blocking(self._fs.close())
+        # LocalAsyncFS.close is a no-op, and this may run from __del__ in the
+        # middle of a batch run, so avoid re-entering the event loop
+        self._thread_pool.shutdown(wait=False)
 
 
 class ServiceBackend(Backend[bc.Batch]):
@@ -524,10 +766,16 @@ class ServiceBackend(Backend[bc.Batch]):
         activate_service_account = 'gcloud -q auth activate-service-account ' \
                                    '--key-file=/gsa-key/key.json'
 
+        if batch._call_cache is not None and not _is_url(batch._call_cache.location):
+            raise BatchException(f'the call cache must be at a URL with the ServiceBackend, '
+                                 f'found {batch._call_cache.location}')
+
         def copy_input(r):
             if isinstance(r, resource.InputResourceFile):
                 return [(r._input_path, r._get_path(local_tmpdir))]
             assert isinstance(r, (resource.JobResourceFile, resource.PythonResult))
+            if r._source._cached_outputs is not None:
+                return [(r._source._cached_outputs[r], r._get_path(local_tmpdir))]
             return [(r._get_path(batch_remote_tmpdir), r._get_path(local_tmpdir))]
 
         def copy_internal_output(r):
@@ -550,6 +798,15 @@ class ServiceBackend(Backend[bc.Batch]):
             return symlinks
 
         write_external_inputs = [x for r in batch._input_resources for x in copy_external_output(r)]
+        # jobs whose outputs are in the call cache don't run, so their
+        # outputs are copied from the cache along with the inputs
+        cached_jobs = []
+        for job in batch._jobs:
+            if job._cached_outputs is not None:
+                cached_jobs.append(job)
+                write_external_inputs += [(job._cached_outputs[r], dest)
+                                          for r in job._external_outputs
+                                          for dest in r._output_paths]
         if write_external_inputs:
             def _cp(src, dst):
                 return f'gsutil -m cp -R {shq(src)} {shq(dst)}'
@@ -578,15 +835,22 @@ class ServiceBackend(Backend[bc.Batch]):
                         f"You must specify 'image' for Python jobs if you are using a Python version other than 3.6, 3.7, or 3.8 (you are using {version})")
                 job._image = f'hailgenetics/python-dill:{version.major}.{version.minor}-slim'
 
-        with tqdm(total=len(batch._jobs), desc='upload code', disable=disable_progress_bar) as pbar:
+        jobs_to_run = [j for j in batch._jobs if j._cached_outputs is None]
+
+        with tqdm(total=len(jobs_to_run), desc='upload code', disable=disable_progress_bar) as pbar:
             async def compile_job(job):
                 used_remote_tmpdir = await job._compile(local_tmpdir, batch_remote_tmpdir, dry_run=dry_run)
                 pbar.update(1)
                 return used_remote_tmpdir
-            used_remote_tmpdir_results = await bounded_gather(*[functools.partial(compile_job, j) for j in batch._jobs], parallelism=150)
+            used_remote_tmpdir_results = await bounded_gather(*[functools.partial(compile_job, j) for j in jobs_to_run], parallelism=150)
             used_remote_tmpdir |= any(used_remote_tmpdir_results)
 
-        for job in tqdm(batch._jobs, desc='create job objects', disable=disable_progress_bar):
+        if dry_run:
+            for job in cached_jobs:
+                commands.append(f'# Job {job._job_id}{f": {job.name}" if job.name else ""}: '
+                                f'outputs are in the call cache')
+
+        for job in tqdm(jobs_to_run, desc='create job objects', disable=disable_progress_bar):
             inputs = [x for r in job._inputs for x in copy_input(r)]
 
             outputs = [x for r in job._internal_outputs for x in copy_internal_output(r)]
@@ -594,6 +858,14 @@ class ServiceBackend(Backend[bc.Batch]):
                 used_remote_tmpdir = True
             outputs += [x for r in job._external_outputs for x in copy_external_output(r)]
 
+            save_to_call_cache = None
+            if batch._call_cache is not None and job._call_cache_key is not None:
+                outputs += [(r._get_path(local_tmpdir), batch._call_cache.output_url(job, r))
+                            for r in batch._call_cache.outputs(job)]
+                manifest_path = f'{local_tmpdir}/{job._dirname}/call-cache-manifest.json'
+                save_to_call_cache = f'printf %s {shq(batch._call_cache.manifest(job).decode())} > {shq(manifest_path)}'
+                outputs.append((manifest_path, batch._call_cache.manifest_url(job)))
+
             symlinks = [x for r in job._mentioned for x in symlink_input_resource_group(r)]
 
             if job._image is None:
@@ -603,6 +875,10 @@ class ServiceBackend(Backend[bc.Batch]):
             make_local_tmpdir = f'mkdir -p {local_tmpdir}/{job._dirname}'
 
             job_command = [cmd.strip() for cmd in job._wrapper_code]
+            if save_to_call_cache is not None:
+                # set -e doesn't stop at a failure within an && list, so
+                # the manifest is chained on to be written only on success
+                job_command.append(save_to_call_cache)
             prepared_job_command = (f'{{\n{x}\n}}' for x in job_command)
             cmd = f'''
 {bash_flags}
@@ -632,7 +908,7 @@ class ServiceBackend(Backend[bc.Batch]):
                 commands.append(formatted_command)
                 continue
 
-            parents = [job_to_client_job_mapping[j] for j in job._dependencies]
+            parents = [job_to_client_job_mapping[j] for j in job._dependencies if j._cached_outputs is None]
 
             attributes = copy.deepcopy(job.attributes) if job.attributes else dict()
             if job.name:
@@ -1,6 +1,7 @@
 import os
 import warnings
 import re
+import urllib.parse
 from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, Union, List, Any, Set
 
@@ -8,7 +9,7 @@ from hailtop.utils import secret_alnum_string
 from hailtop.aiotools import AsyncFS, RouterAsyncFS, LocalAsyncFS
 from hailtop.aiogoogle import GoogleStorageAsyncFS
 
-from . import backend as _backend, job, resource as _resource  # pylint: disable=cyclic-import
+from . import backend as _backend, call_cache as _call_cache, job, resource as _resource  # pylint: disable=cyclic-import
 from .exceptions import BatchException
 
 
@@ -87,6 +88,14 @@ class Batch:
         Automatically cancel the batch after N failures have occurred. The default
         behavior is there is no limit on the number of failures. Only
         applicable for the :class:`.ServiceBackend`. Must be greater than 0.
+    call_cache:
+        If not `None`, a directory, or a URL with the :class:`.ServiceBackend`,
+        in which to cache the outputs of jobs. A job is skipped if a previous
+        run of a job with the same command, image, environment, resource
+        requests and input contents stored its outputs there, and the jobs
+        that depend on it read the cached outputs instead. Only use this for
+        jobs whose outputs depend on nothing else, and that have no side
+        effects other than their outputs.
 
     """
 
@@ -113,7 +122,8 @@ class Batch:
                  default_shell: Optional[str] = None,
                  default_python_image: Optional[str] = None,
                  project: Optional[str] = None,
-                 cancel_after_n_failures: Optional[int] = None):
+                 cancel_after_n_failures: Optional[int] = None,
+                 call_cache: Optional[str] = None):
         self._jobs: List[job.Job] = []
         self._resource_map: Dict[str, _resource.Resource] = {}
         self._allocated_files: Set[str] = set()
@@ -150,6 +160,8 @@ class Batch:
 
         self._cancel_after_n_failures = cancel_after_n_failures
 
+        self._call_cache = _call_cache.CallCache(call_cache) if call_cache is not None else None
+
     def _unique_job_token(self, n=5):
         token = secret_alnum_string(n)
         while token in self._job_tokens:
@@ -489,7 +501,7 @@ class Batch:
                                  f"using the PythonJob 'call' method")
 
         if isinstance(self._backend, _backend.LocalBackend):
-            if not dest.startswith('gs://'):
+            if not urllib.parse.urlparse(dest).scheme:
                 dest = os.path.abspath(os.path.expanduser(dest))
 
         resource._add_output_path(dest)
@@ -572,6 +584,8 @@ class Batch:
                     raise BatchException("cycle detected in dependency graph")
 
         self._jobs = ordered_jobs
+        if self._call_cache is not None:
+            self._call_cache.resolve(self)
         run_result = self._backend._run(self, dry_run, verbose, delete_scratch_on_exit, **backend_kwargs)  # pylint: disable=assignment-from-no-return
         if self._DEPRECATED_fs is not None:
             # best effort only because this is deprecated
@@ -1,4 +1,5 @@
-from typing import Optional, Callable, Type, Union, List, Any, Iterable
+from typing import (Optional, Callable, Type, Union, List, Any, Iterable, Dict, Tuple, Set,
+                    NamedTuple)
 from types import TracebackType
 from io import BytesIO
 import asyncio
@@ -7,13 +8,14 @@ import dill
 import functools
 import sys
 
-from hailtop.utils import secret_alnum_string, partition
+from hailtop.utils import secret_alnum_string, partition, bounded_gather, sleep_and_backoff
 import hailtop.batch_client.aioclient as low_level_batch_client
+from hailtop.batch_client.globals import complete_states
 from hailtop.batch_client.parse import parse_cpu_in_mcpu
 import hailtop.aiogoogle as aiogoogle
 
-from .batch import Batch
 from .backend import ServiceBackend
+from .globals import DEFAULT_SHELL
 
 
 if sys.version_info < (3, 7):
@@ -87,8 +89,8 @@ class BatchPoolExecutor:
     Parameters
     ----------
     name:
-        A name for the executor. Executors produce many batches and each batch
-        will include this name as a prefix.
+        A name for the executor. The executor's jobs are all submitted to one
+        batch with this name.
     backend:
         Backend used to execute the jobs. Must be a :class:`.ServiceBackend`.
     image:
@@ -116,6 +118,11 @@ class BatchPoolExecutor:
         this computer and the cloud machines that execute jobs.
     """
 
+    # pending calls are sent to the batch once there are this many of them,
+    # or FLUSH_INTERVAL seconds after the first of them was submitted
+    MAX_PENDING_CALLS = low_level_batch_client.BatchBuilder.MAX_BUNCH_SIZE
+    FLUSH_INTERVAL = 1.0
+
     def __init__(self, *,
                  name: Optional[str] = None,
                  backend: Optional[ServiceBackend] = None,
@@ -128,7 +135,12 @@ class BatchPoolExecutor:
         self.backend = backend or ServiceBackend()
         if not isinstance(self.backend, ServiceBackend):
             raise ValueError(f'BatchPoolExecutor is not compatible with {type(backend)}')
-        self.batches: List[Batch] = []
+        self._batch_builder: Optional[low_level_batch_client.BatchBuilder] = None
+        self._batch: Optional[low_level_batch_client.Batch] = None
+        self._watcher: Optional[BatchPoolJobWatcher] = None
+        self._pending_calls: List[_PendingCall] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Future] = None
         self.directory = self.backend.remote_tmpdir + f'batch-pool-executor/{self.name}/'
         self.inputs = self.directory + 'inputs/'
         self.outputs = self.directory + 'outputs/'
@@ -162,6 +174,8 @@ class BatchPoolExecutor:
         same order as the `iterables`, only blocking if the result is not yet
         ready. You can convert the generator to a list with :class:`.list`.
 
+        All the calls are sent to the executor's batch together.
+
         Examples
         --------
 
@@ -244,17 +258,9 @@ class BatchPoolExecutor:
             fn = chunk(fn)
             iterables = iterables_chunks
 
-        submit_tasks = [asyncio.ensure_future(self.async_submit(fn, *arguments))
-                        for arguments in zip(*iterables)]
-        try:
-            bp_futures = [await t for t in submit_tasks]
-        except:
-            for t in submit_tasks:
-                if t.done() and not t.exception():
-                    await t.result().async_cancel()
-                elif not t.done():
-                    t.cancel()
-            raise
+        bp_futures = await self._async_submit_many(fn,
+                                                   [(args, {}) for args in zip(*iterables)],
+                                                   flush=True)
 
         async def async_result_or_cancel_all(future):
             try:
@@ -288,6 +294,11 @@ class BatchPoolExecutor:
         :class:`.BatchPoolFuture` whose :meth:`.BatchPoolFuture.result` method
         can be used to access the value.
 
+        Calls are not sent to the cloud one at a time. Calls submitted in
+        quick succession are sent to the executor's batch together, after a
+        short delay or once enough of them are pending, or sooner if a result
+        is requested.
+
         Examples
         --------
 
@@ -337,64 +348,130 @@ class BatchPoolExecutor:
                            **kwargs: Any
                            ) -> 'BatchPoolFuture':
         """Aysncio compatible version of :meth:`BatchPoolExecutor.submit`."""
+        futures = await self._async_submit_many(unapplied, [(args, kwargs)])
+        return futures[0]
+
+    async def _async_submit_many(self,
+                                 unapplied: Callable,
+                                 arguments: List[Tuple[Tuple[Any, ...], Dict[str, Any]]],
+                                 flush: bool = False
+                                 ) -> List['BatchPoolFuture']:
         if self._shutdown:
             raise RuntimeError('BatchPoolExecutor has already been shutdown.')
+        if not arguments:
+            return []
 
         try:
             name = unapplied.__name__
         except AttributeError:
             name = '<anonymous>'
         name = f'{name}-{secret_alnum_string(4)}'
-        batch = Batch(name=self.name + '-' + name,
-                      backend=self.backend,
-                      default_image=self.image)
-        self.batches.append(batch)
-        j = batch.new_job(name)
-
-        pipe = BytesIO()
-        dill.dump(functools.partial(unapplied, *args, **kwargs), pipe, recurse=True)
-        pipe.seek(0)
+
+        # the function is written once and shared by all the calls
         pickledfun_remote = self.inputs + f'{name}/pickledfun'
-        await self.fs.write(pickledfun_remote, pipe.getvalue())
-        pickledfun_local = batch.read_input(pickledfun_remote)
-
-        thread_limit = "1"
-        if self.cpus_per_job:
-            j.cpu(self.cpus_per_job)
-            thread_limit = str(int(max(1.0, cpu_spec_to_float(self.cpus_per_job))))
-        j.env("OMP_NUM_THREADS", thread_limit)
-        j.env("OPENBLAS_NUM_THREADS", thread_limit)
-        j.env("MKL_NUM_THREADS", thread_limit)
-        j.env("VECLIB_MAXIMUM_THREADS", thread_limit)
-        j.env("NUMEXPR_NUM_THREADS", thread_limit)
-
-        j.command('set -ex')
-        j.command(f'''python3 -c "
-import base64
-import dill
-import traceback
-with open(\\"{j.ofile}\\", \\"wb\\") as out:
-    try:
-        with open(\\"{pickledfun_local}\\", \\"rb\\") as f:
-            dill.dump((dill.load(f)(), None), out, recurse=True)
-    except Exception as e:
-        print(\\"BatchPoolExecutor encountered an exception:\\")
-        traceback.print_exc()
-        dill.dump((e, traceback.format_exception(type(e), e, e.__traceback__)), out, recurse=True)
-"''')
-        output_gcs = self.outputs + f'{name}/output'
-        batch.write_output(j.ofile, output_gcs)
-        backend_batch = batch.run(wait=False,
-                                  disable_progress_bar=True)._async_batch
+        await self.fs.write(pickledfun_remote, _dill_dumps(unapplied))
+
+        async def write_args(i, args, kwargs):
+            pickledargs_remote = self.inputs + f'{name}/{i}/pickledargs'
+            await self.fs.write(pickledargs_remote, _dill_dumps((args, kwargs)))
+            return pickledargs_remote
+
+        pickledargs_remotes = await bounded_gather(
+            *[functools.partial(write_args, i, args, kwargs)
+              for i, (args, kwargs) in enumerate(arguments)],
+            parallelism=150)
+
+        futures = []
+        for i, pickledargs_remote in enumerate(pickledargs_remotes):
+            job_future = asyncio.get_event_loop().create_future()
+            output_gcs = self.outputs + f'{name}/{i}/output'
+            self._pending_calls.append(_PendingCall(
+                name if len(arguments) == 1 else f'{name}-{i}',
+                pickledfun_remote,
+                pickledargs_remote,
+                output_gcs,
+                job_future))
+            futures.append(BatchPoolFuture(self, job_future, output_gcs))
+
+        if flush or len(self._pending_calls) >= BatchPoolExecutor.MAX_PENDING_CALLS:
+            await self._async_flush()
+        elif self._flush_task is None:
+            self._flush_task = create_task(self._flush_after_interval())
+        return futures
+
+    async def _flush_after_interval(self):
+        await asyncio.sleep(BatchPoolExecutor.FLUSH_INTERVAL)
+        self._flush_task = None
         try:
-            return BatchPoolFuture(self,
-                                   backend_batch,
-                                   low_level_batch_client.Job.submitted_job(
-                                       backend_batch, 1),
-                                   output_gcs)
-        except:
-            await backend_batch.cancel()
-            raise
+            await self._async_flush()
+        except Exception:
+            # the futures of the calls that were being flushed hold the error
+            pass
+
+    async def _async_flush(self):
+        """Sends the pending calls to the executor's batch as jobs, opening the
+        batch if this is the first flush."""
+        async with self._flush_lock:
+            calls = [call for call in self._pending_calls if not call.job_future.cancelled()]
+            self._pending_calls = []
+            if not calls:
+                return
+
+            try:
+                if self._batch_builder is None:
+                    batch_builder = self.backend._batch_client._async_client.create_batch(
+                        attributes={'name': self.name})
+                    self._batch = await batch_builder.open()
+                    self._batch_builder = batch_builder
+                    self._watcher = BatchPoolJobWatcher(self._batch)
+
+                thread_limit = "1"
+                resources = None
+                if self.cpus_per_job:
+                    thread_limit = str(int(max(1.0, cpu_spec_to_float(self.cpus_per_job))))
+                    resources = {'cpu': str(self.cpus_per_job)}
+                env = {'OMP_NUM_THREADS': thread_limit,
+                       'OPENBLAS_NUM_THREADS': thread_limit,
+                       'MKL_NUM_THREADS': thread_limit,
+                       'VECLIB_MAXIMUM_THREADS': thread_limit,
+                       'NUMEXPR_NUM_THREADS': thread_limit}
+
+                jobs = [self._batch_builder.create_job(
+                    image=self.image,
+                    command=[DEFAULT_SHELL, '-c', _CALL_COMMAND],
+                    env=env,
+                    resources=resources,
+                    attributes={'name': call.name},
+                    input_files=[(call.pickledfun_remote, _PICKLEDFUN_LOCAL),
+                                 (call.pickledargs_remote, _PICKLEDARGS_LOCAL)],
+                    output_files=[(_OUTPUT_LOCAL, call.output_gcs)],
+                    mount_tokens=True) for call in calls]
+                await self._batch_builder.flush(disable_progress_bar=True)
+            except Exception as e:
+                for call in calls:
+                    if not call.job_future.done():
+                        call.job_future.set_exception(e)
+                raise
+
+            cancelled_jobs = []
+            for call, job in zip(calls, jobs):
+                if call.job_future.cancelled():
+                    # cancelled while it was being flushed
+                    cancelled_jobs.append(job)
+                elif not call.job_future.done():
+                    call.job_future.set_result(job)
+            await asyncio.gather(*[job.cancel() for job in cancelled_jobs])
+
+    async def _async_close_batch(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        try:
+            await self._async_flush()
+        finally:
+            async with self._flush_lock:
+                if self._batch_builder is not None:
+                    await self._batch_builder.submit(disable_progress_bar=True)
 
     def __exit__(self,
                  exc_type: Optional[Type[BaseException]],
@@ -413,9 +490,11 @@ with open(\\"{j.ofile}\\", \\"wb\\") as out:
     def shutdown(self, wait: bool = True):
         """Allow temporary resources to be cleaned up.
 
-        Until shutdown is called, some temporary cloud storage files will
-        persist. After shutdown has been called *and* all outstanding jobs have
-        completed, these files will be deleted.
+        Shutdown sends any pending calls to the executor's batch and closes
+        the batch; no more calls may be submitted. Until shutdown is called,
+        some temporary cloud storage files will persist. After shutdown has
+        been called *and* all outstanding jobs have completed, these files
+        will be deleted.
 
         Parameters
         ----------
@@ -423,6 +502,8 @@ with open(\\"{j.ofile}\\", \\"wb\\") as out:
             If true, wait for all jobs to complete before returning from this
             method.
         """
+        if not self._shutdown:
+            async_to_blocking(self._async_close_batch())
         if wait:
             async def ignore_exceptions(f):
                 try:
@@ -436,21 +517,150 @@ with open(\\"{j.ofile}\\", \\"wb\\") as out:
         self._shutdown = True
 
     def _cleanup(self):
+        if self._batch is not None:
+            # every future has finished, so any job still running is orphaned
+            async_to_blocking(self._batch.cancel())
         if self.cleanup_bucket:
             async_to_blocking(self.fs.rmtree(None, self.directory))
         async_to_blocking(self.fs.close())
         self.backend.close()
 
 
+_PICKLEDFUN_LOCAL = '/io/pickledfun'
+_PICKLEDARGS_LOCAL = '/io/pickledargs'
+_OUTPUT_LOCAL = '/io/output'
+
+_CALL_COMMAND = f'''set -ex
+python3 -c "
+import base64
+import dill
+import traceback
+with open(\\"{_OUTPUT_LOCAL}\\", \\"wb\\") as out:
+    try:
+        with open(\\"{_PICKLEDFUN_LOCAL}\\", \\"rb\\") as f:
+            fun = dill.load(f)
+        with open(\\"{_PICKLEDARGS_LOCAL}\\", \\"rb\\") as f:
+            args, kwargs = dill.load(f)
+        dill.dump((fun(*args, **kwargs), None), out, recurse=True)
+    except Exception as e:
+        print(\\"BatchPoolExecutor encountered an exception:\\")
+        traceback.print_exc()
+        dill.dump((e, traceback.format_exception(type(e), e, e.__traceback__)), out, recurse=True)
+"'''
+
+
+class _PendingCall(NamedTuple):
+    name: str
+    pickledfun_remote: str
+    pickledargs_remote: str
+    output_gcs: str
+    job_future: asyncio.Future
+
+
+def _dill_dumps(obj) -> bytes:
+    pipe = BytesIO()
+    dill.dump(obj, pipe, recurse=True)
+    return pipe.getvalue()
+
+
+class BatchPoolJobWatcher:
+    """Resolves the completion of the jobs of an executor's batch from a
+    single stream of batch statuses, rather than each future polling its job.
+
+    Done jobs are listed in order of job id, resuming after the highest id
+    listed so far.  Jobs that were still running when they were listed past
+    are found once the batch has more completed jobs than were listed.
+    """
+
+    # beyond this many, jobs that were listed past are found by listing
+    # again rather than by getting each job's status
+    MAX_STATUS_REQUESTS = 20
+
+    def __init__(self, batch: low_level_batch_client.Batch):
+        self.batch = batch
+        self._pending: Dict[int, Tuple[low_level_batch_client.Job, asyncio.Future]] = {}
+        self._done: Set[int] = set()
+        self._last_listed_job_id = 0
+        self._task: Optional[asyncio.Future] = None
+
+    def wait(self, job: low_level_batch_client.Job) -> asyncio.Future:
+        """Returns a future for the job's status once it is complete."""
+        fut = asyncio.get_event_loop().create_future()
+        self._pending[job.job_id] = (job, fut)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._watch())
+        return fut
+
+    def _resolve(self, job: Dict[str, Any]):
+        self._done.add(job['job_id'])
+        pending = self._pending.pop(job['job_id'], None)
+        if pending is not None:
+            _, fut = pending
+            if not fut.done():
+                fut.set_result(job)
+
+    async def _resolve_done_jobs(self, n_completed: int):
+        for job_id in [job_id for job_id, (_, fut) in self._pending.items() if fut.done()]:
+            del self._pending[job_id]
+        if not self._pending:
+            return
+
+        async for job in self.batch.jobs(q='done', last_job_id=self._last_listed_job_id):
+            self._resolve(job)
+            self._last_listed_job_id = max(self._last_listed_job_id, job['job_id'])
+
+        if len(self._done) >= n_completed:
+            return
+        # some jobs that were listed past have completed since
+        listed_past = [(job_id, job) for job_id, (job, _) in self._pending.items()
+                       if job_id <= self._last_listed_job_id]
+        if not listed_past:
+            return
+        if len(listed_past) > BatchPoolJobWatcher.MAX_STATUS_REQUESTS:
+            first_job_id = min(job_id for job_id, _ in listed_past)
+            async for job in self.batch.jobs(q='done', last_job_id=first_job_id - 1):
+                if job['job_id'] > self._last_listed_job_id or len(self._done) >= n_completed:
+                    break
+                self._resolve(job)
+        else:
+            statuses = await asyncio.gather(*[job.status() for _, job in listed_past])
+            for status in statuses:
+                if status['state'] in complete_states:
+                    self._resolve(status)
+
+    async def _watch(self):
+        try:
+            delay = 0.1
+            status = await self.batch.status()
+            while True:
+                await self._resolve_done_jobs(status['n_completed'])
+                if not self._pending:
+                    return
+                if status['complete']:
+                    raise ValueError(f'batch {self.batch.id} is complete but jobs {list(self._pending)} are not')
+                new_status = await self.batch._wait_for_status_change(status['n_completed'])
+                if new_status is None:
+                    # the server doesn't support waiting
+                    delay = await sleep_and_backoff(delay)
+                    new_status = await self.batch.status()
+                status = new_status
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            for fut in self._pending.values():
+                if not fut.done():
+                    fut.set_exception(e)
+            self._pending = {}
+
+
 class BatchPoolFuture:
     def __init__(self,
                  executor: BatchPoolExecutor,
-                 batch: low_level_batch_client.Batch,
-                 job: low_level_batch_client.Job,
+                 job_future: asyncio.Future,
                  output_file: str):
         self.executor = executor
-        self.batch = batch
-        self.job = job
+        # resolved with the job once the call is sent to the executor's batch
+        self.job_future = job_future
         self.output_file = output_file
         self.fetch_coro = asyncio.ensure_future(self._async_fetch_result())
         executor._add_future(self)
@@ -480,6 +690,10 @@ class BatchPoolFuture:
 
         self.fetch_coro.cancel()
         await asyncio.wait([self.fetch_coro])
+        # a call that was not yet sent is never sent
+        self.job_future.cancel()
+        if not self.job_future.cancelled() and self.job_future.exception() is None:
+            await self.job_future.result().cancel()
         return True
 
     def cancelled(self):
@@ -534,6 +748,8 @@ class BatchPoolFuture:
         """
         if self.cancelled():
             raise concurrent.futures.CancelledError()
+        if not self.job_future.done():
+            await self.executor._async_flush()
         try:
             return await asyncio.wait_for(asyncio.shield(self.fetch_coro), timeout=timeout)
         except asyncio.TimeoutError as e:
@@ -541,11 +757,15 @@ class BatchPoolFuture:
 
     async def _async_fetch_result(self):
         try:
-            await self.job.wait()
-            main_container_status = self.job._status['status']['container_statuses']['main']
-            if main_container_status['state'] == 'error':
-                raise ValueError(
-                    f"submitted job failed:\n{main_container_status['error']}")
+            job = await self.job_future
+            assert self.executor._watcher is not None
+            job_status = await self.executor._watcher.wait(job)
+            if job_status['state'] == 'Error':
+                status = await job.status()
+                main_container_status = status['status']['container_statuses']['main']
+                if main_container_status['state'] == 'error':
+                    raise ValueError(
+                        f"submitted job failed:\n{main_container_status['error']}")
             value, traceback = dill.loads(
                 await self.executor.fs.read(self.output_file))
             if traceback is None:
@@ -555,7 +775,6 @@ class BatchPoolFuture:
             traceback = ''.join(traceback)
             raise ValueError(f'submitted job failed:\n{traceback}')
         finally:
-            await self.batch.cancel()
             self.executor._finish_future()
 
     def exception(self, timeout: Optional[Union[float, int]] = None):
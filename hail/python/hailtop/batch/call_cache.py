@@ -0,0 +1,248 @@
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from shlex import quote as shq
+from typing import Dict, List, Optional
+
+import dill
+
+from hailtop.aiotools import AsyncFS, RouterAsyncFS
+from hailtop.aiotools.fs import FileStatus
+from hailtop.aiotools.copy import filesystem_from_scheme
+from hailtop.utils import async_to_blocking, bounded_gather
+
+from . import batch as _batch, job as _job, resource as _resource  # pylint: disable=cyclic-import
+
+
+CALL_CACHE_VERSION = 1
+
+
+class _NotCacheable(Exception):
+    pass
+
+
+def _is_url(path: str) -> bool:
+    return urllib.parse.urlparse(path).scheme != ''
+
+
+def _local_path(path: str) -> str:
+    if _is_url(path):
+        return path
+    return os.path.abspath(os.path.expanduser(path))
+
+
+def _scheme(path: str) -> str:
+    return urllib.parse.urlparse(path).scheme or 'file'
+
+
+def _output_name(r: '_resource.Resource') -> str:
+    '''The name of a job's output, which is the same in every run of the
+    same job.'''
+    if isinstance(r, _resource.ResourceGroup):
+        return f'group:{r._root}'
+    return r._value
+
+
+def _cached_outputs(job: '_job.Job') -> List['_resource.Resource']:
+    '''The outputs of `job` that are stored in the call cache: those read
+    by other jobs or written to permanent locations.'''
+    return sorted(job._internal_outputs | job._external_outputs, key=_output_name)
+
+
+async def _status_fingerprint(url: str, status: FileStatus) -> str:
+    size = await status.size()
+    md5 = await status.md5()
+    if md5 is not None:
+        return f'size:{size}:md5:{md5.hex()}'
+    # without a content hash, fall back to the version of the object
+    # at this URL
+    for key in ('generation', 'etag'):
+        try:
+            return f'{url}:size:{size}:{key}:{await status[key]}'
+        except KeyError:
+            pass
+    return f'{url}:size:{size}:mtime:{await status.mtime()}'
+
+
+async def _fingerprint(fs: AsyncFS, path: str) -> str:
+    url = path.rstrip('/')
+    if await fs.staturl(url) == AsyncFS.FILE:
+        return await _status_fingerprint(url, await fs.statfile(url))
+
+    dir_url = url + '/'
+    entries = []
+    async for entry in await fs.listfiles(dir_url, recursive=True):
+        entry_url = await entry.url()
+        entries.append([entry_url[len(dir_url):], await _status_fingerprint(entry_url, await entry.status())])
+    return 'dir:' + hashlib.sha256(json.dumps(sorted(entries)).encode()).hexdigest()
+
+
+class CallCache:
+    '''A cache of the outputs of jobs, keyed by everything that determines
+    what a job computes.
+
+    The key of a job is a hash of its command (or, for a Python job, its
+    functions and arguments), image, environment, shell, resource
+    requests and inputs.  Input files are identified by a fingerprint
+    of their contents, and the outputs of other jobs by the key of the
+    job that made them and their name, so a change to a job changes the
+    key of every job downstream of it.
+
+    The outputs of a job with key `key` are stored under `{location}/{key}/`
+    next to a manifest listing them.  A job is a hit if the manifest and
+    every output the batch needs from it exist.
+    '''
+
+    def __init__(self, location: str):
+        self.location = _local_path(location).rstrip('/')
+
+    def _entry_url(self, job: '_job.Job') -> str:
+        assert job._call_cache_key is not None
+        return f'{self.location}/{job._call_cache_key}'
+
+    def manifest_url(self, job: '_job.Job') -> str:
+        return f'{self._entry_url(job)}/manifest.json'
+
+    def output_url(self, job: '_job.Job', r: '_resource.Resource') -> str:
+        return f'{self._entry_url(job)}/outputs/{_output_name(r)}'
+
+    def outputs(self, job: '_job.Job') -> List['_resource.Resource']:
+        return _cached_outputs(job)
+
+    def manifest(self, job: '_job.Job') -> bytes:
+        return json.dumps({'outputs': [_output_name(r) for r in _cached_outputs(job)]}).encode()
+
+    def _job_key(self, job: '_job.Job', fingerprints: Dict[str, Optional[str]]) -> str:
+        def resource_id(r: '_resource.Resource') -> str:
+            if r._source is None:
+                if isinstance(r, _resource.ResourceGroup):
+                    return 'input_group:' + json.dumps({name: resource_id(rf) for name, rf in sorted(r._resources.items())})
+                assert isinstance(r, _resource.InputResourceFile)
+                fingerprint = fingerprints.get(r._input_path)
+                if fingerprint is None:
+                    raise _NotCacheable()
+                return f'input:{os.path.basename(r._input_path.rstrip("/"))}:{fingerprint}'
+            if r._source is job:
+                return f'output:{_output_name(r)}'
+            if r._source._call_cache_key is None:
+                raise _NotCacheable()
+            return f'{r._source._call_cache_key}:{_output_name(r)}'
+
+        if isinstance(job, _job.BashJob):
+            # commands refer to resources by their paths, which are
+            # different in every run, so replace them with the resources'
+            # identities; longer paths first, as the path of a resource
+            # group is a prefix of the paths of its files
+            mentioned = sorted(job._mentioned, key=lambda r: len(r._get_path('')), reverse=True)
+
+            def canonical_command(command: str) -> str:
+                for r in mentioned:
+                    command = command.replace('${BATCH_TMPDIR}' + shq(r._get_path('')), f'<{resource_id(r)}>')
+                return command
+
+            code = [canonical_command(command) for command in job._command]
+        else:
+            assert isinstance(job, _job.PythonJob)
+
+            def canonical_arg(arg):
+                if isinstance(arg, _resource.Resource):
+                    return ('resource', resource_id(arg))
+                return ('value', arg)
+
+            code = []
+            for result, unapplied, args, kwargs in job._functions:
+                try:
+                    call = dill.dumps((unapplied,
+                                       [canonical_arg(arg) for arg in args],
+                                       {kw: canonical_arg(arg) for kw, arg in sorted(kwargs.items())}),
+                                      recurse=True)
+                except Exception as e:
+                    raise _NotCacheable() from e
+                code.append([_output_name(result),
+                             result._json is not None,
+                             result._str is not None,
+                             result._repr is not None,
+                             hashlib.sha256(call).hexdigest()])
+
+        key = {
+            'version': CALL_CACHE_VERSION,
+            'type': type(job).__name__,
+            'code': code,
+            'image': job._image,
+            'env': sorted(job._env.items()),
+            'shell': job._shell,
+            'cpu': job._cpu,
+            'memory': job._memory,
+            'storage': job._storage,
+            'gcsfuse': job._gcsfuse,
+        }
+        return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+    async def _lookup(self, fs: AsyncFS, job: '_job.Job') -> Optional[Dict['_resource.Resource', str]]:
+        try:
+            manifest = json.loads(await fs.read(self.manifest_url(job)))
+        except FileNotFoundError:
+            return None
+        outputs = set(manifest['outputs'])
+        needed = _cached_outputs(job)
+        if any(_output_name(r) not in outputs for r in needed):
+            return None
+        urls = {r: self.output_url(job, r) for r in needed}
+        # the manifest is written next to the outputs, so make sure
+        # none of them is missing
+        exists = await asyncio.gather(*[fs.exists(url) for url in urls.values()])
+        if not all(exists):
+            return None
+        return urls
+
+    async def _resolve(self, batch: '_batch.Batch', fs: AsyncFS) -> None:
+        input_paths = {r._input_path
+                       for job in batch._jobs
+                       for r in job._inputs
+                       if isinstance(r, _resource.InputResourceFile)}
+
+        async def fingerprint(path):
+            try:
+                return await _fingerprint(fs, _local_path(path))
+            except FileNotFoundError:
+                # the job that reads it will fail, so don't cache it
+                return None
+
+        input_paths_list = list(input_paths)
+        fingerprints = dict(zip(input_paths_list,
+                                await bounded_gather(*[functools.partial(fingerprint, path) for path in input_paths_list],
+                                                     parallelism=50)))
+
+        # jobs are in topological order, so parents have their keys
+        for job in batch._jobs:
+            job._cached_outputs = None
+            try:
+                job._call_cache_key = self._job_key(job, fingerprints)
+            except _NotCacheable:
+                job._call_cache_key = None
+
+        cacheable = [job for job in batch._jobs if job._call_cache_key is not None]
+        hits = await bounded_gather(*[functools.partial(self._lookup, fs, job) for job in cacheable],
+                                    parallelism=50)
+        for job, cached_outputs in zip(cacheable, hits):
+            job._cached_outputs = cached_outputs
+
+    def resolve(self, batch: '_batch.Batch') -> None:
+        '''Compute the key of every job of `batch`, and find the jobs whose
+        outputs are in the cache.'''
+        schemes = ({_scheme(r._input_path) for r in batch._input_resources}
+                   | {_scheme(self.location), 'file'})
+        gcs_params = {'userProject': batch.requester_pays_project} if batch.requester_pays_project else None
+
+        async def resolve():
+            with ThreadPoolExecutor() as thread_pool:
+                filesystems = [filesystem_from_scheme(scheme, thread_pool=thread_pool, gcs_params=gcs_params)
+                               for scheme in schemes]
+                async with RouterAsyncFS('file', filesystems) as fs:
+                    await self._resolve(batch, fs)
+
+        async_to_blocking(resolve())
@@ -95,6 +95,9 @@ class Job:
         self._valid: Set[_resource.Resource] = set()  # resources declared in the appropriate place
         self._dependencies: Set[Job] = set()
 
+        self._call_cache_key: Optional[str] = None
+        self._cached_outputs: Optional[Dict[_resource.Resource, str]] = None  # where to read outputs from on a hit
+
         def safe_str(s):
             new_s = []
             for c in s:
@@ -307,10 +310,6 @@ class Job:
         """
         Set the job to always run, even if dependencies fail.
 
-        Notes
-        -----
-        Can only be used with the :class:`.backend.ServiceBackend`.
-
         Warning
         -------
         Jobs set to always run are not cancellable!
@@ -333,9 +332,6 @@ class Job:
         Same job object set to always run.
         """
 
-        if not isinstance(self._batch._backend, backend.ServiceBackend):
-            raise NotImplementedError("A ServiceBackend is required to use the 'always_run' option")
-
         self._always_run = always_run
         return self
 
@@ -343,10 +339,6 @@ class Job:
         """
         Set the maximum amount of time this job can run for.
 
-        Notes
-        -----
-        Can only be used with the :class:`.backend.ServiceBackend`.
-
         Examples
         --------
 
@@ -366,9 +358,6 @@ class Job:
         Same job object set with a timeout.
         """
 
-        if not isinstance(self._batch._backend, backend.ServiceBackend):
-            raise NotImplementedError("A ServiceBackend is required to use the 'timeout' option")
-
         self._timeout = timeout
         return self
 
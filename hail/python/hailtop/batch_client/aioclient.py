@@ -4,6 +4,7 @@ import random
 import logging
 import json
 import functools
+import gzip
 import asyncio
 import aiohttp
 import secrets
@@ -17,6 +18,10 @@ from .globals import tasks, complete_states
 
 log = logging.getLogger('batch_client.aioclient')
 
+# how long the server holds a wait request open before answering with
+# the current status
+LONG_POLL_TIMEOUT_SECS = 30
+
 
 class Job:
     @staticmethod
@@ -220,6 +225,9 @@ class Job:
     async def attempts(self):
         return await self._job.attempts()
 
+    async def cancel(self):
+        await self._job.cancel()
+
 
 class UnsubmittedJob:
     def _submit(self, batch):
@@ -263,6 +271,9 @@ class UnsubmittedJob:
     async def attempts(self):
         raise ValueError("cannot get the attempts of an unsubmitted job")
 
+    async def cancel(self):
+        raise ValueError("cannot cancel an unsubmitted job")
+
 
 class SubmittedJob:
     def __init__(self, batch, job_id, _status=None):
@@ -293,7 +304,18 @@ class SubmittedJob:
 
     async def wait(self):
         i = 0
+        long_poll = True
         while True:
+            if long_poll:
+                status = await self._batch._client._long_poll(
+                    f'/api/v1alpha/batches/{self.batch_id}/jobs/{self.job_id}/wait')
+                if status is not None:
+                    self._status = status
+                    if status['state'] in complete_states:
+                        return status
+                    continue
+                # the server doesn't support waiting, fall back to polling
+                long_poll = False
             if await self.is_complete():
                 return self._status
             j = random.randrange(math.floor(1.1 ** i))
@@ -310,6 +332,11 @@ class SubmittedJob:
         resp = await self._batch._client._get(f'/api/v1alpha/batches/{self.batch_id}/jobs/{self.job_id}/attempts')
         return await resp.json()
 
+    async def cancel(self):
+        # only jobs that haven't started are cancelled; the rest are
+        # cancelled with their batch
+        await self._batch._client._patch(f'/api/v1alpha/batches/{self.batch_id}/jobs/{self.job_id}/cancel')
+
 
 class Batch:
     def __init__(self, client, id, attributes, n_jobs, token, last_known_status=None):
@@ -323,8 +350,7 @@ class Batch:
     async def cancel(self):
         await self._client._patch(f'/api/v1alpha/batches/{self.id}/cancel')
 
-    async def jobs(self, q=None):
-        last_job_id = None
+    async def jobs(self, q=None, last_job_id=None):
         while True:
             params = {}
             if q is not None:
@@ -376,21 +402,39 @@ class Batch:
             return await self.status()  # updates _last_known_status
         return self._last_known_status
 
+    async def _wait_for_status_change(self, last_n_completed):
+        # Returns None if the server doesn't support waiting.
+        status = await self._client._long_poll(
+            f'/api/v1alpha/batches/{self.id}/wait',
+            params={'last_n_completed': last_n_completed})
+        if status is not None:
+            self._last_known_status = status
+        return status
+
     async def wait(self, *, disable_progress_bar=TQDM_DEFAULT_DISABLE):
         i = 0
         with tqdm(total=self.n_jobs,
                   disable=disable_progress_bar,
                   desc='completed jobs') as pbar:
+            status = await self.status()
+            long_poll = True
             while True:
-                status = await self.status()
                 pbar.update(status['n_completed'] - pbar.n)
                 if status['complete']:
                     return status
+                if long_poll:
+                    new_status = await self._wait_for_status_change(status['n_completed'])
+                    if new_status is not None:
+                        status = new_status
+                        continue
+                    # the server doesn't support waiting, fall back to polling
+                    long_poll = False
                 j = random.randrange(math.floor(1.1 ** i))
                 await asyncio.sleep(0.100 * j)
                 # max 44.5s
                 if i < 64:
                     i = i + 1
+                status = await self.status()
 
     async def delete(self):
         await self._client._delete(f'/api/v1alpha/batches/{self.id}')
@@ -403,6 +447,7 @@ class BatchBuilder:
         self._job_specs = []
         self._jobs = []
         self._submitted = False
+        self._batch = None
         self.attributes = attributes
         self.callback = callback
 
@@ -439,6 +484,9 @@ class BatchBuilder:
                     invalid_job_ids.append(job)
                 else:
                     parent_ids.append(job._job_id)
+            elif self._batch is not None and job.batch_id == self._batch.id:
+                # already flushed into this open batch
+                parent_ids.append(job.job_id)
             else:
                 foreign_batches.append(job)
 
@@ -519,17 +567,19 @@ class BatchBuilder:
 
         b.append(ord(']'))
 
+        # specs in a bunch are mostly alike and compress well
         await self._client._post(
             f'/api/v1alpha/batches/{batch_id}/jobs/create',
             data=aiohttp.BytesPayload(
-                b, content_type='application/json', encoding='utf-8'))
+                gzip.compress(b, compresslevel=6), content_type='application/json', encoding='utf-8',
+                headers={'Content-Encoding': 'gzip'}))
         pbar.update(n_jobs)
 
-    async def _create(self):
-        n_jobs = len(self._job_specs)
+    async def _create(self, n_jobs=None):
         batch_spec = {'billing_project': self._client.billing_project,
-                      'n_jobs': n_jobs,
                       'token': self.token}
+        if n_jobs is not None:
+            batch_spec['n_jobs'] = n_jobs
         if self.attributes:
             batch_spec['attributes'] = self.attributes
         if self.callback:
@@ -543,17 +593,9 @@ class BatchBuilder:
     MAX_BUNCH_BYTESIZE = 1024 * 1024
     MAX_BUNCH_SIZE = 1024
 
-    async def submit(self,
-                     max_bunch_bytesize=MAX_BUNCH_BYTESIZE,
-                     max_bunch_size=MAX_BUNCH_SIZE,
-                     disable_progress_bar=TQDM_DEFAULT_DISABLE):
+    async def _submit_job_specs(self, batch_id, max_bunch_bytesize, max_bunch_size, disable_progress_bar):
         assert max_bunch_bytesize > 0
         assert max_bunch_size > 0
-        if self._submitted:
-            raise ValueError("cannot submit an already submitted batch")
-        batch = await self._create()
-        id = batch.id
-        log.info(f'created batch {id}')
         byte_job_specs = [json.dumps(job_spec).encode('utf-8')
                           for job_spec in self._job_specs]
         byte_job_specs_bunches = []
@@ -584,12 +626,61 @@ class BatchBuilder:
                   disable=disable_progress_bar,
                   desc='jobs submitted to queue') as pbar:
             await bounded_gather(
-                *[functools.partial(self._submit_jobs, id, bunch, size, pbar)
+                *[functools.partial(self._submit_jobs, batch_id, bunch, size, pbar)
                   for bunch, size in zip(byte_job_specs_bunches, bunch_sizes)],
                 parallelism=6)
 
-        await self._client._patch(f'/api/v1alpha/batches/{id}/close')
-        log.info(f'closed batch {id}')
+    async def open(self) -> Batch:
+        """Create the batch without closing it.
+
+        Jobs created afterwards are sent to the batch by :meth:`.flush`,
+        so their specs needn't all be held in memory at once, and start
+        running while later jobs are still being created.
+        :meth:`.submit` sends the remaining jobs and closes the batch.
+        """
+        if self._submitted:
+            raise ValueError("cannot open an already submitted batch")
+        if self._batch is not None:
+            raise ValueError("batch is already open")
+        self._batch = await self._create()
+        log.info(f'opened batch {self._batch.id}')
+        return self._batch
+
+    async def flush(self,
+                    max_bunch_bytesize=MAX_BUNCH_BYTESIZE,
+                    max_bunch_size=MAX_BUNCH_SIZE,
+                    disable_progress_bar=TQDM_DEFAULT_DISABLE):
+        """Send the jobs created since the last flush to the open batch."""
+        if self._batch is None:
+            raise ValueError("cannot flush a batch that is not open")
+        if not self._job_specs:
+            return
+        await self._submit_job_specs(self._batch.id, max_bunch_bytesize, max_bunch_size, disable_progress_bar)
+        for j in self._jobs:
+            j._job = j._job._submit(self._batch)
+        self._job_specs = []
+        self._jobs = []
+
+    async def submit(self,
+                     max_bunch_bytesize=MAX_BUNCH_BYTESIZE,
+                     max_bunch_size=MAX_BUNCH_SIZE,
+                     disable_progress_bar=TQDM_DEFAULT_DISABLE):
+        if self._submitted:
+            raise ValueError("cannot submit an already submitted batch")
+        if self._batch is not None:
+            batch = self._batch
+            id = batch.id
+            await self.flush(max_bunch_bytesize, max_bunch_size, disable_progress_bar)
+            batch.n_jobs = self._job_idx
+            await self._client._patch(f'/api/v1alpha/batches/{id}/close', json={'n_jobs': batch.n_jobs})
+            log.info(f'closed batch {id}')
+        else:
+            batch = await self._create(len(self._job_specs))
+            id = batch.id
+            log.info(f'created batch {id}')
+            await self._submit_job_specs(id, max_bunch_bytesize, max_bunch_size, disable_progress_bar)
+            await self._client._patch(f'/api/v1alpha/batches/{id}/close')
+            log.info(f'closed batch {id}')
 
         for j in self._jobs:
             j._job = j._job._submit(batch)
@@ -630,20 +721,35 @@ class BatchClient:
             h.update(service_auth_headers(deploy_config, 'batch', token_file=token_file))
         self._headers = h
 
-    async def _get(self, path, params=None):
+    async def _get(self, path, params=None, timeout=None):
+        kwargs = {}
+        if timeout is not None:
+            kwargs['timeout'] = timeout
         return await request_retry_transient_errors(
             self._session, 'GET',
-            self.url + path, params=params, headers=self._headers)
+            self.url + path, params=params, headers=self._headers, **kwargs)
+
+    async def _long_poll(self, path, params=None):
+        # Returns None if the server has no such endpoint.
+        params = {**(params or {}), 'timeout': LONG_POLL_TIMEOUT_SECS}
+        try:
+            resp = await self._get(path, params=params,
+                                   timeout=aiohttp.ClientTimeout(total=LONG_POLL_TIMEOUT_SECS + 30))
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                return None
+            raise
+        return await resp.json()
 
     async def _post(self, path, data=None, json=None):
         return await request_retry_transient_errors(
             self._session, 'POST',
             self.url + path, data=data, json=json, headers=self._headers)
 
-    async def _patch(self, path):
+    async def _patch(self, path, json=None):
         return await request_retry_transient_errors(
             self._session, 'PATCH',
-            self.url + path, headers=self._headers)
+            self.url + path, json=json, headers=self._headers)
 
     async def _delete(self, path):
         return await request_retry_transient_errors(
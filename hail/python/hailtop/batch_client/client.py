@@ -103,6 +103,9 @@ class Job:
     def attempts(self):
         return async_to_blocking(self._async_job.attempts())
 
+    def cancel(self):
+        async_to_blocking(self._async_job.cancel())
+
 
 class Batch:
     @classmethod
@@ -223,6 +226,13 @@ class BatchBuilder:
         async_batch = async_to_blocking(self._async_builder._create())
         return Batch.from_async_batch(async_batch)
 
+    def open(self) -> Batch:
+        async_batch = async_to_blocking(self._async_builder.open())
+        return Batch.from_async_batch(async_batch)
+
+    def flush(self, *args, **kwargs):
+        async_to_blocking(self._async_builder.flush(*args, **kwargs))
+
     def submit(self, *args, **kwargs) -> Batch:
         async_batch = async_to_blocking(self._async_builder.submit(*args, **kwargs))
         return Batch.from_async_batch(async_batch)
@@ -155,3 +155,45 @@ def test_sample_override():
     mt_cols = hl.read_matrix_table(out_file).key_cols_by().cols()
     mt_names = mt_cols.aggregate(hl.agg.collect(mt_cols.s))
     assert new_names == mt_names
+
+
+@fails_service_backend()
+@fails_local_backend()
+def test_combiner_resume_and_concurrent_jobs():
+    out_file = new_temp_file(extension='mt')
+    tmp_path = new_temp_file()
+    paths = [os.path.join(resource('gvcfs'), '1kg_chr22', f'{s}.hg38.g.vcf.gz') for s in all_samples[:5]]
+
+    def run(overwrite=False):
+        vc.run_combiner(paths,
+                        out_file=out_file,
+                        tmp_path=tmp_path,
+                        branch_factor=2,
+                        batch_size=2,
+                        reference_genome='GRCh38',
+                        use_exome_default_intervals=True,
+                        max_concurrent_jobs=2,
+                        overwrite=overwrite)
+
+    run()
+    [run_dir] = hl.hadoop_ls(os.path.join(tmp_path, 'combiner-temporary'))
+    assert hl.hadoop_exists(os.path.join(run_dir['path'], 'plan.json'))
+    n_done = len(hl.hadoop_ls(os.path.join(run_dir['path'], 'done')))
+    expected = hl.read_matrix_table(out_file).count()
+
+    # every merge is already done, including the final write
+    run()
+    assert len(hl.hadoop_ls(os.path.join(tmp_path, 'combiner-temporary'))) == 1
+    assert len(hl.hadoop_ls(os.path.join(run_dir['path'], 'done'))) == n_done
+    assert hl.read_matrix_table(out_file).count() == expected
+
+    # the final merge is rerun if its output is gone
+    hl.current_backend().fs.rmtree(out_file)
+    run()
+    assert hl.read_matrix_table(out_file).count() == expected
+
+    # overwrite reruns every merge
+    success_mtime = hl.hadoop_stat(os.path.join(out_file, '_SUCCESS'))['modification_time']
+    run(overwrite=True)
+    assert hl.hadoop_stat(os.path.join(out_file, '_SUCCESS'))['modification_time'] != success_mtime
+    assert hl.read_matrix_table(out_file).count() == expected
@@ -1,9 +1,13 @@
+import struct
 import unittest
 
+import numpy as np
+
 from hail.expr import coercer_from_dtype
 from hail.expr.types import *
 from ..helpers import *
 from hail.utils.java import Env
+from hail.utils.byte_reader import ByteReader
 
 setUpModule = startTestHailContext
 tearDownModule = stopTestHailContext
@@ -100,6 +104,74 @@ class Tests(unittest.TestCase):
         with self.assertRaisesRegex(ValueError, "attempted to rename 'a' and 'b' both to 'a'"):
             hl.tstruct(a=hl.tbool, b=hl.tint32)._rename({'b': 'a'})
 
+    def test_from_encoding(self):
+        def framed(b):
+            return struct.pack('<i', len(b)) + b
+
+        self.assertEqual(tint32._from_encoding(framed(struct.pack('<i', -5))), -5)
+        self.assertEqual(tstr._from_encoding(framed(struct.pack('<i', 3) + b'abc')), 'abc')
+        self.assertEqual(
+            tarray(tfloat64)._from_encoding(framed(struct.pack('<ib', 3, 0b010) + struct.pack('<dd', 1.5, 2.5))),
+            [1.5, None, 2.5])
+        self.assertEqual(
+            tcall._from_encoding(framed(struct.pack('<i', 1 | (2 << 1) | (1 << 3)))),
+            hl.Call([0, 1], phased=True))
+        self.assertEqual(
+            tcall._from_encoding(framed(struct.pack('<i', (2 << 1) | (4 << 3)))),
+            hl.Call([1, 2]))
+
+        b = bytes([0b101]) + struct.pack('<i', 1) + b'x'
+        self.assertEqual(
+            tstruct(a=tint32, b=tstr, c=tarray(tint32))._from_encoding(framed(b[:3]) + framed(b[3:])),
+            hl.Struct(a=None, b='x', c=None))
+
+        nd = tndarray(tint64, 2)._from_encoding(framed(struct.pack('<qq', 2, 3) + struct.pack('<6q', *range(6))))
+        self.assertTrue(np.array_equal(nd, np.array([[0, 2, 4], [1, 3, 5]])))
+
+    def test_eval_encoding_roundtrip(self):
+        values = [
+            (hl.tarray(hl.tint32), [1, None, 3]),
+            (hl.tarray(hl.tfloat32), [1.5, None]),
+            (hl.tset(hl.tstr), {'a', None, 'b'}),
+            (hl.tdict(hl.tstr, hl.tint64), {'a': None, None: 5}),
+            (hl.tstruct(x=hl.tint32, y=hl.tarray(hl.tbool)), hl.Struct(x=None, y=[True, None, False])),
+            (hl.ttuple(hl.tcall, hl.tlocus('GRCh38')), (hl.Call([0, 1], phased=True), hl.Locus('chr1', 5, 'GRCh38'))),
+            (hl.tinterval(hl.tint32), hl.Interval(None, 5, includes_start=False, includes_end=True, point_type=hl.tint32)),
+        ]
+        for t, v in values:
+            self.assertEqual(hl.eval(hl.literal(v, t)), v)
+
+    def test_to_encoding_roundtrip(self):
+        values = [
+            (tarray(tint32), [1, None, 3]),
+            (tarray(tfloat32), [1.5, None]),
+            (tarray(tstr), ['a', None, 'bc', '\u00e9']),
+            (tset(tstr), {'a', None, 'b'}),
+            (tdict(tstr, tint64), {'a': None, None: 5}),
+            (tstruct(x=tint32, y=tarray(tbool)), hl.Struct(x=None, y=[True, None, False])),
+            (ttuple(tfloat64, tstr), (None, 'x')),
+            (tinterval(tint32), hl.Interval(None, 5, includes_start=False, includes_end=True, point_type=tint32)),
+        ]
+        for t, v in values:
+            decoded = t._convert_from_encoding(ByteReader(memoryview(t._to_encoding(v))))
+            self.assertEqual(decoded, v)
+
+        a = np.arange(10, dtype=np.int64)
+        self.assertEqual(tarray(tint64)._to_encoding(a), tarray(tint64)._to_encoding(a.tolist()))
+        nd = np.arange(6, dtype=np.float64).reshape(2, 3)
+        decoded = tndarray(tfloat64, 2)._convert_from_encoding(ByteReader(memoryview(tndarray(tfloat64, 2)._to_encoding(nd))))
+        self.assertTrue(np.array_equal(decoded, nd))
+
+    def test_eval_large_literal(self):
+        ids = {f'1:{i}:A:T' for i in range(20_000)}
+        self.assertEqual(hl.eval(hl.len(hl.literal(ids))), len(ids))
+        self.assertTrue(hl.eval(hl.literal(ids).contains('1:5:A:T')))
+        d = {i: str(i) for i in range(20_000)}
+        self.assertEqual(hl.eval(hl.literal(d)[12345]), '12345')
+        a = np.arange(100_000, dtype=np.float64)
+        self.assertEqual(hl.eval(hl.sum(hl.literal(a, tarray(tfloat64)))), a.sum())
+        self.assertTrue(np.array_equal(hl.eval(hl.nd.array(a.reshape(1000, 100))), a.reshape(1000, 100)))
+
     def test_get_context(self):
         tl1 = tlocus('GRCh37')
         tl2 = tlocus('GRCh38')
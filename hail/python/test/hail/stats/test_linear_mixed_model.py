@@ -265,6 +265,33 @@ class Tests(unittest.TestCase):
         self.assertAlmostEqual(stats.beta, beta1[0])
         self.assertAlmostEqual(stats.chi_sq, chi_sq)
 
+    def test_fit_alternatives_numpy_matches_per_alternative_fit(self):
+        np.random.seed(0)
+        n, f, r, m = 60, 2, 20, 50
+        x = np.hstack([np.ones((n, 1)), np.random.normal(size=(n, f - 1))])
+        z = np.random.normal(size=(n, r))
+        y = x @ np.array([1.0, 0.5]) + z @ np.random.normal(size=r) / np.sqrt(r) + np.random.normal(size=n)
+        a = np.random.normal(size=(n, m))
+        a[:, 3] = 0.0
+
+        for low_rank in [False, True]:
+            if low_rank:
+                model, p = LinearMixedModel.from_random_effects(y, x, z[:, :r // 2])
+            else:
+                model, p = LinearMixedModel.from_kinship(y, x, z @ z.T)
+            model.fit()
+            pa = p @ a
+
+            df = model.fit_alternatives_numpy(pa, a if low_rank else None, return_pandas=True)
+            self.assertTrue(np.array_equal(df['idx'], np.arange(m)))
+            self.assertTrue(df.iloc[3][['beta', 'sigma_sq', 'chi_sq', 'p_value']].isna().all())
+            for i in range(m):
+                if i == 3:
+                    continue
+                expected = model._fit_alternative_numpy(pa[:, i], a[:, i] if low_rank else None)
+                actual = df.iloc[i][['beta', 'sigma_sq', 'chi_sq', 'p_value']].values
+                self.assertTrue(np.allclose(actual, expected, rtol=1e-6, atol=1e-10))
+
     @skip_unless_spark_backend()
     def test_linear_mixed_model_function(self):
         n, f, m = 4, 2, 3
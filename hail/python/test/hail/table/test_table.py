@@ -1,5 +1,6 @@
 import unittest
 
+import numpy as np
 import pandas as pd
 import pyspark.sql
 import pytest
@@ -1249,6 +1250,29 @@ Exception in thread "main" java.lang.RuntimeException: invalid sort order: b
         ht = hl.utils.range_table(10)
         assert hl.eval(ht.collect(_localize=False)) == ht.collect()
 
+    def test_to_numpy_columns(self):
+        ht = hl.utils.range_table(10)
+        ht = ht.annotate(x=hl.or_missing(ht.idx % 3 != 0, hl.float64(ht.idx) / 2),
+                         b=ht.idx % 2 == 0,
+                         s=hl.str(ht.idx))
+        columns = ht.to_numpy_columns()
+        assert columns['idx'].dtype == np.int32
+        assert list(columns['idx']) == list(range(10))
+        assert isinstance(columns['x'], np.ma.MaskedArray)
+        assert list(columns['x'].mask) == [i % 3 == 0 for i in range(10)]
+        assert columns['x'].compressed().tolist() == [i / 2 for i in range(10) if i % 3 != 0]
+        assert columns['b'].dtype == np.bool_
+        assert list(columns['s']) == [str(i) for i in range(10)]
+
+    def test_to_pandas_columnar(self):
+        ht = hl.utils.range_table(5)
+        ht = ht.annotate(x=hl.or_missing(ht.idx != 2, ht.idx), s=hl.struct(y=hl.float64(ht.idx)))
+        df = ht.to_pandas(columnar=True)
+        assert list(df.columns) == ['idx', 'x', 's.y']
+        assert df['x'].dtype == pd.Int32Dtype()
+        assert df['x'].isna().tolist() == [False, False, True, False, False]
+        assert df['s.y'].tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+
     def test_take_localize_false(self):
         ht = hl.utils.range_table(10)
         assert hl.eval(ht.take(3, _localize=False)) == ht.take(3)
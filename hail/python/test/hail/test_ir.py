@@ -505,3 +505,34 @@ class CSETests(unittest.TestCase):
                     ' (bar (GetField idx (Ref row)))))'
         )
         assert expected == CSERenderer()(x)
+
+    def test_large_literal(self):
+        small = ir.Literal(hl.tarray(hl.tint32), [1, 2])
+        r = CSERenderer()
+        assert r(small) == '(Literal Array[Int32] "[1, 2]")'
+        assert not r.literals
+
+        large = ir.Literal(hl.tset(hl.tstr), {str(i) for i in range(20_000)})
+        r = CSERenderer()
+        assert r(large) == '(ToSet (ToStream False (EncodedLiteral Array[String] "l0")))'
+        assert list(r.literals) == ['l0']
+
+    def test_literal_hash(self):
+        t = hl.tdict(hl.tstr, hl.tset(hl.tint32))
+        x = ir.Literal(t, {'a': {1, 2}, 'b': set()})
+        assert hash(x) == hash(ir.Literal(t, {'b': set(), 'a': {2, 1}}))
+        assert hash(x) != hash(ir.Literal(t, {'a': {1, 3}, 'b': set()}))
+
+        t = hl.tarray(hl.tstruct(x=hl.tint32, y=hl.tfloat64))
+        assert (hash(ir.Literal(t, [{'x': 1, 'y': 0.5}, None]))
+                == hash(ir.Literal(t, [hl.Struct(x=1, y=0.5), None])))
+        assert hash(ir.Literal(hl.tarray(hl.tint32), [1, 2])) != hash(ir.Literal(hl.tarray(hl.tint32), [2, 1]))
+
+    def test_render_after_type_inference(self):
+        x = ir.MakeArray([ir.I32(1)], None)
+        y = ir.MakeTuple([x])
+        assert '(MakeArray None' in str(y)
+        assert '(MakeArray None' in CSERenderer()(y)
+        y.typ
+        assert '(MakeArray Array[Int32]' in str(y)
+        assert '(MakeArray Array[Int32]' in CSERenderer()(y)
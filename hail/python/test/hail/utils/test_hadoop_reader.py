@@ -0,0 +1,178 @@
+import io
+import mmap
+import os
+import tempfile
+
+from py4j.protocol import Py4JError
+
+from hail.fs.hadoop_fs import HadoopReader
+
+
+class FakeJavaReader:
+    # Mimics HadoopSeekablePyReader, including how mapSharedBuffer opens
+    # the shared file: it is never created, and must hold the nonce.
+    def __init__(self, data, shares_filesystem=True):
+        self.data = data
+        self.pos = 0
+        self.shares_filesystem = shares_filesystem
+        self.shared = None
+        self.shared_reads = 0
+
+    def mapSharedBuffer(self, path, size, nonce):
+        if not self.shares_filesystem:
+            path = path + '-on-another-host'
+        try:
+            fd = os.open(path, os.O_RDWR)
+        except FileNotFoundError as e:
+            raise Py4JError(str(e)) from e
+        try:
+            if os.fstat(fd).st_size != size:
+                raise Py4JError('wrong size')
+            shared = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        expected = bytes.fromhex(nonce)
+        if shared[:len(expected)] != expected:
+            raise Py4JError('wrong nonce')
+        self.shared = shared
+
+    def readShared(self, n):
+        chunk = self.data[self.pos:self.pos + min(n, len(self.shared))]
+        self.shared[:len(chunk)] = chunk
+        self.pos += len(chunk)
+        self.shared_reads += 1
+        return len(chunk)
+
+    def read(self, n):
+        chunk = self.data[self.pos:self.pos + n]
+        self.pos += len(chunk)
+        return chunk
+
+    def seek(self, offset, whence):
+        if whence == io.SEEK_SET:
+            self.pos = offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        else:
+            self.pos = len(self.data) + offset
+        return self.pos
+
+    def getPosition(self):
+        return self.pos
+
+    def getLen(self):
+        return len(self.data)
+
+    def close(self):
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+
+
+class FakeUtils:
+    def __init__(self, jfile):
+        self.jfile = jfile
+
+    def readFile(self, jfs, path, buffer_size):
+        return self.jfile
+
+
+class FakeHadoopFS:
+    def __init__(self, jfile):
+        self._jfs = None
+        self._utils_package_object = FakeUtils(jfile)
+
+
+DATA = bytes(range(256)) * 4
+
+
+def open_reader(monkeypatch, shares_filesystem=True, data=DATA, buffer_size=32):
+    monkeypatch.setattr(HadoopReader, 'SHARED_BUFFER_SIZE', 100)
+    jfile = FakeJavaReader(data, shares_filesystem)
+    return jfile, HadoopReader(FakeHadoopFS(jfile), 'gs://bucket/file', buffer_size)
+
+
+def read_all(reader, n):
+    result = b''
+    b = bytearray(n)
+    while True:
+        n_read = reader.readinto(b)
+        if n_read == 0:
+            return result
+        result += b[:n_read]
+
+
+def test_readinto_through_shared_buffer(monkeypatch):
+    jfile, reader = open_reader(monkeypatch)
+    assert reader._shared is not None
+    assert read_all(reader, 33) == DATA
+    assert jfile.shared_reads == 12  # 11 chunks of at most 100 bytes, then end of file
+    reader.close()
+
+
+def test_tell_and_seek_account_for_buffered_bytes(monkeypatch):
+    jfile, reader = open_reader(monkeypatch)
+    b = bytearray(30)
+    assert reader.readinto(b) == 30
+    assert bytes(b) == DATA[:30]
+    assert jfile.getPosition() == 100
+    assert reader.tell() == 30
+
+    assert reader.seek(5, io.SEEK_CUR) == 35
+    assert reader.tell() == 35
+    assert reader.readinto(b) == 30
+    assert bytes(b) == DATA[35:65]
+
+    assert reader.seek(1000) == 1000
+    assert reader.readinto(b) == 24
+    assert bytes(b[:24]) == DATA[1000:]
+    assert reader.tell() == len(DATA)
+    assert reader.readinto(b) == 0
+
+    assert reader.seek(-10, io.SEEK_END) == len(DATA) - 10
+    assert read_all(reader, 7) == DATA[-10:]
+    reader.close()
+
+
+def test_shared_buffer_is_no_larger_than_the_file(monkeypatch):
+    jfile, reader = open_reader(monkeypatch, data=DATA[:70])
+    assert len(reader._shared) == 70
+    assert read_all(reader, 33) == DATA[:70]
+    assert jfile.shared_reads == 2  # the whole file, then end of file
+    reader.close()
+
+
+def test_file_within_one_py4j_read_is_not_mapped(monkeypatch):
+    jfile, reader = open_reader(monkeypatch, data=DATA[:70], buffer_size=8192)
+    assert reader._shared is None
+    assert jfile.shared is None
+    assert read_all(reader, 33) == DATA[:70]
+    reader.close()
+
+
+def test_falls_back_to_py4j_if_filesystem_is_not_shared(monkeypatch):
+    jfile, reader = open_reader(monkeypatch, shares_filesystem=False)
+    assert reader._shared is None
+    assert read_all(reader, 33) == DATA
+    assert jfile.shared_reads == 0
+    reader.close()
+
+
+def test_shared_file_is_removed_after_mapping(monkeypatch, tmp_path):
+    monkeypatch.setattr(tempfile, 'tempdir', str(tmp_path))
+    _, reader = open_reader(monkeypatch)
+    assert reader._shared is not None
+    assert os.listdir(tmp_path) == []
+    reader.close()
+
+
+def test_buffered_reader_over_hadoop_reader(monkeypatch):
+    _, reader = open_reader(monkeypatch)
+    f = io.BufferedReader(reader, buffer_size=64)
+    assert f.read(10) == DATA[:10]
+    f.seek(500)
+    assert f.read(300) == DATA[500:800]
+    assert f.tell() == 800
+    assert f.read() == DATA[800:]
+    f.close()
+
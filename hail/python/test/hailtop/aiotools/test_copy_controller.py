@@ -0,0 +1,113 @@
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import pytest
+from hailtop.aiotools import AdaptiveSemaphore, LocalAsyncFS, RouterAsyncFS, Transfer
+from hailtop.aiotools.fs import Copier, CopyController, CopyProgress, CopyReport
+
+
+@pytest.mark.asyncio
+async def test_adaptive_semaphore_limit():
+    sema = AdaptiveSemaphore(2)
+    await sema.acquire()
+    await sema.acquire()
+    assert sema.locked()
+
+    waiter = asyncio.create_task(sema.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done() and sema.waiting() == 1
+
+    sema.set_limit(3)
+    await asyncio.sleep(0)
+    assert waiter.done() and sema.held() == 3
+
+    # lowering the limit doesn't preempt holders
+    sema.set_limit(1)
+    sema.release()
+    waiter = asyncio.create_task(sema.acquire())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    sema.release()
+    sema.release()
+    await asyncio.sleep(0)
+    assert waiter.done() and sema.held() == 1
+
+
+@pytest.mark.asyncio
+async def test_adaptive_semaphore_cancel():
+    sema = AdaptiveSemaphore(1)
+    await sema.acquire()
+    waiter = asyncio.create_task(sema.acquire())
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.wait([waiter])
+    sema.release()
+    assert sema.held() == 0 and sema.waiting() == 0
+
+
+class FakeSampledProgress(CopyProgress):
+    def __init__(self):
+        super().__init__()
+        self.samples = []
+
+    def sample(self):
+        return self.samples.pop(0)
+
+
+@pytest.mark.asyncio
+async def test_copy_controller_aimd():
+    sema = AdaptiveSemaphore(10)
+    progress = FakeSampledProgress()
+    controller = CopyController(sema, progress, max_limit=35, increase=10)
+
+    # idle: no one is waiting, so don't increase
+    progress.samples.append((100.0, 10.0, 0))
+    controller._adjust()
+    assert sema.limit == 10
+
+    sema.waiting = lambda: 1
+    progress.samples.append((200.0, 20.0, 0))
+    controller._adjust()
+    assert sema.limit == 20
+
+    # transient errors halve the limit
+    progress.samples.append((200.0, 20.0, 1))
+    controller._adjust()
+    assert sema.limit == 10
+
+    progress.samples.append((200.0, 20.0, 0))
+    controller._adjust()
+    progress.samples.append((300.0, 30.0, 0))
+    controller._adjust()
+    progress.samples.append((400.0, 40.0, 0))
+    controller._adjust()
+    assert sema.limit == 35
+
+    # slower after an increase
+    sema.set_limit(20)
+    controller._increased = True
+    progress.samples.append((100.0, 10.0, 0))
+    controller._adjust()
+    assert sema.limit == 15
+
+
+@pytest.mark.asyncio
+async def test_adaptive_copy():
+    with tempfile.TemporaryDirectory() as tmpdir, ThreadPoolExecutor() as thread_pool:
+        async with RouterAsyncFS('file', [LocalAsyncFS(thread_pool)]) as fs:
+            await fs.makedirs(f'{tmpdir}/src/', exist_ok=True)
+            for i in range(100):
+                await fs.write(f'{tmpdir}/src/{i}', b'x' * i)
+
+            sema = AdaptiveSemaphore(2)
+            transfer = Transfer(f'{tmpdir}/src/', f'{tmpdir}/dest/', treat_dest_as=Transfer.DEST_IS_TARGET)
+            copy_report = CopyReport(transfer)
+            async with sema:
+                await Copier(fs).copy(sema, copy_report, transfer, return_exceptions=False)
+            copy_report.mark_done()
+
+            assert copy_report._progress.files == 100
+            assert copy_report._progress.bytes == sum(range(100))
+            assert copy_report.files_per_second() is not None
+            for i in range(100):
+                assert await fs.read(f'{tmpdir}/dest/{i}') == b'x' * i
@@ -0,0 +1,87 @@
+import os
+import base64
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import datetime
+import pytest
+from hailtop.aiotools import LocalAsyncFS, RouterAsyncFS, Transfer
+from hailtop.aiotools.fs import _file_unchanged
+from hailtop.aiogoogle.client.storage_client import GetObjectFileStatus
+from hailtop.aiotools.s3asyncfs import S3ListFilesFileStatus
+
+
+async def sync(fs, src, dest):
+    sema = asyncio.Semaphore(10)
+    async with sema:
+        copy_report = await fs.copy(sema, Transfer(src, dest, treat_dest_as=Transfer.DEST_IS_TARGET), sync=True)
+    copy_report.mark_done()
+    return copy_report._transfer_report._source_report
+
+
+@pytest.mark.asyncio
+async def test_sync_skips_unchanged_files():
+    with tempfile.TemporaryDirectory() as tmpdir, ThreadPoolExecutor() as thread_pool:
+        async with RouterAsyncFS('file', [LocalAsyncFS(thread_pool)]) as fs:
+            src = f'{tmpdir}/src/'
+            dest = f'{tmpdir}/dest/'
+            await fs.makedirs(f'{src}a', exist_ok=True)
+            await fs.write(f'{src}x', b'x')
+            await fs.write(f'{src}a/y', b'yyyy')
+            await fs.write(f'{src}a/z', b'zzzz')
+
+            source_report = await sync(fs, src, dest)
+            assert (source_report._files, source_report._skipped) == (3, 0)
+
+            source_report = await sync(fs, src, dest)
+            assert (source_report._files, source_report._skipped, source_report._skipped_bytes) == (3, 3, 9)
+
+            # different size
+            await fs.write(f'{src}a/y', b'yyyyy')
+            # same size, modified after the destination was written
+            await fs.write(f'{src}a/z', b'ZZZZ')
+            later = os.stat(f'{dest}a/z').st_mtime + 10
+            os.utime(f'{src}a/z', (later, later))
+
+            source_report = await sync(fs, src, dest)
+            assert (source_report._files, source_report._skipped, source_report._skipped_bytes) == (3, 1, 1)
+            assert await fs.read(f'{dest}a/y') == b'yyyyy'
+            assert await fs.read(f'{dest}a/z') == b'ZZZZ'
+
+
+@pytest.mark.asyncio
+async def test_sync_single_file():
+    with tempfile.TemporaryDirectory() as tmpdir, ThreadPoolExecutor() as thread_pool:
+        async with RouterAsyncFS('file', [LocalAsyncFS(thread_pool)]) as fs:
+            await fs.write(f'{tmpdir}/src', b'abc')
+
+            source_report = await sync(fs, f'{tmpdir}/src', f'{tmpdir}/dest')
+            assert source_report._skipped == 0
+
+            source_report = await sync(fs, f'{tmpdir}/src', f'{tmpdir}/dest')
+            assert source_report._skipped == 1
+
+
+@pytest.mark.asyncio
+async def test_file_unchanged_compares_md5():
+    data = b'abc'
+    md5 = hashlib.md5(data).digest()
+    old = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+    new = datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+
+    gcs_stat = GetObjectFileStatus({
+        'size': '3',
+        'md5Hash': base64.b64encode(md5).decode(),
+        'updated': '2021-01-01T00:00:00.000Z'})
+    s3_stat = S3ListFilesFileStatus({'Size': 3, 'ETag': f'"{md5.hex()}"', 'LastModified': old})
+    s3_other_stat = S3ListFilesFileStatus({'Size': 3, 'ETag': f'"{hashlib.md5(b"xyz").hexdigest()}"', 'LastModified': new})
+    s3_multi_part_stat = S3ListFilesFileStatus({'Size': 3, 'ETag': f'"{md5.hex()}-2"', 'LastModified': old})
+
+    # matching checksums win over modification times
+    assert await _file_unchanged(gcs_stat, s3_stat)
+    assert not await _file_unchanged(s3_stat, s3_other_stat)
+    # multi-part ETags aren't checksums, so modification times decide
+    assert await s3_multi_part_stat.md5() is None
+    assert not await _file_unchanged(gcs_stat, s3_multi_part_stat)
+    assert await _file_unchanged(s3_multi_part_stat, gcs_stat)
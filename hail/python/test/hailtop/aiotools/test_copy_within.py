@@ -0,0 +1,229 @@
+import os
+import secrets
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from types import SimpleNamespace
+import pytest
+from hailtop.aiotools import LocalAsyncFS, RouterAsyncFS, Transfer
+from hailtop.aiogoogle import GoogleStorageAsyncFS
+from hailtop.aiogoogle.client.storage_client import StorageClient
+from hailtop.aiotools.s3asyncfs import S3AsyncFS
+from hailtop.aiotools.azurefs import AzureAsyncFS
+
+
+# These tests check that copies within a filesystem use the
+# filesystem's own copy primitive.  The cloud filesystems are tested
+# against in-memory doubles of the underlying APIs; test_copy.py
+# tests them against the real services.
+
+
+class CountingLocalAsyncFS(LocalAsyncFS):
+    def __init__(self, thread_pool):
+        super().__init__(thread_pool)
+        self.copies_within = []
+
+    async def copy_within(self, src: str, dest: str, size: int) -> None:
+        self.copies_within.append((src, dest))
+        await super().copy_within(src, dest, size)
+
+
+@pytest.mark.asyncio
+async def test_local_copy_uses_copy_within():
+    with tempfile.TemporaryDirectory() as tmpdir, ThreadPoolExecutor() as thread_pool:
+        local_fs = CountingLocalAsyncFS(thread_pool)
+        async with RouterAsyncFS('file', [local_fs]) as fs:
+            src = f'{tmpdir}/src/'
+            await fs.makedirs(f'{src}a/b', exist_ok=True)
+            contents = {
+                'x': b'x',
+                'a/y': os.urandom(1024 * 1024),
+                'a/b/z': b''
+            }
+            for path, data in contents.items():
+                await fs.write(f'{src}{path}', data)
+
+            sema = asyncio.Semaphore(10)
+            async with sema:
+                await fs.copy(sema, Transfer(src, f'{tmpdir}/dest/', treat_dest_as=Transfer.DEST_IS_TARGET))
+
+            for path, data in contents.items():
+                assert await fs.read(f'{tmpdir}/dest/{path}') == data
+            assert set(local_fs.copies_within) == {
+                (f'{src}{path}', f'{tmpdir}/dest/{path}') for path in contents}
+
+
+@pytest.mark.asyncio
+async def test_local_copy_within_missing_source():
+    with tempfile.TemporaryDirectory() as tmpdir, ThreadPoolExecutor() as thread_pool:
+        fs = LocalAsyncFS(thread_pool)
+        with pytest.raises(FileNotFoundError):
+            await fs.copy_within(f'{tmpdir}/does-not-exist', f'{tmpdir}/dest', 0)
+        assert not await fs.exists(f'{tmpdir}/dest')
+
+
+class FakeS3Client:
+    class exceptions:  # pylint: disable=invalid-name
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.calls = []
+
+    def _get(self, source):
+        key = (source['Bucket'], source['Key'])
+        if key not in self.objects:
+            raise FakeS3Client.exceptions.NoSuchKey()
+        return self.objects[key]
+
+    def copy_object(self, Bucket, Key, CopySource):  # pylint: disable=invalid-name
+        self.calls.append('copy_object')
+        self.objects[(Bucket, Key)] = self._get(CopySource)
+
+    def create_multipart_upload(self, Bucket, Key):  # pylint: disable=invalid-name,unused-argument
+        self.calls.append('create_multipart_upload')
+        upload_id = secrets.token_hex(8)
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part_copy(self, Bucket, Key, CopySource, CopySourceRange, PartNumber, UploadId):  # pylint: disable=invalid-name,unused-argument
+        self.calls.append('upload_part_copy')
+        data = self._get(CopySource)
+        start, end = CopySourceRange[len('bytes='):].split('-')
+        self.uploads[UploadId][PartNumber] = data[int(start):int(end) + 1]
+        return {'CopyPartResult': {'ETag': f'etag-{PartNumber}'}}
+
+    def complete_multipart_upload(self, Bucket, Key, MultipartUpload, UploadId):  # pylint: disable=invalid-name
+        self.calls.append('complete_multipart_upload')
+        parts = self.uploads.pop(UploadId)
+        assert [p['PartNumber'] for p in MultipartUpload['Parts']] == sorted(parts)
+        self.objects[(Bucket, Key)] = b''.join(parts[i] for i in sorted(parts))
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):  # pylint: disable=invalid-name,unused-argument
+        self.calls.append('abort_multipart_upload')
+        del self.uploads[UploadId]
+
+
+@pytest.mark.asyncio
+async def test_s3_copy_within():
+    with ThreadPoolExecutor() as thread_pool:
+        fs = S3AsyncFS(thread_pool)
+        fake = FakeS3Client()
+        fs._s3 = fake
+        fake.objects[('bucket', 'src')] = b'abc'
+
+        assert fs.supports_copy_within('s3://bucket/src', 's3://other-bucket/dest')
+        await fs.copy_within('s3://bucket/src', 's3://other-bucket/dest', 3)
+        assert fake.objects[('other-bucket', 'dest')] == b'abc'
+        assert fake.calls == ['copy_object']
+
+        with pytest.raises(FileNotFoundError):
+            await fs.copy_within('s3://bucket/does-not-exist', 's3://bucket/dest', 3)
+
+
+@pytest.mark.asyncio
+async def test_s3_copy_within_multi_part(monkeypatch):
+    monkeypatch.setattr(S3AsyncFS, '_copy_within_part_size', staticmethod(lambda size: 4))
+    with ThreadPoolExecutor() as thread_pool:
+        fs = S3AsyncFS(thread_pool)
+        fake = FakeS3Client()
+        fs._s3 = fake
+        data = b'0123456789'
+        fake.objects[('bucket', 'src')] = data
+
+        await fs._copy_within_multi_part('bucket', 'src', 'bucket', 'dest', len(data))
+        assert fake.objects[('bucket', 'dest')] == data
+        assert fake.calls.count('upload_part_copy') == 3
+        assert not fake.uploads
+
+
+def test_s3_copy_within_part_size():
+    assert S3AsyncFS._copy_within_part_size(10) == 512 * 1024 * 1024
+    size = 5 * 1024 ** 4
+    part_size = S3AsyncFS._copy_within_part_size(size)
+    assert part_size > 512 * 1024 * 1024
+    assert (size + part_size - 1) // part_size <= 10000
+
+
+class FakeResponse:
+    def __init__(self, body):
+        self._body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    async def json(self):
+        return self._body
+
+
+class FakeRewriteSession:
+    def __init__(self, n_calls):
+        self.n_calls = n_calls
+        self.requests = []
+
+    async def post(self, url, **kwargs):
+        self.requests.append((url, dict(kwargs['params'])))
+        if len(self.requests) < self.n_calls:
+            return FakeResponse({'done': False, 'rewriteToken': f'token-{len(self.requests)}'})
+        return FakeResponse({'done': True})
+
+    async def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_google_storage_copy_within():
+    session = FakeRewriteSession(3)
+    async with GoogleStorageAsyncFS(storage_client=StorageClient(session=session)) as fs:
+        assert fs.supports_copy_within('gs://bucket/a/src', 'gs://other-bucket/dest')
+        await fs.copy_within('gs://bucket/a/src', 'gs://other-bucket/dest', 0)
+
+    assert [url for url, _ in session.requests] == [
+        'https://storage.googleapis.com/storage/v1/b/bucket/o/a%2Fsrc/rewriteTo/b/other-bucket/o/dest'] * 3
+    assert [params.get('rewriteToken') for _, params in session.requests] == [None, 'token-1', 'token-2']
+
+
+class FakeBlobClient:
+    def __init__(self, url, n_pending):
+        self.url = url
+        self.n_pending = n_pending
+        self.copied_from = None
+
+    async def start_copy_from_url(self, url):
+        self.copied_from = url
+        return {'copy_status': 'pending' if self.n_pending > 0 else 'success'}
+
+    async def get_blob_properties(self):
+        self.n_pending -= 1
+        status = 'pending' if self.n_pending > 0 else 'success'
+        return SimpleNamespace(copy=SimpleNamespace(status=status, status_description=None))
+
+
+class FakeAzureAsyncFS(AzureAsyncFS):
+    def __init__(self, n_pending):
+        super().__init__(credential=object())
+        self.n_pending = n_pending
+        self.blob_clients = {}
+
+    def get_blob_client(self, url):
+        if url not in self.blob_clients:
+            account, container, name = self._get_account_container_name(url)
+            self.blob_clients[url] = FakeBlobClient(f'https://{account}.blob.core.windows.net/{container}/{name}', self.n_pending)
+        return self.blob_clients[url]
+
+
+@pytest.mark.asyncio
+async def test_azure_copy_within():
+    fs = FakeAzureAsyncFS(n_pending=2)
+    assert not fs.supports_copy_within('hail-az://account/container/src', 'hail-az://other/container/dest')
+    assert fs.supports_copy_within('hail-az://account/container/src', 'hail-az://account/other/dest')
+
+    await fs.copy_within('hail-az://account/container/src', 'hail-az://account/other/dest', 0)
+    dest_client = fs.blob_clients['hail-az://account/other/dest']
+    assert dest_client.copied_from == 'https://account.blob.core.windows.net/container/src'
+    assert dest_client.n_pending == 0
@@ -0,0 +1,101 @@
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import pytest
+from hailtop.aiotools import (
+    ReadableStream, ReadAheadReadableStream, UnexpectedEOFError, WeightedSemaphore, LocalAsyncFS,
+    RouterAsyncFS, Transfer)
+
+
+class BytesReadableStream(ReadableStream):
+    def __init__(self, data: bytes, *, fail_after: int = -1):
+        super().__init__()
+        self._data = data
+        self._offset = 0
+        self._fail_after = fail_after
+        self.n_reads = 0
+        self.closed_underlying = False
+
+    async def read(self, n: int = -1) -> bytes:
+        await asyncio.sleep(0)
+        if self._fail_after >= 0 and self._offset >= self._fail_after:
+            raise ValueError('read failed')
+        self.n_reads += 1
+        end = len(self._data) if n == -1 else self._offset + n
+        b = self._data[self._offset:end]
+        self._offset += len(b)
+        return b
+
+    async def _wait_closed(self) -> None:
+        self.closed_underlying = True
+
+
+DATA = bytes(range(256)) * 40
+
+
+@pytest.mark.asyncio
+async def test_read_ahead_reads():
+    async with ReadAheadReadableStream(BytesReadableStream(DATA), 1000) as f:
+        assert await f.read(10) == DATA[:10]
+        assert await f.readexactly(1500) == DATA[10:1510]
+        assert await f.read(2000) == DATA[1510:2000]
+        assert await f.read() == DATA[2000:]
+        assert await f.read(10) == b''
+        with pytest.raises(UnexpectedEOFError):
+            await f.readexactly(1)
+
+
+@pytest.mark.asyncio
+async def test_read_ahead_reads_ahead():
+    stream = BytesReadableStream(DATA)
+    async with ReadAheadReadableStream(stream, 1000, n_chunks=3) as f:
+        assert await f.read(10) == DATA[:10]
+        for _ in range(10):
+            await asyncio.sleep(0)
+        # the chunk being consumed and three more
+        assert stream.n_reads == 4
+    assert stream.closed_underlying
+
+
+@pytest.mark.asyncio
+async def test_read_ahead_raises_read_error():
+    async with ReadAheadReadableStream(BytesReadableStream(DATA, fail_after=2000), 1000) as f:
+        assert await f.readexactly(2000) == DATA[:2000]
+        with pytest.raises(ValueError):
+            await f.read(1)
+
+
+@pytest.mark.asyncio
+async def test_read_ahead_releases_sema():
+    sema = WeightedSemaphore(3000)
+    async with ReadAheadReadableStream(BytesReadableStream(DATA), 1000, n_chunks=2, sema=sema) as f:
+        await f.read(10)
+        for _ in range(10):
+            await asyncio.sleep(0)
+        assert sema.value == 0
+    assert sema.value == 3000
+
+    async with ReadAheadReadableStream(BytesReadableStream(DATA, fail_after=1000), 1000, sema=sema) as f:
+        with pytest.raises(ValueError):
+            await f.read()
+    assert sema.value == 3000
+
+
+class StreamingLocalAsyncFS(LocalAsyncFS):
+    def supports_copy_within(self, src: str, dest: str) -> bool:
+        return False
+
+
+@pytest.mark.asyncio
+async def test_copy_file_with_read_ahead():
+    # larger than Copier.BUFFER_SIZE, smaller than the part size
+    data = os.urandom(20 * 1024 * 1024)
+    with tempfile.TemporaryDirectory() as tmpdir, ThreadPoolExecutor() as thread_pool:
+        async with RouterAsyncFS('file', [StreamingLocalAsyncFS(thread_pool)]) as fs:
+            await fs.write(f'{tmpdir}/src', data)
+            sema = asyncio.Semaphore(10)
+            async with sema:
+                copy_report = await fs.copy(sema, Transfer(f'{tmpdir}/src', f'{tmpdir}/dest'))
+            assert copy_report._transfer_report._source_report._complete == 1
+            assert await fs.read(f'{tmpdir}/dest') == data
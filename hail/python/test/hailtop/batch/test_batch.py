@@ -3,6 +3,7 @@ import unittest
 import os
 import subprocess as sp
 import tempfile
+import time
 from shlex import quote as shq
 import uuid
 import google.oauth2.service_account
@@ -395,6 +396,117 @@ class LocalTests(unittest.TestCase):
             b = Batch(backend=backend)
             b.run()
 
+    def test_independent_jobs_run_concurrently(self):
+        with tempfile.NamedTemporaryFile('w') as output_file:
+            b = Batch(backend=LocalBackend(parallelism=4))
+            outputs = []
+            for i in range(4):
+                j = b.new_job()
+                j.cpu('0.25')
+                j.command(f'sleep 1; echo {i} > {j.ofile}')
+                outputs.append(j.ofile)
+            tail = b.new_job()
+            tail.command(f'cat {" ".join(str(o) for o in outputs)} > {tail.ofile}')
+            b.write_output(tail.ofile, output_file.name)
+
+            start = time.time()
+            b.run()
+            assert time.time() - start < 3.5
+            assert self.read(output_file.name).split() == ['0', '1', '2', '3']
+
+    def test_failure_cancels_dependents(self):
+        with tempfile.NamedTemporaryFile('w') as output_file, \
+                tempfile.NamedTemporaryFile('w') as always_run_output_file:
+            b = self.batch()
+            bad = b.new_job()
+            bad.command('false')
+            child = b.new_job()
+            child.depends_on(bad)
+            child.command(f'echo child > {child.ofile}')
+            b.write_output(child.ofile, output_file.name)
+            always = b.new_job()
+            always.depends_on(bad)
+            always.always_run()
+            always.command(f'echo always > {always.ofile}')
+            b.write_output(always.ofile, always_run_output_file.name)
+
+            with self.assertRaises(sp.CalledProcessError):
+                b.run()
+            assert self.read(output_file.name) == ''
+            assert self.read(always_run_output_file.name) == 'always'
+
+    def test_input_url_shared_by_jobs(self):
+        with tempfile.NamedTemporaryFile('w') as input_file, \
+                tempfile.NamedTemporaryFile('w') as output_file:
+            input_file.write('abc')
+            input_file.flush()
+
+            b = self.batch()
+            outputs = []
+            for _ in range(3):
+                input = b.read_input(f'file://{input_file.name}')
+                j = b.new_job()
+                j.command(f'cat {input} > {j.ofile}')
+                outputs.append(j.ofile)
+            tail = b.new_job()
+            tail.command(f'cat {" ".join(str(o) for o in outputs)} > {tail.ofile}')
+            b.write_output(tail.ofile, f'file://{output_file.name}')
+            b.run()
+
+            assert self.read(output_file.name) == 'abcabcabc'
+
+    def test_call_cache(self):
+        with tempfile.NamedTemporaryFile('w') as input_file, \
+                tempfile.NamedTemporaryFile('w') as runs_file, \
+                tempfile.TemporaryDirectory() as output_dir, \
+                tempfile.TemporaryDirectory() as cache_dir:
+            input_file.write('abc')
+            input_file.flush()
+
+            def run(tail_command):
+                b = Batch(backend=LocalBackend(), call_cache=cache_dir)
+                input = b.read_input(input_file.name)
+                head = b.new_job(name='head')
+                head.command(f'echo head >> {runs_file.name}')
+                head.command(f'cat {input} {input} > {head.ofile}')
+                tail = b.new_job(name='tail')
+                tail.command(f'echo tail >> {runs_file.name}')
+                tail.command(tail_command.format(head.ofile, tail.ofile))
+                b.write_output(tail.ofile, f'{output_dir}/output')
+                b.run()
+                return self.read(runs_file.name).split('\n'), self.read(f'{output_dir}/output')
+
+            assert run('cat {} > {}') == (['head', 'tail'], 'abcabc')
+
+            os.remove(f'{output_dir}/output')
+            assert run('cat {} > {}') == (['head', 'tail'], 'abcabc')
+
+            assert run('cat {} {} > {}'.format('{0}', '{0}', '{1}')) == (['head', 'tail', 'tail'], 'abcabcabcabc')
+
+            with open(input_file.name, 'w') as f:
+                f.write('xyz!')
+            assert run('cat {} > {}') == (['head', 'tail', 'tail', 'head', 'tail'], 'xyz!xyz!')
+
+    def test_timeout(self):
+        b = self.batch()
+        j = b.new_job()
+        j.timeout(1)
+        j.command('sleep 30')
+        with self.assertRaises(sp.TimeoutExpired):
+            b.run()
+
+    def test_timeout_kills_child_processes(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            marker = os.path.join(output_dir, 'marker')
+            b = self.batch()
+            j = b.new_job()
+            j.timeout(1)
+            j.command(f'(sleep 3 && touch {marker}) & wait')
+            with self.assertRaises(sp.TimeoutExpired):
+                b.run()
+            time.sleep(4)
+            assert not os.path.exists(marker)
+
 
 class ServiceTests(unittest.TestCase):
     def setUp(self):
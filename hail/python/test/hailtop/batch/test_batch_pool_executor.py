@@ -16,16 +16,16 @@ PYTHON_DILL_IMAGE = os.environ['PYTHON_DILL_IMAGE']
 submitted_batch_ids = []
 
 
-class RecordingServiceBackend(ServiceBackend):
-    def _run(self, *args, **kwargs):
-        b = super()._run(*args, **kwargs)
-        submitted_batch_ids.append(b.id)
-        return b
+class RecordingBatchPoolExecutor(BatchPoolExecutor):
+    async def _async_close_batch(self):
+        await super()._async_close_batch()
+        if self._batch is not None:
+            submitted_batch_ids.append(self._batch.id)
 
 
 @pytest.fixture
 def backend():
-    return RecordingServiceBackend()
+    return ServiceBackend()
 
 
 @pytest.fixture(scope='session', autouse=True)
@@ -44,25 +44,41 @@ def check_for_running_batches():
 
 
 def test_simple_map(backend):
-    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
+    with RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
         actual = list(bpe.map(lambda x: x * 3, range(4)))
     assert [0, 3, 6, 9] == actual
 
 
+def test_submits_and_maps_share_one_batch(backend):
+    n_batches = len(submitted_batch_ids)
+    with RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
+        futures = [bpe.submit(lambda x: x * 3, x) for x in range(3)]
+        actual = list(bpe.map(lambda x, y: x + y, range(10), range(10)))
+    assert [2 * x for x in range(10)] == actual
+    assert [0, 3, 6] == [future.result() for future in futures]
+    assert len(submitted_batch_ids) == n_batches + 1
+
+    billing_project = get_user_config().get('batch', 'billing_project', fallback=None)
+    with hailtop.batch_client.client.BatchClient(billing_project=billing_project) as bc:
+        status = bc.get_batch(submitted_batch_ids[-1]).status()
+    assert status['n_jobs'] == 13, status
+    assert status['state'] != 'open', status
+
+
 def test_empty_map(backend):
-    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
+    with RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
         actual = list(bpe.map(lambda x: x * 3, []))
     assert [] == actual
 
 
 def test_simple_submit_result(backend):
-    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
+    with RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
         future_twenty_one = bpe.submit(lambda: 7 * 3)
     assert 21 == future_twenty_one.result()
 
 
 def test_cancel_future(backend):
-    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
+    with RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
         def sleep_forever():
             while True:
                 time.sleep(3600)
@@ -74,7 +90,7 @@ def test_cancel_future(backend):
 
 
 def test_cancel_future_after_shutdown_no_wait(backend):
-    bpe = BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE)
+    bpe = RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE)
     def sleep_forever():
         while True:
             time.sleep(3600)
@@ -87,7 +103,7 @@ def test_cancel_future_after_shutdown_no_wait(backend):
 
 
 def test_cancel_future_after_exit_no_wait_on_exit(backend):
-    with BatchPoolExecutor(backend=backend, project='hail-vdc', wait_on_exit=False, image=PYTHON_DILL_IMAGE) as bpe:
+    with RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', wait_on_exit=False, image=PYTHON_DILL_IMAGE) as bpe:
         def sleep_forever():
             while True:
                 time.sleep(3600)
@@ -99,7 +115,7 @@ def test_cancel_future_after_exit_no_wait_on_exit(backend):
 
 
 def test_result_with_timeout(backend):
-    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
+    with RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
         def sleep_forever():
             while True:
                 time.sleep(3600)
@@ -122,7 +138,7 @@ def test_map_chunksize(backend):
     col_args = [x
                 for row in range(5)
                 for x in list(range(5))]
-    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
+    with RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
         multiplication_table = list(bpe.map(lambda x, y: x * y,
                                             row_args,
                                             col_args,
@@ -136,7 +152,7 @@ def test_map_chunksize(backend):
 
 
 def test_map_timeout(backend):
-    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
+    with RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
         def sleep_forever():
             while True:
                 time.sleep(3600)
@@ -149,14 +165,14 @@ def test_map_timeout(backend):
 
 
 def test_map_error_without_wait_no_error(backend):
-    with BatchPoolExecutor(backend=backend, project='hail-vdc', wait_on_exit=False, image=PYTHON_DILL_IMAGE) as bpe:
+    with RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', wait_on_exit=False, image=PYTHON_DILL_IMAGE) as bpe:
         bpe.map(lambda _: time.sleep(10), range(5), timeout=2)
 
 
 def test_exception_in_map(backend):
     def raise_value_error():
         raise ValueError('dead')
-    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
+    with RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
         try:
             gen = bpe.map(lambda _: raise_value_error(), range(5))
             next(gen)
@@ -169,7 +185,7 @@ def test_exception_in_map(backend):
 def test_exception_in_result(backend):
     def raise_value_error():
         raise ValueError('dead')
-    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
+    with RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
         try:
             future = bpe.submit(raise_value_error)
             future.result()
@@ -182,7 +198,7 @@ def test_exception_in_result(backend):
 def test_exception_in_exception(backend):
     def raise_value_error():
         raise ValueError('dead')
-    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
+    with RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
         try:
             future = bpe.submit(raise_value_error)
             future.exception()
@@ -195,7 +211,7 @@ def test_exception_in_exception(backend):
 def test_no_exception_when_exiting_context(backend):
     def raise_value_error():
         raise ValueError('dead')
-    with BatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
+    with RecordingBatchPoolExecutor(backend=backend, project='hail-vdc', image=PYTHON_DILL_IMAGE) as bpe:
         future = bpe.submit(raise_value_error)
     try:
         future.exception()
@@ -206,7 +222,7 @@ def test_no_exception_when_exiting_context(backend):
 
 
 def test_bad_image_gives_good_error(backend):
-    with BatchPoolExecutor(
+    with RecordingBatchPoolExecutor(
             backend=backend,
             project='hail-vdc',
             image='hailgenetics/not-a-valid-image:123abc') as bpe:
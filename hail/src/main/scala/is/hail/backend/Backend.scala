@@ -3,9 +3,12 @@ package is.hail.backend
 import is.hail.backend.spark.SparkBackend
 import is.hail.expr.ir.lowering.{TableStage, TableStageDependency}
 import is.hail.expr.ir.{ExecuteContext, IR, SortField}
+import is.hail.io.{BufferSpec, TypedCodecSpec}
 import is.hail.io.fs.FS
 import is.hail.linalg.BlockMatrix
 import is.hail.types._
+import is.hail.types.encoded.EType
+import is.hail.types.physical.PTuple
 import is.hail.utils._
 
 import scala.reflect.ClassTag
@@ -17,6 +20,15 @@ object Backend {
     id += 1
     s"hail_query_$id"
   }
+
+  // Encodes the result tuple of an execution with an encoding that depends
+  // only on the virtual type, so that clients can decode it without knowing
+  // the physical type or requiredness of the result.
+  def encodeToBytes(ctx: ExecuteContext, t: PTuple, off: Long, bufferSpecString: String): Array[Byte] = {
+    val bs = BufferSpec.parseOrDefault(bufferSpecString)
+    val codec = TypedCodecSpec(EType.fromTypeAllOptional(t.virtualType), t.virtualType, bs)
+    codec.encode(ctx, t, off)
+  }
 }
 
 abstract class BroadcastValue[T] { def value: T }
@@ -157,6 +157,23 @@ class LocalBackend(
     Serialization.write(Map("value" -> jsonValue, "timings" -> timer.toMap))(new DefaultFormats {})
   }
 
+  def executeEncode(ir: IR, bufferSpecString: String): (Array[Byte], String) = {
+    val (encodedValue, timer) = ExecutionTimer.time("LocalBackend.executeEncode") { timer =>
+      withExecuteContext(timer) { ctx =>
+        val queryID = Backend.nextID()
+        log.info(s"starting execution of query $queryID of initial size ${ IRSize(ir) }")
+        val res = _execute(ctx, ir) match {
+          case (None, _) => Array[Byte]()
+          case (Some(PTypeReferenceSingleCodeType(pt: PTuple)), a) =>
+            Backend.encodeToBytes(ctx, pt, a, bufferSpecString)
+        }
+        log.info(s"finished execution of query $queryID")
+        res
+      }
+    }
+    (encodedValue, Serialization.write(timer.toMap)(new DefaultFormats {}))
+  }
+
   def executeLiteral(ir: IR): IR = {
     ExecutionTimer.logTime("LocalBackend.executeLiteral") { timer =>
       val t = ir.typ
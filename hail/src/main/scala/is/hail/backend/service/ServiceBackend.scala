@@ -219,7 +219,7 @@ class ServiceBackend(
     ReferenceGenome.getReference(name).toJSONString
   }
 
-  private[this] def execute(ctx: ExecuteContext, _x: IR): Option[(Annotation, PType)] = {
+  private[this] def executeToRegion(ctx: ExecuteContext, _x: IR): Option[(PTuple, Long)] = {
     val x = LoweringPipeline.darrayLowerer(true)(DArrayLowering.All).apply(ctx, _x)
       .asInstanceOf[IR]
     if (x.typ == TVoid) {
@@ -239,11 +239,15 @@ class ServiceBackend(
         optimize = true)
 
       val a = f(ctx.fs, 0, ctx.r)(ctx.r)
-      val retPType = pt.asInstanceOf[PBaseStruct]
-      Some((new UnsafeRow(retPType, ctx.r, a).get(0), retPType.types(0)))
+      Some((pt.asInstanceOf[PTuple], a))
     }
   }
 
+  private[this] def execute(ctx: ExecuteContext, _x: IR): Option[(Annotation, PType)] =
+    executeToRegion(ctx, _x).map { case (retPType, a) =>
+      (new UnsafeRow(retPType, ctx.r, a).get(0), retPType.types(0))
+    }
+
   def execute(username: String, sessionID: String, billingProject: String, bucket: String, code: String, token: String): String = {
     ExecutionTimer.logTime("ServiceBackend.execute") { timer =>
       userContext(username, timer) { ctx =>
@@ -263,6 +267,20 @@ class ServiceBackend(
     }
   }
 
+  def executeEncode(username: String, sessionID: String, billingProject: String, bucket: String, code: String, token: String, bufferSpecString: String): Array[Byte] = {
+    ExecutionTimer.logTime("ServiceBackend.executeEncode") { timer =>
+      userContext(username, timer) { ctx =>
+        log.info(s"executing: ${token}")
+        ctx.backendContext = new ServiceBackendContext(username, sessionID, billingProject, bucket)
+
+        executeToRegion(ctx, IRParser.parse_value_ir(ctx, code)) match {
+          case Some((pt, a)) => Backend.encodeToBytes(ctx, pt, a, bufferSpecString)
+          case None => Array[Byte]()
+        }
+      }
+    }
+  }
+
   def flags(): String = {
     JsonMethods.compact(JObject(HailContext.get.flags.available.toArray().map { case f: String =>
       val v = HailContext.getFlag(f)
@@ -340,6 +358,7 @@ class ServiceBackendSocketAPI(backend: ServiceBackend, socket: Socket) extends T
   private[this] val UNSET_FLAG = 10
   private[this] val SET_FLAG = 11
   private[this] val ADD_USER = 12
+  private[this] val EXECUTE_ENCODE = 13
   private[this] val GOODBYE = 254
 
   private[this] val in = socket.getInputStream
@@ -503,6 +522,24 @@ class ServiceBackendSocketAPI(backend: ServiceBackend, socket: Socket) extends T
               writeString(formatException(t))
           }
 
+        case EXECUTE_ENCODE =>
+          val username = readString()
+          val sessionId = readString()
+          val billingProject = readString()
+          val bucket = readString()
+          val code = readString()
+          val token = readString()
+          val bufferSpecString = readString()
+          try {
+            val result = backend.executeEncode(username, sessionId, billingProject, bucket, code, token, bufferSpecString)
+            writeBool(true)
+            writeBytes(result)
+          } catch {
+            case t: Throwable =>
+              writeBool(false)
+              writeString(formatException(t))
+          }
+
         case FLAGS =>
           try {
             val result = backend.flags()
@@ -409,6 +409,23 @@ class SparkBackend(
     Serialization.write(Map("value" -> jsonValue, "timings" -> timer.toMap))(new DefaultFormats {})
   }
 
+  // Called from python
+  def executeEncode(ir: IR, bufferSpecString: String): (Array[Byte], String) = {
+    val (encodedValue, timer) = ExecutionTimer.time("SparkBackend.executeEncode") { timer =>
+      withExecuteContext(timer) { ctx =>
+        val queryID = Backend.nextID()
+        log.info(s"starting execution of query $queryID of initial size ${ IRSize(ir) }")
+        val res = _execute(ctx, ir, true) match {
+          case Left(_) => Array[Byte]()
+          case Right((t, off)) => Backend.encodeToBytes(ctx, t, off, bufferSpecString)
+        }
+        log.info(s"finished execution of query $queryID")
+        res
+      }
+    }
+    (encodedValue, Serialization.write(timer.toMap)(new DefaultFormats {}))
+  }
+
   // Called from python
   def encodeToBytes(ir: IR, bufferSpecString: String): (String, Array[Byte]) = {
     ExecutionTimer.logTime("SparkBackend.encodeToBytes") { timer =>
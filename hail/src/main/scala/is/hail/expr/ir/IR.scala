@@ -99,6 +99,15 @@ object EncodedLiteral {
     val bytes = codec.encode(ctx, pt, addr)
     EncodedLiteral(codec, bytes)
   }
+
+  // values encoded by Python: every type is optional, no buffer framing
+  def fromEncodedValue(t: Type, value: Array[Byte]): EncodedLiteral = {
+    val codec = TypedCodecSpec(EType.fromTypeAllOptional(t), t, BufferSpec.unblockedUncompressed)
+    EncodedLiteral(codec, value)
+  }
+
+  def pyFromEncodedValue(typeString: String, value: Array[Byte]): EncodedLiteral =
+    fromEncodedValue(IRParser.parseType(typeString), value)
 }
 
 final case class EncodedLiteral(codec: AbstractTypedCodecSpec, value: WrappedByteArray) extends IR {
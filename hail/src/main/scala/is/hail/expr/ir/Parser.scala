@@ -14,6 +14,7 @@ import is.hail.utils.StackSafe._
 import is.hail.utils.StringEscapeUtils._
 import is.hail.utils._
 import is.hail.variant.ReferenceGenome
+import org.apache.commons.io.IOUtils
 import org.apache.spark.sql.Row
 import org.json4s.{Formats, JObject}
 import org.json4s.jackson.{JsonMethods, Serialization}
@@ -782,7 +783,19 @@ object IRParser {
         val (t, v) = ir_value(env.typEnv)(it)
         done(Literal.coerce(t, v))
       case "EncodedLiteral" =>
-        throw new UnsupportedOperationException("Not currently parsable")
+        // the value is passed out of band, either directly in the IR map or
+        // as a file containing the encoded value
+        val t = type_expr(env.typEnv)(it)
+        val id = string_literal(it)
+        val lit = env.irMap.get(id) match {
+          case Some(x: EncodedLiteral) => x
+          case Some(x) => fatal(s"expected EncodedLiteral for '$id', found ${ x.getClass.getSimpleName }")
+          case None =>
+            EncodedLiteral.fromEncodedValue(t, using(env.ctx.fs.openNoCompression(id))(IOUtils.toByteArray))
+        }
+        if (lit.codec.encodedVirtualType != t)
+          fatal(s"EncodedLiteral '$id': expected type $t, found ${ lit.codec.encodedVirtualType }")
+        done(lit)
       case "Void" => done(Void())
       case "Cast" =>
         val typ = type_expr(env.typEnv)(it)
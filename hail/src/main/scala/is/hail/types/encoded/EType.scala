@@ -295,6 +295,41 @@ object EType {
       ENDArrayColumnMajor(fromTypeAndAnalysis(t.elementType, rndarray.elementType), t.nDims, rndarray.required)
   }
 
+  // Encoding that depends only on the virtual type.  Every value is treated
+  // as optional, except for the components of loci and interval endpoint
+  // flags and ndarray elements, which are never missing.  Used to ship
+  // results to clients (e.g. Python) that do not know about requiredness.
+  def fromTypeAllOptional(t: Type): EType = t match {
+    case TInt32 => EInt32(false)
+    case TInt64 => EInt64(false)
+    case TFloat32 => EFloat32(false)
+    case TFloat64 => EFloat64(false)
+    case TBoolean => EBoolean(false)
+    case TBinary => EBinary(false)
+    case TString => EBinary(false)
+    case TLocus(_) =>
+      EBaseStruct(Array(
+        EField("contig", EBinary(true), 0),
+        EField("position", EInt32(true), 1)),
+        required = false)
+    case TCall => EInt32(false)
+    case t: TInterval =>
+      EBaseStruct(
+        Array(
+          EField("start", fromTypeAllOptional(t.pointType), 0),
+          EField("end", fromTypeAllOptional(t.pointType), 1),
+          EField("includesStart", EBoolean(true), 2),
+          EField("includesEnd", EBoolean(true), 3)),
+        required = false)
+    case t: TIterable => EArray(fromTypeAllOptional(t.elementType), false)
+    case t: TBaseStruct =>
+      EBaseStruct(Array.tabulate(t.size) { i =>
+        EField(t.fields(i).name, fromTypeAllOptional(t.fields(i).typ), i)
+      }, required = false)
+    case t: TNDArray =>
+      ENDArrayColumnMajor(fromTypeAllOptional(t.elementType).setRequired(true), t.nDims, false)
+  }
+
   def eTypeParser(it: TokenIterator): EType = {
     val req = it.head match {
       case x: PunctuationToken if x.value == "+" =>
@@ -1,6 +1,9 @@
 package is.hail.utils
 
 import java.io.{InputStream, OutputStream}
+import java.nio.MappedByteBuffer
+import java.nio.channels.{Channels, FileChannel, ReadableByteChannel}
+import java.nio.file.{Paths, StandardOpenOption}
 
 import is.hail.HailContext
 import is.hail.expr.JSONAnnotationImpex
@@ -157,8 +160,53 @@ class HadoopPyReader(in: InputStream, buffSize: Int) {
       buff.slice(0, bytesRead)
   }
 
+  // Bulk reads go through a local file memory-mapped by both the JVM
+  // and Python rather than being marshaled over py4j.
+  private var shared: MappedByteBuffer = _
+  private var sharedChannel: ReadableByteChannel = _
+
+  // `path` must be the file Python created and wrote `nonce` (hex) to
+  // the start of. It is never created or extended here, so a JVM that
+  // doesn't share Python's filesystem fails rather than mapping a file
+  // of its own.
+  def mapSharedBuffer(path: String, size: Int, nonce: String) {
+    val channel = FileChannel.open(Paths.get(path), StandardOpenOption.READ, StandardOpenOption.WRITE)
+    val mapped = try {
+      if (channel.size() != size)
+        fatal(s"shared buffer $path has size ${ channel.size() }, expected $size")
+      channel.map(FileChannel.MapMode.READ_WRITE, 0, size)
+    } finally {
+      channel.close()
+    }
+    val expected = nonce.grouped(2).map(Integer.parseInt(_, 16).toByte).toArray
+    val found = new Array[Byte](expected.length)
+    mapped.get(found)
+    if (!java.util.Arrays.equals(found, expected))
+      fatal(s"shared buffer $path was not written by this reader")
+    shared = mapped
+    sharedChannel = Channels.newChannel(in)
+  }
+
+  // Fill the shared buffer with up to n bytes. Returns the number of
+  // bytes read, which is less than n only at the end of the file.
+  def readShared(n: Int): Int = {
+    shared.clear()
+    shared.limit(math.min(n, shared.capacity()))
+    var done = false
+    while (shared.hasRemaining && !done)
+      done = sharedChannel.read(shared) < 0
+    shared.position()
+  }
+
   def close() {
-    in.close()
+    // the mapping is released once it is unreachable
+    shared = null
+    if (sharedChannel != null) {
+      // closing the channel closes `in`
+      sharedChannel.close()
+      sharedChannel = null
+    } else
+      in.close()
   }
 }
 
@@ -181,6 +229,8 @@ class HadoopSeekablePyReader(status: FileStatus, in: SeekableDataInputStream, bu
   }
 
   def getPosition(): Long = in.getPosition
+
+  def getLen(): Long = status.getLen
 }
 
 class HadoopPyWriter(out: OutputStream) {
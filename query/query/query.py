@@ -7,6 +7,9 @@ import logging
 import uvloop
 import asyncio
 import signal
+import json
+import struct
+import aiohttp
 from aiohttp import web
 import kubernetes_asyncio as kube
 from prometheus_async.aio.web import server_stats  # type: ignore
@@ -69,6 +72,20 @@ def blocking_execute(userdata, body):
         )
 
 
+def blocking_execute_encode(userdata, body):
+    with connect_to_java() as java:
+        log.info(f'executing {body["token"]}')
+        return java.execute_encode(
+            userdata['username'],
+            userdata['session_id'],
+            body['billing_project'],
+            body['bucket'],
+            body['code'],
+            body['token'],
+            body['buffer_spec'],
+        )
+
+
 def blocking_load_references_from_dataset(userdata, body):
     with connect_to_java() as java:
         return java.load_references_from_dataset(
@@ -101,6 +118,16 @@ def blocking_get_reference(userdata, body):  # pylint: disable=unused-argument
         return java.reference_genome(userdata['username'], body['name'])
 
 
+async def start_query(app, userdata, body, f):
+    user_queries: Dict[str, asyncio.Future] = app['queries'][userdata['username']]
+    query = user_queries.get(body['token'])
+    if query is None:
+        await add_user(app, userdata)
+        query = asyncio.ensure_future(retry_transient_errors(blocking_to_async, app['thread_pool'], f, userdata, body))
+        user_queries[body['token']] = query
+    return query
+
+
 async def handle_ws_response(request, userdata, endpoint, f):
     app = request.app
     user_queries: Dict[str, asyncio.Future] = request.app['queries'][userdata['username']]
@@ -109,11 +136,7 @@ async def handle_ws_response(request, userdata, endpoint, f):
     await ws.prepare(request)
     body = await ws.receive_json()
 
-    query = user_queries.get(body['token'])
-    if query is None:
-        await add_user(app, userdata)
-        query = asyncio.ensure_future(retry_transient_errors(blocking_to_async, app['thread_pool'], f, userdata, body))
-        user_queries[body['token']] = query
+    query = await start_query(app, userdata, body, f)
 
     try:
         receive = asyncio.ensure_future(
@@ -131,7 +154,12 @@ async def handle_ws_response(request, userdata, endpoint, f):
             exc_str = traceback.format_exception(type(exc), exc, exc.__traceback__)
             await ws.send_json({'status': 500, 'value': exc_str})
         else:
-            await ws.send_json({'status': 200, 'value': query.result()})
+            result = query.result()
+            if isinstance(result, bytes):
+                # encoded results are sent as a single binary message
+                await ws.send_bytes(result)
+            else:
+                await ws.send_json({'status': 200, 'value': result})
         assert (await receive) == 'bye'
         del user_queries[body['token']]
     finally:
@@ -141,12 +169,83 @@ async def handle_ws_response(request, userdata, endpoint, f):
     return ws
 
 
+SESSION_ENDPOINTS = {
+    'execute': blocking_execute,
+    'execute_encode': blocking_execute_encode,
+    'load_references_from_dataset': blocking_load_references_from_dataset,
+    'type/value': blocking_value_type,
+    'type/table': blocking_table_type,
+    'type/matrix': blocking_matrix_type,
+    'type/blockmatrix': blocking_blockmatrix_type,
+    'references/get': blocking_get_reference,
+}
+
+
+async def handle_session_request(app, ws, userdata, request_id, endpoint, body):
+    user_queries: Dict[str, asyncio.Future] = app['queries'][userdata['username']]
+    try:
+        f = SESSION_ENDPOINTS.get(endpoint)
+        if f is None:
+            raise ValueError(f'unknown endpoint: {endpoint}')
+        query = await start_query(app, userdata, body, f)
+        try:
+            result = await query
+        finally:
+            user_queries.pop(body['token'], None)
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:  # pylint: disable=broad-except
+        exc_str = traceback.format_exception(type(exc), exc, exc.__traceback__)
+        await ws.send_json({'id': request_id, 'status': 500, 'value': exc_str})
+        return
+    if isinstance(result, bytes):
+        # encoded results are sent as a single binary message, prefixed
+        # with the id of the request
+        await ws.send_bytes(struct.pack('<q', request_id) + result)
+    else:
+        await ws.send_json({'id': request_id, 'status': 200, 'value': result})
+
+
+@routes.get('/api/v1alpha/session')
+@rest_authenticated_users_only
+async def session(request, userdata):
+    # A long-lived socket over which the client sends any number of
+    # requests, {"id": ..., "endpoint": ..., "data": ...}, possibly
+    # concurrently.  Responses carry the id of their request and are sent
+    # as each completes.
+    app = request.app
+    ws = web.WebSocketResponse(heartbeat=30, max_msg_size=0)
+    await ws.prepare(request)
+
+    requests = set()
+    try:
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                break
+            req = json.loads(msg.data)
+            task = asyncio.ensure_future(
+                handle_session_request(app, ws, userdata, req['id'], req['endpoint'], req['data']))
+            requests.add(task)
+            task.add_done_callback(requests.discard)
+    finally:
+        for task in requests:
+            task.cancel()
+        await ws.close()
+    return ws
+
+
 @routes.get('/api/v1alpha/execute')
 @rest_authenticated_users_only
 async def execute(request, userdata):
     return await handle_ws_response(request, userdata, 'execute', blocking_execute)
 
 
+@routes.get('/api/v1alpha/execute_encode')
+@rest_authenticated_users_only
+async def execute_encode(request, userdata):
+    return await handle_ws_response(request, userdata, 'execute_encode', blocking_execute_encode)
+
+
 @routes.get('/api/v1alpha/load_references_from_dataset')
 @rest_authenticated_users_only
 async def load_references_from_dataset(request, userdata):
@@ -29,6 +29,7 @@ class ServiceBackendSocketConnection:
     UNSET_FLAG = 10
     SET_FLAG = 11
     ADD_USER = 12
+    EXECUTE_ENCODE = 13
     GOODBYE = 254
 
     FNAME = '/sock/sock'
@@ -200,6 +201,30 @@ class ServiceBackendSocketConnection:
         jstacktrace = self.read_str()
         raise ValueError(jstacktrace)
 
+    def execute_encode(
+        self,
+        username: str,
+        session_id: str,
+        billing_project: str,
+        bucket: str,
+        code: str,
+        token: str,
+        buffer_spec: str,
+    ) -> bytes:
+        self.write_int(ServiceBackendSocketConnection.EXECUTE_ENCODE)
+        self.write_str(username)
+        self.write_str(session_id)
+        self.write_str(billing_project)
+        self.write_str(bucket)
+        self.write_str(code)
+        self.write_str(token)
+        self.write_str(buffer_spec)
+        success = self.read_bool()
+        if success:
+            return bytes(self.read_bytes())
+        jstacktrace = self.read_str()
+        raise ValueError(jstacktrace)
+
     def flags(self):
         self.write_int(ServiceBackendSocketConnection.FLAGS)
         success = self.read_bool()